@@ -14,35 +14,61 @@ import Tkinter as tk
 import tkFileDialog
 import StringIO
 import os, sys
+import tempfile
+import hashlib
+import heapq
+import json
+import sqlite3
+import time
+import multiprocessing
+import threading
+import Queue
+import weakref
+import BaseHTTPServer
+import cPickle
+import struct
+import zlib
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-
-# import PSSE APIs
-PSSE_LOCATION = 'C:\\Program Files (x86)\\PTI\\PSSE34\\PSSPY27\\'
-sys.path.append(PSSE_LOCATION)
-os.environ['PATH'] = (PSSE_LOCATION + os.environ['PATH'])
 try:
-    import psse34
+    import scipy.sparse as sparse
+    import scipy.sparse.linalg as sparse_linalg
 except ImportError:
-    inputfilepath = ''
-    if not inputfilepath:
-        root = tk.Tk()
-        PSSE_LOCATION = tkFileDialog.askdirectory(
-            title='Select PSSE Python library directory (usually PSSE34//PSSPY27)',
-            filetypes=[('application', '*.exe')])
-        root.destroy()
+    # PowerFlow uses dense matrices without scipy
+    sparse = None
+
+# import PSSE APIs. If PYPSSE_REPLAY names a trace file (see start_recording),
+# PSS/E is not imported and the psspy calls are served from the trace.
+REPLAY_TRACE = os.environ.get('PYPSSE_REPLAY', '')
+if REPLAY_TRACE:
+    psspy = pssarrays = pssexcel = redirect = None
+else:
+    PSSE_LOCATION = 'C:\\Program Files (x86)\\PTI\\PSSE34\\PSSPY27\\'
     sys.path.append(PSSE_LOCATION)
     os.environ['PATH'] = (PSSE_LOCATION + os.environ['PATH'])
     try:
         import psse34
-    except ImportError as e:
-        raise ImportError(
-            'An issue was encountered importing the PSSE library: /n{}'.format(
-                str(e)))
-import psspy
-import pssarrays
-import pssexcel
-import redirect
+    except ImportError:
+        inputfilepath = ''
+        if not inputfilepath:
+            root = tk.Tk()
+            PSSE_LOCATION = tkFileDialog.askdirectory(
+                title='Select PSSE Python library directory (usually PSSE34//PSSPY27)',
+                filetypes=[('application', '*.exe')])
+            root.destroy()
+        sys.path.append(PSSE_LOCATION)
+        os.environ['PATH'] = (PSSE_LOCATION + os.environ['PATH'])
+        try:
+            import psse34
+        except ImportError as e:
+            raise ImportError(
+                'An issue was encountered importing the PSSE library: /n{}'.format(
+                    str(e)))
+    import psspy
+    import pssarrays
+    import pssexcel
+    import redirect
 
 # create constants that PSS/E requires as default inputs
 _i = 100000000
@@ -50,6 +76,98 @@ _f = 1.00000002004e+20
 _s = 'ÿ'
 stdout = sys.stdout
 
+# bus capacity PSS/E was initialized with in this process (0 if it was not)
+_psse_state = {'buscap': 0}
+
+# case snapshots taken by checkpoint are written here. /dev/shm is memory backed
+# (tmpfs) on Linux hosts; elsewhere the system temporary directory is used.
+if os.path.isdir('/dev/shm'):
+    SNAPSHOT_LOCATION = '/dev/shm'
+else:
+    SNAPSHOT_LOCATION = tempfile.gettempdir()
+# shared table segments are written to the same memory backed directory
+SHARED_LOCATION = SNAPSHOT_LOCATION
+
+# prefixes of the PSS/E array APIs for each element family and the suffixes and
+# numpy data types for each PSS/E data type indicator
+_ARRAY_APIS = {'BUS': 'abus', 'BRN': 'abrn', 'TRN': 'atrn', 'TR3': 'atr3',
+               'MACH': 'amach', 'LOAD': 'aload', 'WND': 'awnd',
+               'FXSH': 'afxshunt', 'PLANT': 'agenbus'}
+_ARRAY_TYPES = {'I': ('int', int), 'R': ('real', float), 'X': ('cplx', complex),
+                'C': ('char', str)}
+# default array API flags of each element family, as in the get_multiple methods
+_DEFAULT_FLAGS = {'BUS': 2, 'BRN': 4, 'TRN': 4, 'TR3': 2, 'MACH': 4, 'LOAD': 4,
+                  'WND': 2, 'FXSH': 4}
+# fields identifying one element of each family (bus numbers first)
+_ELEMENT_KEYS = {'BUS': ['NUMBER'], 'MACH': ['NUMBER', 'ID'],
+                 'LOAD': ['NUMBER', 'ID'],
+                 'BRN': ['FROMNUMBER', 'TONUMBER', 'ID'],
+                 'TRN': ['FROMNUMBER', 'TONUMBER', 'ID'],
+                 'TR3': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER', 'ID']}
+# NetworkModel fields and flags (all elements, transformers only in TRN/TR3)
+_MODEL_FIELDS = {'BUS': ['NUMBER', 'NAME', 'EXNAME', 'BASE', 'TYPE', 'AREA',
+                         'ZONE', 'OWNER', 'PU', 'ANGLED', 'NVLMHI', 'NVLMLO',
+                         'EVLMHI', 'EVLMLO'],
+                 'BRN': ['FROMNUMBER', 'TONUMBER', 'ID', 'STATUS', 'RX',
+                         'CHARGING', 'RATEA', 'RATEB', 'RATEC', 'LENGTH', 'P',
+                         'Q', 'PCTRATEA', 'FROMSHNT', 'TOSHNT', 'METERNUMBER',
+                         'OWN1', 'FRACT1'],
+                 'TRN': ['FROMNUMBER', 'TONUMBER', 'ID', 'STATUS', 'RXACT',
+                         'RXNOM', 'YMAG', 'RATIO', 'RATIO2', 'ANGLE', 'NOMV1',
+                         'NOMV2', 'RATEA', 'RATEB', 'RATEC', 'CODE',
+                         'ICONTNUMBER', 'RMAX', 'RMIN', 'VMAX', 'VMIN',
+                         'NTPOSN', 'TABLE', 'CNXANG', 'NMETERNUMBER', 'OWN1',
+                         'FRACT1', 'P', 'Q', 'PCTRATEA'],
+                 'TR3': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER', 'ID',
+                         'STATUS', 'RX1-2ACT', 'RX2-3ACT', 'RX3-1ACT',
+                         'RX1-2NOM', 'RX2-3NOM', 'RX3-1NOM', 'YMAG', 'VMSTAR',
+                         'ANSTAR', 'NMETERNUMBER', 'OWN1', 'FRACT1'],
+                 'MACH': ['NUMBER', 'ID', 'STATUS', 'PGEN', 'QGEN', 'PMAX',
+                          'PMIN', 'QMAX', 'QMIN', 'MBASE', 'ZSORCE', 'XTRAN',
+                          'GENTAP', 'PERCENT', 'WMOD', 'WPF', 'OWN1',
+                          'FRACT1'],
+                 'LOAD': ['NUMBER', 'ID', 'STATUS', 'AREA', 'ZONE', 'OWNER',
+                          'MVANOM', 'ILNOM', 'YLNOM'],
+                 'WND': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER',
+                         'WNDNUM', 'ID', 'RATIO', 'NOMV', 'ANGLE', 'RATEA',
+                         'RATEB', 'RATEC', 'CODE', 'ICONTNUMBER', 'RMAX',
+                         'RMIN', 'VMAX', 'VMIN', 'NTPOSN', 'TABLE', 'CNXANG'],
+                 'FXSH': ['NUMBER', 'ID', 'STATUS', 'SHUNTNOM'],
+                 'PLANT': ['NUMBER', 'IREG', 'VSPU']}
+# pypsse methods whose mutations checkpoint journals (with inverse API calls or
+# a snapshot taken beforehand)
+_JOURNALED_MUTATIONS = frozenset(['create_bus_from_tap', 'create_bus_from_split',
+                                  'create_gen', 'create_gens', 'dispatch_gen',
+                                  '__create_load__', '__change_load__',
+                                  'pv_curve'])
+# fields compared by pypsse.snapshot and the smallest change reported for each
+_DIFF_FIELDS = {'BUS': ['PU', 'ANGLED'],
+                'BRN': ['STATUS', 'P', 'Q', 'PCTRATEA'],
+                'TRN': ['STATUS', 'P', 'Q', 'PCTRATEA'],
+                'TR3': ['STATUS'],
+                'MACH': ['STATUS', 'PGEN', 'QGEN'],
+                'LOAD': ['STATUS', 'MVAACT'],
+                'FXSH': ['STATUS', 'SHUNTACT']}
+_DIFF_THRESHOLDS = {'PU': 1e-4, 'ANGLED': 0.01, 'P': 0.01, 'Q': 0.01,
+                    'PCTRATEA': 0.01, 'PGEN': 0.01, 'QGEN': 0.01,
+                    'MVAACT': 0.01, 'SHUNTACT': 0.01}
+_MODEL_FLAGS = {'BUS': 2, 'BRN': 2, 'TRN': 2, 'TR3': 2, 'MACH': 4, 'LOAD': 4,
+                'WND': 2, 'FXSH': 4, 'PLANT': 2}
+# data sections of each RAW file revision, in file order
+_RAW_SECTIONS = {33: ['BUS', 'LOAD', 'FIXED SHUNT', 'GENERATOR', 'BRANCH',
+                      'TRANSFORMER', 'AREA', 'TWO-TERMINAL DC', 'VSC DC LINE',
+                      'IMPEDANCE CORRECTION', 'MULTI-TERMINAL DC',
+                      'MULTI-SECTION LINE', 'ZONE', 'INTER-AREA TRANSFER',
+                      'OWNER', 'FACTS DEVICE', 'SWITCHED SHUNT', 'GNE DEVICE',
+                      'INDUCTION MACHINE'],
+                 34: ['SYSTEM-WIDE', 'BUS', 'LOAD', 'FIXED SHUNT', 'GENERATOR',
+                      'BRANCH', 'SYSTEM SWITCHING DEVICE', 'TRANSFORMER',
+                      'AREA', 'TWO-TERMINAL DC', 'VSC DC LINE',
+                      'IMPEDANCE CORRECTION', 'MULTI-TERMINAL DC',
+                      'MULTI-SECTION LINE', 'ZONE', 'INTER-AREA TRANSFER',
+                      'OWNER', 'FACTS DEVICE', 'SWITCHED SHUNT', 'GNE DEVICE',
+                      'INDUCTION MACHINE', 'SUBSTATION']}
+
 
 class pypsse(object):
     """Creates an wrapper for PSS/E APIs. Note: although PSS/E supports 
@@ -72,6 +190,38 @@ class pypsse(object):
         self.pssarrays = pssarrays
         self.pssexcel = pssexcel
         self.data = None
+        self.__journal__ = []
+        self.__checkpoints__ = OrderedDict()
+        self.__case_token__ = ''
+        self.__case_version__ = 0
+        self.__name_index__ = None
+        self.__applied_changes__ = {}
+        self.__metrics_server__ = None
+        self.metrics = MetricsRegistry()
+        self.metrics.counter('pypsse_solves_total',
+                             'Power flow solutions run, by method.')
+        self.metrics.counter('pypsse_solve_failures_total',
+                             'Power flow solutions reported unsolved by '
+                             'psspy.solved(), by method.')
+        self.metrics.histogram('pypsse_solve_seconds',
+                               'Power flow solution time in seconds.')
+        self.metrics.counter('pypsse_fetch_calls_total',
+                             'Array API calls made to retrieve data, by API.')
+        self.metrics.counter('pypsse_fetch_values_total',
+                             'Values retrieved through array APIs, by API.')
+        self.metrics.counter('pypsse_mutations_total',
+                             'Case mutations made through pypsse, by method.')
+        self.metrics.counter('pypsse_mutation_errors_total',
+                             'Case mutations that returned an API error, by '
+                             'method.')
+        self.metrics.gauge('pypsse_capture_buffer_bytes',
+                           'Size of the captured PSS/E output (pypsse.out).')
+        self.metrics.gauge('pypsse_error_message_bytes',
+                           'Size of pypsse.error_message.')
+        self.metrics.gauge('pypsse_journal_entries',
+                           'Entries in the checkpoint undo journal.')
+        self.metrics.gauge('pypsse_last_activity_timestamp_seconds',
+                           'Unix time of the last solve or retrieval.')
         self.BUS_FIELDS = {}
         self.BUS_FIELDS['Real'] = ['BASE', 'PU', 'KV', 'ANGLE', 'ANGLED',
                                    'NVLMHI', 'NVLMLO', 'EVLMHI', 'EVLMLO',
@@ -237,6 +387,40 @@ class pypsse(object):
                                          'O_YLNOM', 'O_TOTALACT', 'O_TOTALNOM',
                                          'O_MISMATCH', 'O_LDGNACT', 'O_LDGNNOM']
         self.A_LOAD_FIELDS['Character'] = ['NAME', 'EXNAME']
+        # fields of each family which a power flow solution can change
+        self.SOLUTION_FIELDS = {}
+        self.SOLUTION_FIELDS['BUS'] = ['PU', 'KV', 'ANGLE', 'ANGLED',
+                                       'MISMATCH', 'O_MISMATCH', 'VOLTAGE',
+                                       'SHUNTACT', 'O_SHUNTACT']
+        self.SOLUTION_FIELDS['BRN'] = ['AMPS', 'PUCUR', 'PCTRATE', 'PCTRATEA',
+                                       'PCTRATEB', 'PCTRATEC', 'PCTMVARATE',
+                                       'PCTMVARATEA', 'PCTMVARATEB',
+                                       'PCTMVARATEC', 'PCTCORPRATE',
+                                       'PCTCORPRATEA', 'PCTCORPRATEB',
+                                       'PCTCORPRATEC', 'MAXPCTRATE',
+                                       'MAXPCTRATEA', 'MAXPCTRATEB',
+                                       'MAXPCTRATEC', 'MAXPCTCRPRATE',
+                                       'MAXPCTCRPRATEA', 'MAXPCTCRPRATEB',
+                                       'MAXPCTCRPRATEC', 'P', 'Q', 'MVA',
+                                       'MAXMVA', 'PLOSS', 'QLOSS', 'O_P', 'O_Q',
+                                       'O_MVA', 'O_MAXMVA', 'O_PLOSS',
+                                       'O_QLOSS', 'PQ', 'PQLOSS', 'O_PQ',
+                                       'O_PQLOSS']
+        self.SOLUTION_FIELDS['TRN'] = self.SOLUTION_FIELDS['BRN'] + [
+            'MXPCTMVARAT', 'MXPCTMVARATA', 'MXPCTMVARATB', 'MXPCTMVARATC',
+            'MXPCTCRPRAT', 'MXPCTCRPRATA', 'MXPCTCRPRATB', 'MXPCTCRPRATC',
+            'RATIO', 'RATIOCW', 'RATIO2', 'RATIO2CW', 'ANGLE', 'RXACT',
+            'RXACTCZ']
+        self.SOLUTION_FIELDS['TR3'] = ['VMSTAR', 'ANSTAR', 'PLOSS', 'QLOSS',
+                                       'O_PLOSS', 'O_QLOSS', 'PQLOSS',
+                                       'O_PQLOSS']
+        self.SOLUTION_FIELDS['MACH'] = ['PGEN', 'QGEN', 'MVA', 'O_PGEN',
+                                        'O_QGEN', 'O_MVA', 'PQGEN', 'O_PQGEN']
+        self.SOLUTION_FIELDS['LOAD'] = ['PU', 'KV', 'ANGLE', 'ANGLED',
+                                        'MVAACT', 'ILACT', 'YLACT', 'TOTALACT',
+                                        'MISMATCH', 'LDGNACT', 'O_MVAACT',
+                                        'O_ILACT', 'O_YLACT', 'O_TOTALACT',
+                                        'O_MISMATCH', 'O_LDGNACT']
 
     def __del__(self):
         """method automatically called when an instance of pypsse is deleted."""
@@ -298,8 +482,59 @@ class pypsse(object):
             f.write(self.out.getvalue())
         return True
 
-    def opencase(self, casepath=''):
-        """Opens PSS/E case"""
+    def metrics_text(self):
+        """Returns the metrics in Prometheus text exposition format."""
+        out = self.out.getvalue() if self.out is not None else ''
+        self.metrics['pypsse_capture_buffer_bytes'].set(len(out))
+        self.metrics['pypsse_error_message_bytes'].set(len(self.error_message))
+        self.metrics['pypsse_journal_entries'].set(len(self.__journal__))
+        return self.metrics.render()
+
+    def write_metrics(self, filepath):
+        """Writes the metrics to a file in Prometheus text format (e.g. for the
+        node exporter textfile collector). The file is written under a
+        temporary name and moved into place with _replace_file, so the
+        collector never reads a partial file."""
+        tmp = '{}.{}.tmp'.format(filepath, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.metrics_text())
+        _replace_file(tmp, filepath)
+        return True
+
+    def serve_metrics(self, port=9108, host='127.0.0.1'):
+        """Serves the metrics over HTTP at http://host:port/metrics from a
+        daemon thread. Returns the server; call its shutdown method to stop."""
+        ref = weakref.ref(self)
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                psse = ref()
+                if psse is None or handler.path.split('?')[0] not in (
+                        '/metrics', '/'):
+                    handler.send_error(404)
+                    return
+                body = psse.metrics_text()
+                handler.send_response(200)
+                handler.send_header('Content-Type',
+                                    'text/plain; version=0.0.4')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.__metrics_server__ = server
+        return server
+
+    def opencase(self, casepath='', buscap=80000):
+        """Opens PSS/E case. PSS/E is initialized with psseinit(buscap) only
+        the first time a case is opened in the process, or when a larger bus
+        capacity is requested."""
         if casepath == '':
             root = tk.Tk()
             casepath = tkFileDialog.askopenfilename(title='Select PSS/E case',
@@ -308,7 +543,18 @@ class pypsse(object):
             root.destroy()
 
         self.support_file_path = os.path.splitext(casepath)[0]
-        psspy.psseinit(80000)
+        self.clear_checkpoints()
+        self.__case_version__ += 1
+        self.__applied_changes__ = {}
+        try:
+            stat = os.stat(casepath)
+            self.__case_token__ = '{}|{}|{}'.format(os.path.abspath(casepath),
+                                                    stat.st_size, stat.st_mtime)
+        except OSError:
+            self.__case_token__ = os.path.abspath(casepath)
+        if buscap > _psse_state['buscap']:
+            psspy.psseinit(buscap)
+            _psse_state['buscap'] = buscap
         if os.path.splitext(casepath)[1].lower() == '.raw':
             # version = input('PSS/E version (number 15-34) > ')
 
@@ -358,24 +604,112 @@ class pypsse(object):
     def solvecase(self, method='FNSL', options=[0, 0, 0, 0, 0, 0, 0, 0]):
         """Solves the case with the specified method and options. Returns
         False if the case does not solve, True if the case solves."""
+        ierr = self.__solve__(method, options)
+        if ierr:
+            self.error_message += (
+                'Error solving case. API \'{}\' code {}/n'.format(
+                    method.lower(), ierr))
+            return False
+        return True
+
+    def __solve__(self, method='FNSL', options=[0, 0, 0, 0, 0, 0, 0, 0]):
+        """Internal function runs the solution API, records it in the metrics
+        and returns the 'solved' code. Raises ValueError for an invalid
+        method."""
         methods = ['FNSL', 'FDNS']
         if method not in methods:
             raise ValueError(
                 'Invalid method \'{}\'. Expected one of: {}/n'.format(method,
                                                                       methods))
-            return False
-        if method == 'FNSL':
-            app = psspy.fnsl
-        elif method == 'FDNS':
-            app = psspy.fdns
+        app = psspy.fnsl if method == 'FNSL' else psspy.fdns
+        start = time.time()
         app(options)
         ierr = psspy.solved()
+        now = time.time()
+        self.metrics['pypsse_solves_total'].inc(method=method)
         if ierr:
-            self.error_message += (
-                'Error solving case. API \'{}\' code {}/n'.format(
-                    method.lower(), ierr))
-            return False
-        return True
+            self.metrics['pypsse_solve_failures_total'].inc(method=method)
+        self.metrics['pypsse_solve_seconds'].observe(now - start)
+        self.metrics['pypsse_last_activity_timestamp_seconds'].set(now)
+        return ierr
+
+    def solvecase_cached(self, cache, results=None, method='FNSL',
+                         options=[0, 0, 0, 0, 0, 0, 0, 0], resolution=None):
+        """Solves the case unless an identical state is in the SolvedStateCache.
+        The state is keyed by the opened case and the changes applied through
+        pypsse since it was opened (machine PGEN, load P/Q and status, new
+        buses and machines). If resolution is given, changed values are rounded
+        to it so near-identical states share a key. results is a dict of
+        element family to fields, by default bus PU/ANGLED and branch P/Q.
+        Returns a dict of family to dicts of arrays, or None if the case does
+        not solve. A cache hit skips both the solve and the retrieval, so the
+        case itself is left unsolved. The key includes results, method and
+        options, so a different query never returns another query's entry."""
+        if results is None:
+            results = {'BUS': ['NUMBER', 'PU', 'ANGLED'],
+                       'BRN': ['FROMNUMBER', 'TONUMBER', 'ID', 'P', 'Q']}
+        query = (method, list(options),
+                 sorted((f, list(v)) for f, v in results.items()))
+        key = cache.key(self.__case_token__, self.__applied_changes__,
+                        resolution, query)
+        arrays = cache.get(key)
+        if arrays is not None:
+            return arrays
+        if not self.solvecase(method=method, options=options):
+            return None
+        arrays = {}
+        for family, fields in results.items():
+            arrays[family] = self.__fetch_arrays__(family, fields)
+            if arrays[family] is None:
+                return None
+        cache.put(key, arrays)
+        return arrays
+
+    def run_study(self, study):
+        """Runs one study: opens study['case'] (or returns to it if it is already
+        open), applies study['changes'], solves with study['method'] and
+        returns the study['results'] fields as a dict of element family to
+        dicts of arrays. Changes are lists of ['MACH', bus, id, pgen] or
+        ['LOAD', bus, id, pload, qload, status] (None leaves a value
+        unchanged). The opened case is checkpointed as STUDYBASE so that the
+        next study on the same case starts with a rollback instead of a reload.
+        Raises RuntimeError if the case cannot be opened or solved."""
+        casepath = os.path.abspath(study['case'])
+        # the case is reopened if the rollback to STUDYBASE fails
+        if not (self.__case_token__.split('|')[0] == casepath and
+                'STUDYBASE' in self.__checkpoints__ and
+                self.rollback('STUDYBASE')):
+            if not self.opencase(casepath):
+                raise RuntimeError('Case {} not opened: {}'.format(
+                    casepath, self.error_message))
+            self.checkpoint('STUDYBASE')
+        for change in study.get('changes', []):
+            if change[0] == 'MACH':
+                ierr = self.dispatch_gen(change[1], str(change[2]), change[3],
+                                         solve=False)
+            elif change[0] == 'LOAD':
+                vals = [_f if v is None else v for v in change[3:5]]
+                ierr = self.__change_load__(change[1], str(change[2]), vals[0],
+                                            vals[1], *change[5:6])
+            else:
+                raise ValueError('Invalid change type \'{}\''.format(change[0]))
+            if ierr:
+                raise RuntimeError('Change {} not applied: {}'.format(
+                    change, self.error_message))
+        if not self.solvecase(method=study.get('method', 'FNSL')):
+            raise RuntimeError('Case {} did not solve: {}'.format(
+                casepath, self.error_message))
+        results = study.get('results')
+        if results is None:
+            results = {'BUS': ['NUMBER', 'PU', 'ANGLED'],
+                       'BRN': ['FROMNUMBER', 'TONUMBER', 'ID', 'P', 'Q']}
+        arrays = {}
+        for family, fields in results.items():
+            arrays[family] = self.__fetch_arrays__(family, fields)
+            if arrays[family] is None:
+                raise RuntimeError('Results not retrieved: {}'.format(
+                    self.error_message))
+        return arrays
 
     def savecaseas(self, path):
         ierr = psspy.save(path)
@@ -385,6 +719,183 @@ class pypsse(object):
         else:
             return True
 
+    ###############################################################################
+    ##### checkpoint methods journal the mutations made through pypsse so the #####
+    ##### case can be returned to an earlier state without a save and reload ######
+    ###############################################################################
+    def checkpoint(self, name=None, voltages=False):
+        """Marks the current case state so that it can be restored by rollback.
+        Every mutation made through pypsse after the first checkpoint is
+        journaled with its inverse API calls. Mutations without a known inverse
+        (e.g. ltap, splt) take a .sav snapshot in SNAPSHOT_LOCATION instead.
+        If voltages is True, the bus voltages are recorded so that the solved
+        state is restored as well. That costs a retrieval of every bus voltage
+        on checkpoint and rollback, and a bus_chng_3 call per bus whose
+        voltage changed, which after a solve is nearly every bus (O(nbus) API
+        calls), so it is off by default. Returns the checkpoint name.
+
+        Only the mutations in _JOURNALED_MUTATIONS are undone. Any other
+        mutation observed through pypsse makes rollback fail unless a snapshot
+        precedes it. Changes made directly through psspy are not seen; call
+        journal_snapshot before making them. Subsystem definitions (e.g.
+        create_sid) are not restored."""
+        if name is None:
+            n = len(self.__checkpoints__) + 1
+            while 'CHECKPOINT{}'.format(n) in self.__checkpoints__:
+                n += 1
+            name = 'CHECKPOINT{}'.format(n)
+        vsnap = None
+        if voltages:
+            vsnap = self.__get_voltages__()
+        self.__checkpoints__[name] = (len(self.__journal__), vsnap,
+                                      dict(self.__applied_changes__))
+        return name
+
+    def rollback(self, name=None):
+        """Restores the case to the state recorded by the named checkpoint (the
+        most recent checkpoint by default). Inverse API calls are applied in
+        reverse order; if a snapshot was taken after the checkpoint, the
+        earliest one is reloaded first. Checkpoints made after the named
+        checkpoint are discarded. Returns False if any API call fails or if a
+        mutation without an inverse was made before the first snapshot."""
+        if not self.__checkpoints__:
+            self.error_message += 'Error rolling back case. No checkpoint has been made.\n'
+            return False
+        if name is None:
+            name = list(self.__checkpoints__.keys())[-1]
+        if name not in self.__checkpoints__:
+            raise ValueError(
+                'Invalid checkpoint \'{}\'. Expected one of: {}\n'.format(
+                    name, list(self.__checkpoints__.keys())))
+        position, vsnap, changes = self.__checkpoints__[name]
+        entries = self.__journal__[position:]
+        self.__case_version__ += 1
+        success = True
+        snapshots = [n for n, e in enumerate(entries) if e[0] == 'snapshot']
+        if snapshots:
+            ierr = psspy.case(entries[snapshots[0]][1])
+            if ierr:
+                self.error_message += 'Error restoring snapshot. API \'case\' error code {}\n'.format(
+                    ierr)
+                return False
+            undo = entries[:snapshots[0]]
+        else:
+            undo = entries
+        lost = [e[1] for e in undo if e[0] == 'unjournaled']
+        if lost:
+            self.error_message += 'Error rolling back case. Mutations {} have no inverse.\n'.format(
+                lost)
+            success = False
+        for kind, calls in reversed(undo):
+            if kind != 'inverse':
+                continue
+            for api, args, kwargs in calls:
+                ierr = getattr(psspy, api)(*args, **kwargs)
+                if isinstance(ierr, tuple):
+                    ierr = ierr[0]
+                if ierr:
+                    self.error_message += 'Error rolling back case. API \'{}\' error code {}\n'.format(
+                        api, ierr)
+                    success = False
+        for kind, path in [e for e in entries if e[0] == 'snapshot']:
+            self.__delete_snapshot__(path)
+        del self.__journal__[position:]
+        names = list(self.__checkpoints__.keys())
+        for k in names[names.index(name) + 1:]:
+            del self.__checkpoints__[k]
+        self.__applied_changes__ = dict(changes)
+        if vsnap is not None:
+            success = self.__set_voltages__(vsnap) and success
+        return success
+
+    def clear_checkpoints(self):
+        """Discards all checkpoints, the undo journal and any snapshots."""
+        for kind, path in [e for e in self.__journal__ if e[0] == 'snapshot']:
+            self.__delete_snapshot__(path)
+        self.__journal__ = []
+        self.__checkpoints__ = OrderedDict()
+        return True
+
+    def __journal_inverse__(self, calls):
+        """Internal function records the API calls which undo a mutation. Calls
+        are (api name, args, kwargs) tuples. Nothing is recorded unless a
+        checkpoint exists."""
+        if self.__checkpoints__:
+            self.__journal__.append(('inverse', calls))
+
+    def journal_snapshot(self):
+        """Saves a snapshot of the case which rollback reloads. Call it after
+        a checkpoint and before changing the case directly through psspy.
+        Returns False if the case could not be saved."""
+        return self.__journal_snapshot__()
+
+    def __journal_snapshot__(self):
+        """Internal function saves the case before a mutation whose inverse is
+        unknown. Nothing is saved unless a checkpoint exists, and consecutive
+        unknown mutations share one snapshot."""
+        if not self.__checkpoints__:
+            return True
+        if self.__journal__ and self.__journal__[-1][0] == 'snapshot':
+            return True
+        fd, path = tempfile.mkstemp(suffix='.sav', prefix='pypsse',
+                                    dir=SNAPSHOT_LOCATION)
+        os.close(fd)
+        ierr = psspy.save(path)
+        if ierr:
+            self.error_message += 'Error saving snapshot. API \'save\' error code {}\n'.format(
+                ierr)
+            self.__delete_snapshot__(path)
+            return False
+        self.__internally_created_files__.append(path)
+        self.__journal__.append(('snapshot', path))
+        return True
+
+    def __delete_snapshot__(self, path):
+        """Internal function deletes a snapshot file and stops tracking it."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        if path in self.__internally_created_files__:
+            self.__internally_created_files__.remove(path)
+
+    def __get_voltages__(self):
+        """Internal function returns arrays of bus number, PU and ANGLED."""
+        ierr, iarr = psspy.abusint(sid=-1, flag=2, string='NUMBER')
+        if ierr:
+            self.error_message += 'Error retrieving bus numbers. API \'abusint\' error code {}\n'.format(
+                ierr)
+            return None
+        ierr, rarr = psspy.abusreal(sid=-1, flag=2, string=['PU', 'ANGLED'])
+        if ierr:
+            self.error_message += 'Error retrieving bus voltages. API \'abusreal\' error code {}\n'.format(
+                ierr)
+            return None
+        return (np.array(iarr[0], dtype=int), np.array(rarr[0], dtype=float),
+                np.array(rarr[1], dtype=float))
+
+    def __set_voltages__(self, vsnap, tol=1e-6):
+        """Internal function writes recorded bus voltages back to the case. Only
+        buses whose voltage differs from the record by more than tol change."""
+        current = self.__get_voltages__()
+        if current is None:
+            return False
+        common, old, new = np.intersect1d(vsnap[0], current[0],
+                                          assume_unique=True,
+                                          return_indices=True)
+        changed = ((np.abs(vsnap[1][old] - current[1][new]) > tol) |
+                   (np.abs(vsnap[2][old] - current[2][new]) > tol))
+        success = True
+        for n in np.flatnonzero(changed):
+            ierr = psspy.bus_chng_3(int(common[n]),
+                                    realar2=float(vsnap[1][old[n]]),
+                                    realar3=float(vsnap[2][old[n]]))
+            if ierr:
+                self.error_message += 'Error restoring bus {} voltage. API \'bus_chng_3\' error code {}\n'.format(
+                    common[n], ierr)
+                success = False
+        return success
+
     ###############################################################################
     #### create, append, and complete file methods create external files which ####
     #### are required by PSS/E to perform certain functions (e.g. dfax, tltg). ####
@@ -410,7 +921,7 @@ class pypsse(object):
                 self.error_message += 'Error recording subsystem {}. API \'bsysmem\' error code {}'.format(
                     sid, ierr)
                 return False
-            self.__internally_created_files__ += filepath
+            self.__internally_created_files__.append(filepath)
         return True
 
     def create_subfile(self, filepath):
@@ -418,7 +929,7 @@ class pypsse(object):
         text = 'COM\nCOM  Subystem file created through pypsse \nCOM\n'
         with open(filepath, 'w') as f:
             f.write(text)
-        self.__internally_created_files__ += filepath
+        self.__internally_created_files__.append(filepath)
         return True
 
     def append_subfile(self, filepath, subname, buslist=[], arealist=[],
@@ -448,7 +959,7 @@ class pypsse(object):
         text = 'COM\nCOM  Contingency file created through pypsse \nCOM\n'
         with open(filepath, 'w') as f:
             f.write(text)
-        self.__internally_created_files__ += filepath
+        self.__internally_created_files__.append(filepath)
         return True
 
     def append_confile(self, filepath, subname, desc='SINGLE',
@@ -462,7 +973,7 @@ class pypsse(object):
         text = 'COM\nCOM  Monitored element file created through pypsse \nCOM\n'
         with open(filepath, 'w') as f:
             f.write(text)
-        self.__internally_created_files__ += filepath
+        self.__internally_created_files__.append(filepath)
         return True
 
     def append_monfile(self, filepath, sublist, midtext='BRANCHES IN',
@@ -482,6 +993,22 @@ class pypsse(object):
             f.write(text)
         return True
 
+    def subfile_builder(self, filepath):
+        """Returns a SubsystemFileBuilder writing filepath, registered for
+        deletion with the other created files."""
+        return SubsystemFileBuilder(filepath, self.__internally_created_files__)
+
+    def monfile_builder(self, filepath):
+        """Returns a MonitorFileBuilder writing filepath, registered for
+        deletion with the other created files."""
+        return MonitorFileBuilder(filepath, self.__internally_created_files__)
+
+    def confile_builder(self, filepath):
+        """Returns a ContingencyFileBuilder writing filepath, registered for
+        deletion with the other created files."""
+        return ContingencyFileBuilder(filepath,
+                                      self.__internally_created_files__)
+
     def create_dfax(self, filepath, subfilepath, monfilepath, confilepath,
                     options=[_i, _i]):
         ierr = psspy.dfax(options, subfilepath, monfilepath, confilepath,
@@ -490,7 +1017,7 @@ class pypsse(object):
             self.error_message += 'Error creating Distribution Factor file. API \'dfax\' error code {}\n'.format(
                 ierr)
             return False
-        self.__internally_created_files__ += filepath
+        self.__internally_created_files__.append(filepath)
         return True
 
     ###############################################################################
@@ -646,6 +1173,7 @@ class pypsse(object):
         The kwargs are for the arrapp."""
         ierr, arr = arrapp(*args, **kwargs)
         data = arr[0]
+        self.__observe_fetch__(arrapp, [data])
         if dtype == str and data is not None:
             data = [str(x).strip() for x in data]
         if ierr:
@@ -664,9 +1192,84 @@ class pypsse(object):
         print(data)
         return df.copy()
 
+    def __lazy_frame__(self, family, sid, datafields, flag, keys):
+        """Internal function returns the LazyFrame of a get_multiple method.
+        keys are the requested (bus,) or (ibus, jbus, ckt) or (ibus, jbus,
+        kbus) tuples, used if no SID is given."""
+        fields = list(datafields) or self.__family_fields__(family)
+        keyfields = LazyFrame.KEYS[family]
+        if family in ('BRN', 'TRN', 'TR3'):
+            fields += [c for c in keyfields if c not in fields]
+        keys = list(keys)
+        if sid:
+            return LazyFrame(self, family, fields, sid=sid, flag=flag)
+        buslist = []
+        for key in keys:
+            for b in key[:len(keyfields) if family == 'TR3' else 2]:
+                if isinstance(b, (int, long, np.integer)) and b not in buslist:
+                    buslist.append(int(b))
+        return LazyFrame(self, family, fields, buslist=buslist, flag=flag,
+                         keys=keys)
+
+    def __observe_fetch__(self, app, arr):
+        """Internal function records an array API call in the metrics."""
+        name = getattr(app, '__name__', str(app))
+        values = 0
+        if arr is not None:
+            values = sum(len(a) for a in arr if a is not None)
+        self.metrics['pypsse_fetch_calls_total'].inc(api=name)
+        self.metrics['pypsse_fetch_values_total'].inc(values, api=name)
+        self.metrics['pypsse_last_activity_timestamp_seconds'].set(time.time())
+
+    def __fetch_arrays__(self, family, datafields, sid=-1, flag=2, ties=None):
+        """Internal function retrieves datafields of an element family ('BUS',
+        'BRN', 'TRN', 'TR3', 'MACH' or 'LOAD') as an ordered dict of numpy
+        arrays. Makes one array API call per PSS/E data type rather than one per
+        field. ties is passed to the array APIs of branch and transformer
+        families if given (1 for elements inside the SID, 3 to include those
+        with any terminal in it). Unrecognized fields are dropped. Returns None
+        on an API error."""
+        prefix = _ARRAY_APIS[family]
+        datafields = list(datafields)
+        ierr, dtypes = getattr(psspy, prefix + 'types')(datafields)
+        while ierr in range(1, len(datafields) + 1):
+            self.error_message += 'Error determining data types: API \'{}types\' does not recognize datafield {}. Proceeding without this field.'.format(
+                prefix, datafields[ierr - 1])
+            datafields.remove(datafields[ierr - 1])
+            ierr, dtypes = getattr(psspy, prefix + 'types')(datafields)
+        if ierr:
+            self.error_message += 'Error determining data types: API \'{}types\' error code {}\n'.format(
+                prefix, ierr)
+            return None
+        kwargs = {} if ties is None else {'ties': ties}
+        arrays = {}
+        for code in ['I', 'R', 'X', 'C']:
+            flds = [f for f, t in zip(datafields, dtypes) if t == code]
+            if not flds:
+                continue
+            suffix, dtype = _ARRAY_TYPES[code]
+            app = getattr(psspy, prefix + suffix)
+            ierr, arr = app(sid=sid, flag=flag, string=flds, **kwargs)
+            self.__observe_fetch__(app, arr)
+            if ierr:
+                self.error_message += 'Error retrieving {} data: \nAPI \'{}\' error code {}.\n'.format(
+                    flds, prefix + suffix, ierr)
+                return None
+            for fld, data in zip(flds, arr):
+                if data is None:
+                    data = []
+                if dtype == str:
+                    data = [str(x).strip() for x in data]
+                arrays[fld] = np.array(data, dtype=dtype)
+        return OrderedDict((f, arrays[f]) for f in datafields if f in arrays)
+
     def get_multiple_bus_data(self, sid=None, ibuslist=[], datafields=[],
-                              flag=2):
-        """Returns a dataframe of bus data for buses in the specified SID or bus list. If the field is invalid, returns NaN for that column."""
+                              flag=2, lazy=False):
+        """Returns a dataframe of bus data for buses in the specified SID or bus list. If the field is invalid, returns NaN for that column.
+        If lazy is True, returns a LazyFrame which retrieves each column on first access."""
+        if lazy:
+            return self.__lazy_frame__('BUS', sid, datafields, flag,
+                                       [(b,) for b in ibuslist])
         if not datafields:
             for k in self.A_BUS_FIELDS.keys():
                 datafields += self.A_BUS_FIELDS[k]
@@ -710,12 +1313,16 @@ class pypsse(object):
         return df
 
     def get_multiple_branch_data(self, sid=None, ibuslist=[], jbuslist=[],
-                                 cktlist=[], datafields=[], flag=4):
-        """Returns a dataframe of branch data for branches in the specified SID or bus lists. If the field is invalid, returns NaN for that column."""
+                                 cktlist=[], datafields=[], flag=4, lazy=False):
+        """Returns a dataframe of branch data for branches in the specified SID or bus lists. If the field is invalid, returns NaN for that column.
+        If lazy is True, returns a LazyFrame which retrieves each column on first access."""
         # data check
         if len(ibuslist) != len(jbuslist) or len(jbuslist) != len(cktlist):
             raise ValueError(
                 'Dimensions of ibuslist, jbuslist, and cktlist must be the same')
+        if lazy:
+            return self.__lazy_frame__('BRN', sid, datafields, flag,
+                                       zip(ibuslist, jbuslist, cktlist))
         if not datafields:
             for k in self.A_BRN_FIELDS.keys():
                 datafields += self.A_BRN_FIELDS[k]
@@ -782,12 +1389,16 @@ class pypsse(object):
         return df
 
     def get_multiple_trn_data(self, sid=None, ibuslist=[], jbuslist=[],
-                              cktlist=[], datafields=[], flag=4):
-        """Returns a dataframe of branch data for branches in the specified SID or bus lists. If the field is invalid, returns NaN for that column."""
+                              cktlist=[], datafields=[], flag=4, lazy=False):
+        """Returns a dataframe of branch data for branches in the specified SID or bus lists. If the field is invalid, returns NaN for that column.
+        If lazy is True, returns a LazyFrame which retrieves each column on first access."""
         # data check
         if len(ibuslist) != len(jbuslist) or len(jbuslist) != len(cktlist):
             raise ValueError(
                 'Dimensions of ibuslist, jbuslist, and cktlist must be the same')
+        if lazy:
+            return self.__lazy_frame__('TRN', sid, datafields, flag,
+                                       zip(ibuslist, jbuslist, cktlist))
         if not datafields:
             for k in self.A_BRN_FIELDS.keys():
                 datafields += self.A_BRN_FIELDS[k]
@@ -852,12 +1463,16 @@ class pypsse(object):
         return df
 
     def get_multiple_tr3_data(self, sid=None, ibuslist=[], jbuslist=[],
-                              kbuslist=[], datafields=[], flag=2):
-        """Returns a dataframe of three winding transformers as specified in the buslist or in the SID"""
+                              kbuslist=[], datafields=[], flag=2, lazy=False):
+        """Returns a dataframe of three winding transformers as specified in the buslist or in the SID
+        If lazy is True, returns a LazyFrame which retrieves each column on first access."""
         # data check
         if len(ibuslist) != len(jbuslist) or len(jbuslist) != len(kbuslist):
             raise ValueError(
                 'Dimensions of ibuslist, jbuslist, and cktlist must be the same')
+        if lazy:
+            return self.__lazy_frame__('TR3', sid, datafields, flag,
+                                       zip(ibuslist, jbuslist, kbuslist))
         if not datafields:
             for k in self.A_TR3_FIELDS.keys():
                 datafields += self.A_TR3_FIELDS[k]
@@ -913,8 +1528,12 @@ class pypsse(object):
         return df
 
     def get_multiple_machine_data(self, sid=None, buslist=[], datafields=[],
-                                  flag=4):
-        """Returns a dataframe of machine data for machines in the specified SID or bus list. If the field is invalid, returns NaN for that column."""
+                                  flag=4, lazy=False):
+        """Returns a dataframe of machine data for machines in the specified SID or bus list. If the field is invalid, returns NaN for that column.
+        If lazy is True, returns a LazyFrame which retrieves each column on first access."""
+        if lazy:
+            return self.__lazy_frame__('MACH', sid, datafields, flag,
+                                       [(b,) for b in buslist])
         if not datafields:
             for k in self.A_MACH_FIELDS.keys():
                 datafields += self.A_MACH_FIELDS[k]
@@ -963,8 +1582,12 @@ class pypsse(object):
         return df
 
     def get_multiple_load_data(self, sid=None, buslist=[], datafields=[],
-                               flag=4):
-        """Returns a dataframe of load data for loads in the specified SID or bus list. If the field is invalid, returns NaN for that column."""
+                               flag=4, lazy=False):
+        """Returns a dataframe of load data for loads in the specified SID or bus list. If the field is invalid, returns NaN for that column.
+        If lazy is True, returns a LazyFrame which retrieves each column on first access."""
+        if lazy:
+            return self.__lazy_frame__('LOAD', sid, datafields, flag,
+                                       [(b,) for b in buslist])
         if not datafields:
             for k in self.A_LOAD_FIELDS.keys():
                 datafields += self.A_LOAD_FIELDS[k]
@@ -1006,10 +1629,363 @@ class pypsse(object):
         df.index.name = 'NUMBER'
         return df
 
+    def __family_fields__(self, family):
+        """Internal function returns every array API field of a family."""
+        catalog = {'BUS': self.A_BUS_FIELDS, 'BRN': self.A_BRN_FIELDS,
+                   'TRN': self.A_TRN_FIELDS, 'TR3': self.A_TR3_FIELDS,
+                   'MACH': self.A_MACH_FIELDS, 'LOAD': self.A_LOAD_FIELDS}
+        fields = []
+        for k in ['Integer', 'Real', 'Complex', 'Character']:
+            fields += [f for f in catalog[family].get(k, []) if f not in fields]
+        return fields
+
+    def scan_violations(self, scanner, run, sid=-1):
+        """Retrieves branch and transformer loadings and bus voltages in the
+        specified SID and passes them to a ViolationScanner as run. Returns the
+        number of violations found. For repeated scans, pass ResultTables
+        refreshed after each solve to ViolationScanner.scan instead."""
+        brnfields = ['FROMNUMBER', 'TONUMBER', 'ID', scanner.rating]
+        brn = self.__fetch_arrays__('BRN', brnfields, sid=sid, flag=2)
+        trn = self.__fetch_arrays__('TRN', brnfields, sid=sid, flag=2)
+        bus = self.__fetch_arrays__('BUS', ['NUMBER', 'PU'] +
+                                    list(scanner.voltage_limits), sid=sid,
+                                    flag=2)
+        if brn is None or trn is None or bus is None:
+            return None
+        return scanner.scan(run, brn=brn, trn=trn, bus=bus)
+
+    def publish_table(self, publisher, family, datafields=[], sid=-1,
+                      flag=None, name=None):
+        """Retrieves datafields (every field by default) of a family and
+        publishes them with a SharedTablePublisher under name (the family by
+        default). Returns the new generation, or None on an API error."""
+        if not datafields:
+            datafields = self.__family_fields__(family)
+        if flag is None:
+            flag = _DEFAULT_FLAGS[family]
+        arrays = self.__fetch_arrays__(family, datafields, sid=sid, flag=flag)
+        if arrays is None:
+            return None
+        return publisher.publish(name or family, arrays)
+
+    def get_result_table(self, family, datafields=[], sid=-1, buslist=[],
+                         flag=None):
+        """Returns a ResultTable of datafields (every field by default) for the
+        elements of a family ('BUS', 'BRN', 'TRN', 'TR3', 'MACH' or 'LOAD') in
+        the specified SID or bus list. After a solve, ResultTable.refresh
+        re-pulls only the solution dependent fields in place."""
+        if not datafields:
+            datafields = self.__family_fields__(family)
+        if flag is None:
+            flag = _DEFAULT_FLAGS[family]
+        return ResultTable(self, family, datafields, sid=sid, buslist=buslist,
+                           flag=flag)
+
+    def query(self, family, datafields, where=None, areas=None, zones=None,
+              owners=None, basekv=None, flag=None):
+        """Returns a dataframe of datafields for the elements of a family ('BUS',
+        'BRN', 'TRN', 'TR3', 'MACH' or 'LOAD') matching the where predicates.
+
+        where maps a field to a value (equality), a list or set of values, a
+        tuple (op, value) with op in ==, !=, <, <=, >, >=, in, or
+        ('between', low, high), or a function of the array returning a mask.
+        Bus constraints are pushed down into subsystem 11 with bsys: areas,
+        zones, owners and basekv (a (low, high) tuple) apply to any family,
+        and for BUS and LOAD queries they are also taken from predicates on
+        AREA, ZONE, OWNER and BASE. Only the predicate and key fields are
+        retrieved for the subsystem; the projected fields are then retrieved
+        for subsystem 11 redefined to the buses of the matching rows, so their
+        cost follows the size of the result. BUS, MACH and LOAD results are
+        indexed by NUMBER. Raises ValueError for a where field the family does
+        not have."""
+        where = dict(where or {})
+        if flag is None:
+            flag = _DEFAULT_FLAGS[family]
+        if family in ('BUS', 'LOAD'):
+            areas = areas or _pushdown_values(where.get('AREA'))
+            zones = zones or _pushdown_values(where.get('ZONE'))
+            owners = owners or _pushdown_values(where.get('OWNER'))
+            basekv = basekv or _pushdown_range(where.get('BASE'))
+        sid = -1
+        if areas or zones or owners or basekv:
+            sid = 11
+            areas = list(areas or [])
+            zones = list(zones or [])
+            owners = list(owners or [])
+            ierr = psspy.bsys(sid=sid, usekv=int(bool(basekv)),
+                              basekv=list(basekv or [0.0, 0.0]),
+                              numarea=len(areas), areas=areas,
+                              numbus=0, buses=[],
+                              numowner=len(owners), owners=owners,
+                              numzone=len(zones), zones=zones)
+            if ierr:
+                self.error_message += 'Bus system not created for query. API \'bsys\' error code {}.'.format(
+                    ierr)
+                return pd.DataFrame(columns=datafields)
+        index = 'NUMBER' if family in ('BUS', 'MACH', 'LOAD') else None
+        keys = _ELEMENT_KEYS[family]
+        first = list(where.keys()) + [k for k in keys if k not in where]
+        arrays = self.__fetch_arrays__(family, first, sid=sid, flag=flag)
+        if arrays is None:
+            return pd.DataFrame(columns=datafields)
+        unknown = [f for f in where if f not in arrays]
+        if unknown:
+            raise ValueError(
+                'Invalid query fields {} for {}'.format(unknown, family))
+        nrows = len(next(iter(arrays.values()))) if arrays else 0
+        mask = np.ones(nrows, dtype=bool)
+        for fld, pred in where.items():
+            mask &= _predicate_mask(arrays[fld], pred)
+        rows = np.flatnonzero(mask)
+        rest = [f for f in datafields if f not in arrays]
+        if len(rows) and rest:
+            arrays = dict((f, arrays[f][rows]) for f in arrays)
+            rows = np.arange(len(rows))
+            more = self.__fetch_matched__(family, arrays, rest, flag)
+            if more is None:
+                return pd.DataFrame(columns=datafields)
+            arrays.update(more)
+        data = OrderedDict()
+        for f in datafields:
+            if f in arrays:
+                data[f] = arrays[f][rows]
+            else:
+                data[f] = np.full(len(rows), np.nan)
+        df = pd.DataFrame(data, columns=datafields)
+        if index:
+            df.index = pd.Index(arrays[index][rows], name=index)
+        return df
+
+    def __fetch_matched__(self, family, matched, datafields, flag):
+        """Internal function retrieves datafields for the elements whose key
+        fields are in matched (a dict of arrays), in the same order. Subsystem
+        11 is redefined to their buses so that only they and their neighbours
+        are retrieved. Fields of elements that are no longer found are NaN.
+        Returns None on an API error."""
+        keys = _ELEMENT_KEYS[family]
+        buses = np.unique(np.concatenate(
+            [matched[k] for k in keys if k != 'ID'])).tolist()
+        ierr = psspy.bsys(sid=11, numbus=len(buses), buses=buses)
+        if ierr:
+            self.error_message += 'Bus system not created for query. API \'bsys\' error code {}.'.format(
+                ierr)
+            return None
+        more = self.__fetch_arrays__(family, list(datafields) + keys, sid=11,
+                                     flag=flag)
+        if more is None:
+            return None
+        position = dict((k, n) for n, k in enumerate(
+            zip(*[more[k].tolist() for k in keys])))
+        take = np.array([position.get(k, -1) for k in
+                         zip(*[matched[k].tolist() for k in keys])], dtype=int)
+        found = take >= 0
+        out = OrderedDict()
+        for f in datafields:
+            if f not in more:
+                continue
+            arr = more[f][np.maximum(take, 0)]
+            if not found.all():
+                arr = arr.astype(object)
+                arr[~found] = np.nan
+            out[f] = arr
+        return out
+
     ###############################################################################
     ###### Specialized get functions do not have corresponding PSSE APIs and ######
     ### so achieve their pull using available APIs and some data manipulations ####
     ###############################################################################
+    def get_network_model(self, datafields=None, sid=-1):
+        """Returns a NetworkModel of the buses, branches, two and three winding
+        transformers, three winding transformer windings, machines, loads and
+        fixed shunts in the specified SID. datafields maps a family to the
+        fields to retrieve for it; families not given use the _MODEL_FIELDS
+        defaults. The regulated bus (IREG) and scheduled voltage (VSPU) of
+        each machine's plant are added to the machine table. Returns None on
+        an API error."""
+        datafields = dict(datafields or {})
+        tables = {}
+        for family in NetworkModel.FAMILIES:
+            fields = datafields.get(family, _MODEL_FIELDS[family])
+            tables[family] = self.__fetch_arrays__(family, fields, sid=sid,
+                                                   flag=_MODEL_FLAGS[family])
+            if tables[family] is None:
+                return None
+        plants = self.__fetch_arrays__(
+            'PLANT', datafields.get('PLANT', _MODEL_FIELDS['PLANT']), sid=sid,
+            flag=_MODEL_FLAGS['PLANT'])
+        if plants is None:
+            return None
+        tables['MACH'] = _with_plant_data(tables['MACH'], plants)
+        return NetworkModel(tables, sbase=psspy.sysmva())
+
+    def snapshot(self, families=('BUS', 'BRN', 'TRN', 'MACH', 'LOAD'),
+                 datafields=None, sid=-1):
+        """Returns a CaseSnapshot of the key fields and compared fields of
+        each family in the specified SID. datafields maps a family to the
+        fields to compare; families not given use the _DIFF_FIELDS defaults.
+        Returns None on an API error."""
+        datafields = dict(datafields or {})
+        tables = OrderedDict()
+        for family in families:
+            keys = CaseSnapshot.KEYS[family]
+            fields = [f for f in datafields.get(family, _DIFF_FIELDS[family])
+                      if f not in keys]
+            tables[family] = self.__fetch_arrays__(family, keys + fields,
+                                                   sid=sid,
+                                                   flag=_MODEL_FLAGS[family])
+            if tables[family] is None:
+                return None
+        return CaseSnapshot(tables)
+
+    def changes_since(self, before, thresholds=None, top=None, sid=-1):
+        """Takes a snapshot of the same families and fields as before and
+        returns the SnapshotDiff from before to it (see CaseSnapshot.diff).
+        Returns None on an API error."""
+        after = self.snapshot(families=list(before.tables),
+                              datafields=before.fields(), sid=sid)
+        if after is None:
+            return None
+        return before.diff(after, thresholds=thresholds, top=top)
+
+    def power_flow(self, sid=-1, **kwargs):
+        """Returns an offline PowerFlow of the network model of the specified
+        SID (see get_network_model). kwargs are passed to PowerFlow. Returns
+        None on an API error."""
+        model = self.get_network_model(sid=sid)
+        if model is None:
+            return None
+        return PowerFlow(model, **kwargs)
+
+    def write_raw(self, filepath, rev=33, titles=('', ''), sid=-1):
+        """Writes the working case (with any changes made since it was opened)
+        to a RAW file of revision 33 or 34 without saving it in PSS/E. See
+        write_raw for the data written. Returns True on success."""
+        model = self.get_network_model(sid=sid)
+        if model is None:
+            return False
+        write_raw(model, filepath, rev=rev, titles=titles)
+        return True
+
+    def iter_chunks(self, family, datafields, by='ROWS', chunksize=5000,
+                    flag=None, frame=True, prefetch=0):
+        """Yields (key, chunk) pairs of datafields of an element family for the
+        whole case, one subsystem at a time, so that full case scans run in
+        bounded memory. by='AREA' or 'ZONE' yields one chunk per area or zone
+        (key is its number); by='ROWS' yields chunks of the elements at
+        blocks of chunksize buses in bus number order (key is the block
+        index). Branches and transformers that cross chunks are yielded once,
+        with the chunk of their lowest numbered bus. Chunks are dataframes,
+        or ordered dicts of arrays if frame is False. With prefetch > 0, up to
+        prefetch chunks are retrieved ahead of the consumer in a background
+        thread; do not call other pypsse methods until the iterator is
+        exhausted or closed. Uses SID 11. Raises RuntimeError on an API
+        error."""
+        if by not in ('AREA', 'ZONE', 'ROWS'):
+            raise ValueError('by must be \'AREA\', \'ZONE\' or \'ROWS\'')
+        if flag is None:
+            flag = _DEFAULT_FLAGS[family]
+        chunks = self.__chunks__(family, list(datafields), by, int(chunksize),
+                                 flag, frame)
+        if prefetch:
+            return _prefetch(chunks, prefetch)
+        return chunks
+
+    def __chunks__(self, family, datafields, by, chunksize, flag, frame):
+        """Internal generator of iter_chunks."""
+        terms = NetworkModel.TERMINALS.get(family, ['NUMBER'])
+        if family == 'BUS':
+            terms = ['NUMBER']
+        fields = datafields + [t for t in terms if t not in datafields]
+        if by == 'ROWS':
+            buses = self.__fetch_arrays__('BUS', ['NUMBER'], flag=2)
+            if buses is None:
+                raise RuntimeError('Bus numbers not retrieved: {}'.format(
+                    self.error_message))
+            numbers = np.sort(buses['NUMBER'])
+            groups = ((n, numbers[s:s + chunksize]) for n, s in
+                      enumerate(xrange(0, len(numbers), chunksize)))
+        else:
+            app = psspy.aareaint if by == 'AREA' else psspy.azoneint
+            ierr, keys = app(sid=-1, flag=2, string='NUMBER')
+            if ierr:
+                self.error_message += 'Error retrieving {} numbers: API \'{}\' error code {}.\n'.format(
+                    by.lower(), app.__name__, ierr)
+                raise RuntimeError(self.error_message)
+            groups = ((k, None) for k in keys[0])
+        for key, members in groups:
+            if by == 'ROWS':
+                kw = {'numbus': len(members), 'buses': members.tolist()}
+            elif by == 'AREA':
+                kw = {'numarea': 1, 'areas': [key]}
+            else:
+                kw = {'numzone': 1, 'zones': [key]}
+            ierr = psspy.bsys(sid=11, **kw)
+            if ierr:
+                self.error_message += 'Bus system not created. API \'bsys\' error code {}.'.format(
+                    ierr)
+                raise RuntimeError(self.error_message)
+            # ties=3 includes the elements that cross into other chunks; the
+            # lowest terminal filter below keeps each in one chunk only
+            arrays = self.__fetch_arrays__(family, fields, sid=11, flag=flag,
+                                           ties=3 if len(terms) > 1 else None)
+            if arrays is None:
+                raise RuntimeError('Chunk {} not retrieved: {}'.format(
+                    key, self.error_message))
+            if len(terms) > 1:
+                if members is None:
+                    buses = self.__fetch_arrays__('BUS', ['NUMBER'], sid=11,
+                                                  flag=2)
+                    if buses is None:
+                        raise RuntimeError('Chunk {} not retrieved: {}'.format(
+                            key, self.error_message))
+                    members = buses['NUMBER']
+                ends = np.min([arrays[t] for t in terms], axis=0)
+                keep = np.in1d(ends, members)
+                arrays = OrderedDict((f, v[keep]) for f, v in arrays.items())
+            arrays = OrderedDict((f, arrays[f]) for f in datafields
+                                 if f in arrays)
+            yield key, pd.DataFrame(arrays) if frame else arrays
+
+    def get_bus_name_index(self, refresh=False):
+        """Returns a BusNameIndex of the bus NAME and EXNAME fields, built from
+        one retrieval and reused until the case is changed through pypsse
+        (opencase, rollback or a create, dispatch or change method). Use
+        refresh=True after changing bus names through psspy directly.
+        Returns None on an API error."""
+        cached = self.__name_index__
+        if refresh or cached is None or cached[0] != self.__case_version__:
+            arrays = self.__fetch_arrays__('BUS', ['NUMBER', 'NAME', 'EXNAME'],
+                                           flag=2)
+            if arrays is None:
+                return None
+            self.__name_index__ = (self.__case_version__, BusNameIndex(
+                arrays['NUMBER'], arrays['NAME'], arrays['EXNAME']))
+        return self.__name_index__[1]
+
+    def bus_numbers(self, names, field='NAME', match='exact'):
+        """Resolves bus names to numbers with the BusNameIndex, see
+        BusNameIndex.lookup."""
+        index = self.get_bus_name_index()
+        if index is None:
+            return None
+        return index.lookup(names, field=field, match=match)
+
+    def get_topology(self):
+        """Returns a Topology of the case built from the bus, branch, two winding
+        and three winding transformer arrays, including out of service elements
+        so that their status may be toggled later."""
+        bus = self.__fetch_arrays__('BUS', ['NUMBER', 'TYPE'], flag=2)
+        brn = self.__fetch_arrays__('BRN', ['FROMNUMBER', 'TONUMBER', 'ID',
+                                            'STATUS'], flag=2)
+        trn = self.__fetch_arrays__('TRN', ['FROMNUMBER', 'TONUMBER', 'ID',
+                                            'STATUS'], flag=2)
+        tr3 = self.__fetch_arrays__('TR3', ['WIND1NUMBER', 'WIND2NUMBER',
+                                            'WIND3NUMBER', 'ID', 'STATUS'],
+                                    flag=2)
+        if bus is None or brn is None or trn is None or tr3 is None:
+            return None
+        return Topology(bus, brn, trn, tr3)
+
     def __get_next_node__(self, br_df, trn_df, tr3_df, busnum):
         df = br_df[
             (br_df['FROMNUMBER'] == busnum) | (br_df['TONUMBER'] == busnum)]
@@ -1072,12 +2048,9 @@ class pypsse(object):
             newnam = 'NEWBUS{}'.format(newnum)
         if newkv is None:
             newkv = ''
-        ierr = psspy.ltap(frmbus=frmbus, tobus=tobus, ckt=ckt,
-                          fraction=fraction, newnum=newnum, newnam=newnam,
-                          newkv=newkv)
-        if ierr:
-            self.error_message += 'Error splitting bus {} - {}. API \'ltap\' code {}'.format(
-                frmbus, tobus, ierr)
+        self.__journal_snapshot__()
+        self.error_message += self.__tap__(frmbus, tobus, ckt, fraction, newnum,
+                                           newnam, newkv)
         return self.get_multiple_bus_data(ibuslist=[newnum])
 
     def create_bus_from_split(self, bus, newnum=None, newnam=None, newkv=None):
@@ -1096,12 +2069,137 @@ class pypsse(object):
             newnam = 'NEWBUS{}'.format(newnum)
         if not newkv:
             newkv = _f
+        self.__journal_snapshot__()
+        self.error_message += self.__split__(bus, newnum, newnam, newkv)
+        return self.get_multiple_bus_data(ibuslist=[newnum])
+
+    def create_buses_from_taps(self, table):
+        """Bulk version of create_bus_from_tap. table holds one row per tap with
+        columns FROMNUMBER and TONUMBER, and optionally ID (default '1'),
+        FRACTION (default 0.5), NEWNUM, NAME and KV. Bus numbers are reserved
+        once for rows without a NEWNUM, rows are applied in order (so a later
+        row may tap a section created by an earlier one) and the new buses are
+        retrieved once. Returns a dataframe of the new buses with FROMNUMBER,
+        TONUMBER, CKT and ERROR columns; a tap that fails is reported in its
+        ERROR field instead of aborting the batch."""
+        table = pd.DataFrame(table).reset_index(drop=True)
+        for c in ['FROMNUMBER', 'TONUMBER']:
+            if c not in table.columns:
+                raise ValueError('Tap table must have a {} column'.format(c))
+        newnums = self.__new_bus_numbers__(table)
+        if newnums is None:
+            return pd.DataFrame()
+        self.__journal_snapshot__()
+        ckts = []
+        errors = []
+        for n in xrange(len(newnums)):
+            ckt = self.__table_value__(table, 'ID', n, '1')
+            ckts.append(str(ckt))
+            errors.append(self.__tap__(
+                int(table['FROMNUMBER'][n]), int(table['TONUMBER'][n]),
+                str(ckt), float(self.__table_value__(table, 'FRACTION', n, 0.5)),
+                newnums[n], self.__table_value__(table, 'NAME', n,
+                                                 'NEWBUS{}'.format(newnums[n])),
+                float(self.__table_value__(table, 'KV', n, _f))))
+        df, errors = self.__new_bus_frame__(newnums, errors)
+        df['FROMNUMBER'] = pd.Series(index=df.index,
+                                     data=table['FROMNUMBER'].tolist())
+        df['TONUMBER'] = pd.Series(index=df.index,
+                                   data=table['TONUMBER'].tolist())
+        df['CKT'] = pd.Series(index=df.index, data=ckts)
+        df['ERROR'] = pd.Series(index=df.index, data=errors)
+        return df
+
+    def create_buses_from_splits(self, table):
+        """Bulk version of create_bus_from_split. table holds one row per split
+        with a BUS column, and optionally NEWNUM, NAME and KV, or is a list of
+        bus numbers. Bus numbers are reserved once for rows without a NEWNUM
+        and the new buses are retrieved once. Returns a dataframe of the new
+        buses with SPLIT and ERROR columns; a split that fails is reported in
+        its ERROR field instead of aborting the batch."""
+        if not isinstance(table, (pd.DataFrame, dict)):
+            table = {'BUS': list(table)}
+        table = pd.DataFrame(table).reset_index(drop=True)
+        if 'BUS' not in table.columns:
+            raise ValueError('Split table must have a BUS column')
+        newnums = self.__new_bus_numbers__(table)
+        if newnums is None:
+            return pd.DataFrame()
+        self.__journal_snapshot__()
+        errors = []
+        for n in xrange(len(newnums)):
+            errors.append(self.__split__(
+                int(table['BUS'][n]), newnums[n],
+                self.__table_value__(table, 'NAME', n,
+                                     'NEWBUS{}'.format(newnums[n])),
+                float(self.__table_value__(table, 'KV', n, _f))))
+        df, errors = self.__new_bus_frame__(newnums, errors)
+        df['SPLIT'] = pd.Series(index=df.index, data=table['BUS'].tolist())
+        df['ERROR'] = pd.Series(index=df.index, data=errors)
+        return df
+
+    def __new_bus_numbers__(self, table):
+        """Internal function returns the NEWNUM column of a table with bus
+        numbers reserved for the rows that have none, or None if the bus
+        numbers could not be retrieved."""
+        if 'NEWNUM' in table.columns:
+            newnums = table['NEWNUM'].tolist()
+        else:
+            newnums = [None] * len(table.index)
+        missing = [n for n in xrange(len(newnums)) if
+                   not newnums[n] or pd.isnull(newnums[n])]
+        reserved = self.__reserve_bus_numbers__(len(missing))
+        if len(reserved) < len(missing):
+            return None
+        for n, num in zip(missing, reserved):
+            newnums[n] = num
+        return [int(b) for b in newnums]
+
+    def __new_bus_frame__(self, newnums, errors):
+        """Internal function retrieves the buses created by a bulk method.
+        Returns the dataframe and the errors. If the retrieval fails, the
+        dataframe holds only the bus numbers and the failure is added to each
+        error."""
+        df = self.get_multiple_bus_data(ibuslist=newnums)
+        if len(df.index) != len(newnums):
+            df = pd.DataFrame(index=pd.Index(newnums, name='NUMBER'))
+            errors = [e + 'Error retrieving data for new bus {}.'.format(b)
+                      for e, b in zip(errors, newnums)]
+        return df, errors
+
+    @staticmethod
+    def __table_value__(table, column, row, default):
+        """Internal function returns a table value, or default if the column
+        is missing or the value is null."""
+        if column not in table.columns or pd.isnull(table[column][row]):
+            return default
+        return table[column][row]
+
+    def __tap__(self, frmbus, tobus, ckt, fraction, newnum, newnam, newkv):
+        """Internal function taps a branch with ltap and records the change.
+        Returns a string of any API error."""
+        ierr = psspy.ltap(frmbus=frmbus, tobus=tobus, ckt=ckt,
+                          fraction=fraction, newnum=newnum, newnam=newnam,
+                          newkv=newkv)
+        self.__observe_mutation__('create_bus_from_tap', ierr)
+        if ierr:
+            return 'Error splitting bus {} - {}. API \'ltap\' code {}'.format(
+                frmbus, tobus, ierr)
+        self.__applied_changes__[('LTAP', newnum)] = (frmbus, tobus, ckt,
+                                                      fraction)
+        return ''
+
+    def __split__(self, bus, newnum, newnam, newkv):
+        """Internal function splits a bus with splt and records the change.
+        Returns a string of any API error."""
         ierr = psspy.splt(bus=int(bus), newnum=int(newnum), newnam=newnam,
                           newkv=float(newkv))
+        self.__observe_mutation__('create_bus_from_split', ierr)
         if ierr:
-            self.error_message += 'Error splitting bus {}. API \'splt\' code {}'.format(
+            return 'Error splitting bus {}. API \'splt\' code {}'.format(
                 bus, ierr)
-        return self.get_multiple_bus_data(ibuslist=[newnum])
+        self.__applied_changes__[('SPLT', newnum)] = bus
+        return ''
 
     def create_gen(self, bus, genbus=None, capacity=0, kwargs={}):
         """Splits the specified bus and inserts a generator at the new bus. Returns dataframe of the new machine.
@@ -1122,6 +2220,93 @@ class pypsse(object):
                 if not self.bus_exists(genbus):
                     break
                 genbus -= 1
+        created, err = self.__add_gen__(bus, genbus, capacity, kwargs, areanum,
+                                        zonenum, ownernum, vreg)
+        self.error_message += err
+        if not created:
+            return pd.DataFrame()
+
+        # ensure the case solves with the new machine
+        ierr = self.__solve_retry__()
+        if ierr:
+            self.error_message += 'API \'solved\' error code {}'.format(ierr)
+            return pd.DataFrame()
+
+        # return a dataframe of the new machine
+        return self.get_multiple_machine_data(buslist=[genbus])
+
+    def create_gens(self, table, kwargs={}):
+        """Bulk version of create_gen for interconnection queue studies. table
+        holds one row per generator with columns BUS (the POI bus) and
+        CAPACITY, and optionally GENBUS and NAME. Bus numbers are reserved once
+        for rows without a GENBUS, all buses, transformers and machines are
+        added without solving in between, and the case is solved once.
+        Returns a dataframe of the new machines indexed by generator bus with
+        POI and ERROR columns. A unit that fails is reported in its ERROR
+        field instead of aborting the batch."""
+        table = pd.DataFrame(table).reset_index(drop=True)
+        for c in ['BUS', 'CAPACITY']:
+            if c not in table.columns:
+                raise ValueError(
+                    'Generator table must have a {} column'.format(c))
+        poilist = [int(b) for b in table['BUS'].unique()]
+        poi_df = self.get_multiple_bus_data(ibuslist=poilist,
+                                            datafields=['AREA', 'ZONE', 'PU',
+                                                        'OWNER'])
+        if poi_df.empty:
+            # the retrieval error is already in error_message
+            return pd.DataFrame()
+
+        # reserve generator bus numbers in one pass over the bus table
+        if 'GENBUS' in table.columns:
+            genbuses = table['GENBUS'].tolist()
+        else:
+            genbuses = [None] * len(table.index)
+        missing = [n for n in xrange(len(genbuses)) if
+                   not genbuses[n] or pd.isnull(genbuses[n])]
+        reserved = self.__reserve_bus_numbers__(len(missing))
+        if len(reserved) < len(missing):
+            return pd.DataFrame()
+        for n, num in zip(missing, reserved):
+            genbuses[n] = num
+        genbuses = [int(b) for b in genbuses]
+
+        errors = [''] * len(genbuses)
+        for n in xrange(len(genbuses)):
+            bus = int(table['BUS'][n])
+            poi = poi_df.loc[bus]
+            if pd.isnull(poi['AREA']):
+                errors[n] = 'POI bus {} does not exist'.format(bus)
+                continue
+            unit_kwargs = dict(kwargs)
+            if 'NAME' in table.columns and not pd.isnull(table['NAME'][n]):
+                unit_kwargs['name'] = table['NAME'][n]
+            created, err = self.__add_gen__(bus, genbuses[n],
+                                            float(table['CAPACITY'][n]),
+                                            unit_kwargs, int(poi['AREA']),
+                                            int(poi['ZONE']), int(poi['OWNER']),
+                                            float(poi['PU']), 'create_gens')
+            errors[n] = err
+
+        # solve once for the whole batch
+        ierr = self.__solve_retry__()
+        if ierr:
+            self.error_message += 'API \'solved\' error code {} after adding {} generators'.format(
+                ierr, len(genbuses))
+
+        df = self.get_multiple_machine_data(buslist=genbuses)
+        df['POI'] = pd.Series(index=df.index, data=table['BUS'].tolist())
+        df['ERROR'] = pd.Series(index=df.index, data=errors)
+        return df
+
+    def __add_gen__(self, bus, genbus, capacity, kwargs, areanum, zonenum,
+                    ownernum, vreg, label='create_gen'):
+        """Internal function adds the bus, plant, step-up transformer and
+        machine of a new generator at genbus connected to bus, without solving.
+        label names the calling method for the mutation observers.
+        Returns whether the bus was created and a string of any API errors."""
+        kwargs = dict(kwargs)
+        err = ''
         if 'name' not in kwargs.keys():
             kwargs['name'] = 'NEWBUS{}'.format(genbus)
         kwargs['intgar1'] = 2
@@ -1135,20 +2320,26 @@ class pypsse(object):
             kwargs['realar1'] = 34.5
         ierr = psspy.bus_data_3(genbus, **kwargs)
         if ierr:
-            self.error_message += 'API \'bus_data_3\' error code {} for bus {}'.format(
+            err += 'API \'bus_data_3\' error code {} for bus {}'.format(
                 ierr, bus)
-            return pd.DataFrame()
+            self.__observe_mutation__(label, ierr)
+            return False, err
+        # purging the new bus also purges its plant, transformer and machine
+        self.__journal_inverse__([('bsys', (), {'sid': 11, 'numbus': 1,
+                                                'buses': [genbus]}),
+                                  ('extr', (11, 0, [0, 0]), {})])
+        self.__applied_changes__[('GEN', genbus)] = (bus, capacity)
 
         # regulate the genbus to its original voltage
         ierr = psspy.plant_data(genbus, 0, [vreg, 100.0])
         if ierr:
-            self.error_message += 'API \'plant_data\' error code {} for new machine at {}'.format(
+            err += 'API \'plant_data\' error code {} for new machine at {}'.format(
                 ierr, bus)
 
         # insert transformer from gen bus to poi bus
         ierr, realaro = psspy.two_winding_data(genbus, bus, '1', intgar=1)
         if ierr:
-            self.error_message += 'API \'two_winding_data\' error code {} for new transformer at {}'.format(
+            err += 'API \'two_winding_data\' error code {} for new transformer at {}'.format(
                 ierr, bus)
 
         # specify the new machine data
@@ -1157,67 +2348,4267 @@ class pypsse(object):
                                     realar6=0.0, realar8=1000000000,
                                     realar9=1000000000)
         if ierr:
-            self.error_message += 'API \'machine_data_2\' error code {} for new machine at {}'.format(
+            err += 'API \'machine_data_2\' error code {} for new machine at {}'.format(
                 ierr, bus)
+        self.__observe_mutation__(label, err)
+        return True, err
 
-        # ensure the case solves with the new machine
-        psspy.fnsl([0, 0, 0, 0, 0, 0, 0, 0])
-        ierr = psspy.solved()
-        count = 1
-        while ierr == 1 and count < 10:
-            psspy.fnsl([0, 0, 0, 0, 0, 0, 0, 0])
-            ierr = psspy.solved()
-            count += 1
-        if ierr:
-            self.error_message += 'API \'solved\' error code {}'.format(ierr)
-            return pd.DataFrame()
+    def __solve_retry__(self, count=10, options=[0, 0, 0, 0, 0, 0, 0, 0]):
+        """Internal function solves the case with fnsl up to count times while
+        it reports non-convergence. Returns the final 'solved' code."""
+        ierr = self.__solve__('FNSL', options)
+        n = 1
+        while ierr == 1 and n < count:
+            ierr = self.__solve__('FNSL', options)
+            n += 1
+        return ierr
 
-        # return a dataframe of the new machine
-        return self.get_multiple_machine_data(buslist=[genbus])
+    def __reserve_bus_numbers__(self, count, start=999997):
+        """Internal function returns count unused bus numbers, searching down
+        from start as create_gen does, with a single bus number retrieval."""
+        if count <= 0:
+            return []
+        ierr, iarr = psspy.abusint(sid=-1, flag=2, string='NUMBER')
+        if ierr:
+            self.error_message += 'Error retrieving bus numbers. API \'abusint\' error code {}\n'.format(
+                ierr)
+            return []
+        existing = np.array(iarr[0], dtype=int)
+        existing = existing[existing <= start]
+        candidates = np.arange(start, max(start - count - len(existing), 0), -1)
+        candidates = candidates[~np.in1d(candidates, existing)]
+        if len(candidates) < count:
+            raise ValueError(
+                'Only {} bus numbers are available below {}. {} requested.'.format(
+                    len(candidates), start, count))
+        return [int(b) for b in candidates[:count]]
 
-    def dispatch_gen(self, busnum, uid='1', pgen=_f):
-        """redispatches the assigned generator to the specified power output"""
+    def dispatch_gen(self, busnum, uid='1', pgen=_f, solve=True):
+        """redispatches the assigned generator to the specified power output.
+        If solve is False, the change is applied without solving the case."""
         intgar = [_i, _i, _i, _i, _i, _i]
         realar = [pgen, _f, _f, _f, _f, _f, _f, _f, _f, _f, _f, _f, _f, _f, _f,
                   _f, _f]
+        if self.__checkpoints__:
+            oerr, oldpgen = psspy.macdat(busnum, uid, 'P')
         ierr = psspy.machine_chng_2(busnum, uid, intgar, realar)
-        if not ierr:
-            psspy.fnsl([0, 0, 0, 0, 0, 0, 0, 0])
-            ierr = psspy.solved()
+        self.__observe_mutation__('dispatch_gen', ierr)
+        if not ierr and self.__checkpoints__ and not oerr:
+            self.__journal_inverse__([('machine_chng_2', (busnum, uid, intgar,
+                                                           [oldpgen] + realar[1:]),
+                                       {})])
+        if not ierr and pgen != _f:
+            self.__applied_changes__[('MACH', busnum, uid, 'PGEN')] = pgen
+        if not ierr and solve:
+            ierr = self.__solve__()
             if ierr:
                 self.error_message += 'API \'solved\' error code {} for {}\n'.format(
                     ierr, busnum)
-        else:
+        elif ierr:
             self.error_message += 'API \'machine_chng_2\' error code {} for {}\n'.format(
                 ierr, busnum)
         return ierr
 
-    def __create_load__(self, busnum, uid='1', pload=_f, qload=_f):
+    def hosting_capacity(self, bus, pmax, scanner=None, tol=1.0,
+                         search='secant', genbus=None, kwargs={},
+                         method='FNSL', options=[0, 0, 0, 0, 0, 0, 0, 0],
+                         max_iter=50):
+        """Finds the largest injection (MW, to within tol) of a new generator at
+        POI bus, between 0 and pmax, for which the case solves without thermal
+        or voltage violations. The generator is added as in create_gen (at
+        genbus, reserved by default) and redispatched with dispatch_gen, and
+        the interval is narrowed by bisection or, with search='secant', by a
+        safeguarded secant (Illinois) step on the smallest limit margin. Each
+        solve starts from the last converged solution. Limits are those of
+        scanner (a ViolationScanner, default settings if None): its rating
+        field and thermal_limit for branches and transformers and its voltage
+        limits for buses; elements already violated with the generator at 0
+        MW are not monitored. The case is restored with a checkpoint
+        rollback afterwards. Returns a dict with POI, GENBUS, MW (the largest
+        feasible injection), UPPER (the smallest infeasible one tried),
+        LIMIT (the binding element key, or 'DIVERGENCE'), SOLVES and
+        ERROR. Raises RuntimeError if the case cannot be restored."""
+        if search not in ('bisect', 'secant'):
+            raise ValueError('Invalid search \'{}\'. Expected one of: {}'.format(
+                search, ['bisect', 'secant']))
+        if scanner is None:
+            scanner = ViolationScanner()
+        result = OrderedDict([('POI', bus), ('GENBUS', genbus), ('MW', np.nan),
+                              ('UPPER', np.nan), ('LIMIT', None),
+                              ('SOLVES', 0), ('ERROR', '')])
+        base = self.checkpoint(voltages=True)
+        try:
+            self.__hosting_search__(result, float(pmax), scanner, tol, search,
+                                    kwargs, method, options, max_iter)
+        finally:
+            restored = self.rollback(base)
+            del self.__checkpoints__[base]
+        if not restored:
+            raise RuntimeError(
+                'Case not restored after hosting capacity at bus {}: {}'.format(
+                    bus, self.error_message))
+        return result
+
+    def __hosting_search__(self, result, pmax, scanner, tol, search, kwargs,
+                           method, options, max_iter):
+        """Internal function of hosting_capacity, fills in result."""
+        poi = self.get_single_bus_data(ibus=result['POI'],
+                                       datafields=['AREA', 'ZONE', 'PU',
+                                                   'OWNER'])
+        if pd.isnull(poi['AREA']):
+            result['ERROR'] = 'POI bus {} does not exist'.format(result['POI'])
+            return
+        if not result['GENBUS']:
+            reserved = self.__reserve_bus_numbers__(1)
+            if not reserved:
+                result['ERROR'] = 'No generator bus number reserved'
+                return
+            result['GENBUS'] = reserved[0]
+        genbus = int(result['GENBUS'])
+        created, err = self.__add_gen__(int(result['POI']), genbus, pmax, kwargs,
+                                        int(poi['AREA']), int(poi['ZONE']),
+                                        int(poi['OWNER']), float(poi['PU']))
+        if not created or err:
+            result['ERROR'] = err
+            return
+        fields = ['FROMNUMBER', 'TONUMBER', 'ID', scanner.rating]
+        tables = [('BRN', self.get_result_table('BRN', fields, flag=2)),
+                  ('TRN', self.get_result_table('TRN', fields, flag=2)),
+                  ('BUS', self.get_result_table(
+                      'BUS', ['NUMBER', 'PU'] + list(scanner.voltage_limits),
+                      flag=2))]
+        masks = {}
+        state = {'converged': True, 'vsnap': None}
+
+        def margin():
+            """Returns the smallest margin (per unit of rating or voltage) of
+            the monitored elements and the key of that element."""
+            best = (np.inf, None)
+            for kind, table in tables:
+                if kind == 'BUS':
+                    pu = table['PU']
+                    hi, lo = table[scanner.voltage_limits[0]], table[
+                        scanner.voltage_limits[1]]
+                    values = np.where(pu > 0, np.minimum(pu - lo, hi - pu),
+                                      np.inf)
+                else:
+                    values = (scanner.thermal_limit - table[scanner.rating]) / 100.0
+                if kind not in masks:
+                    masks[kind] = values >= 0
+                values = values[masks[kind]]
+                if len(values) and values.min() < best[0]:
+                    r = np.flatnonzero(masks[kind])[np.argmin(values)]
+                    if kind == 'BUS':
+                        key = ('BUS', int(table['NUMBER'][r]))
+                    else:
+                        key = (kind, int(table['FROMNUMBER'][r]),
+                               int(table['TONUMBER'][r]),
+                               str(table['ID'][r]).strip())
+                    best = (float(values.min()), key)
+            return best
+
+        def evaluate(mw):
+            """Dispatches and solves at mw, warm started from the last
+            converged solution. Returns the margin and binding element, with
+            a margin of None if the case does not solve."""
+            ierr = self.dispatch_gen(genbus, '1', mw, solve=False)
+            if ierr:
+                raise RuntimeError('Generator at {} not dispatched: {}'.format(
+                    genbus, self.error_message))
+            if not state['converged'] and state['vsnap'] is not None:
+                self.__set_voltages__(state['vsnap'])
+            result['SOLVES'] += 1
+            state['converged'] = not self.__solve__(method, options)
+            if not state['converged']:
+                return None, 'DIVERGENCE'
+            for kind, table in tables:
+                if table.refresh() is None:
+                    raise RuntimeError('Results not retrieved: {}'.format(
+                        self.error_message))
+            g, key = margin()
+            if g >= 0:
+                state['vsnap'] = self.__get_voltages__()
+            return g, key
+
+        lo, glo = 0.0, evaluate(0.0)[0]
+        if glo is None:
+            result['ERROR'] = 'Case does not solve with the generator at 0 MW'
+            return
+        hi = pmax
+        ghi, key = evaluate(pmax)
+        if ghi is not None and ghi >= 0:
+            result['MW'] = pmax
+            return
+        last = None
+        clipped = False
+        for n in xrange(max_iter):
+            if hi - lo <= tol:
+                break
+            mw = (lo + hi) / 2.0
+            if (search == 'secant' and ghi is not None and
+                    np.isfinite(glo) and glo > ghi and not clipped):
+                # a step within tol/2 of either end is moved to tol/2 inside
+                # it, so a step onto the limit closes the interval next time
+                step = lo + glo * (hi - lo) / (glo - ghi)
+                mw = min(max(step, lo + tol / 2.0), hi - tol / 2.0)
+                clipped = mw != step
+            else:
+                clipped = False
+            g, k = evaluate(mw)
+            if g is not None and g >= 0:
+                lo, glo = mw, g
+                if last == 'lo' and ghi is not None:
+                    ghi /= 2.0
+                last = 'lo'
+            else:
+                hi, ghi, key = mw, g, k
+                if last == 'hi' and np.isfinite(glo):
+                    glo /= 2.0
+                last = 'hi'
+        result['MW'] = lo
+        result['UPPER'] = hi
+        result['LIMIT'] = key
+
+    def hosting_capacities(self, table, **kwargs):
+        """Runs hosting_capacity for each row of a table with columns BUS and
+        PMAX, and optionally GENBUS. kwargs are passed to hosting_capacity.
+        Returns a dataframe with one row per POI."""
+        table = pd.DataFrame(table).reset_index(drop=True)
+        rows = []
+        for n in xrange(len(table.index)):
+            genbus = self.__table_value__(table, 'GENBUS', n, None)
+            rows.append(self.hosting_capacity(int(table['BUS'][n]),
+                                              float(table['PMAX'][n]),
+                                              genbus=genbus, **kwargs))
+        return pd.DataFrame(rows, columns=['POI', 'GENBUS', 'MW', 'UPPER',
+                                           'LIMIT', 'SOLVES', 'ERROR'])
+
+    def pv_curve(self, source, sink, max_transfer, step=None, min_step=None,
+                 dv_target=0.01, buses=None, method='FNSL',
+                 options=[0, 0, 0, 0, 0, 0, 0, 0], max_solves=100):
+        """Traces the PV curve of a transfer of up to max_transfer MW from
+        source to sink. source and sink are tables with columns KIND ('MACH'
+        or 'LOAD'), BUS, ID and optionally FACTOR (participation factors,
+        scaled to sum to 1; equal shares by default). The transfer raises the
+        source machines and lowers the source loads, and lowers the sink
+        machines and raises the sink loads (at constant power factor). Each
+        point changes every participating element and is solved from the
+        last converged solution; the starting state of the elements is
+        journaled once, so the points do not grow the rollback journal. The
+        step (max_transfer / 10 by default)
+        doubles while the largest voltage change of the monitored buses is
+        under dv_target / 2 pu and halves above dv_target. After a failed
+        solve the last converged voltages are restored and the step halves
+        within the bracket, until the nose is bracketed to within min_step
+        (max_transfer / 1000 by default). The voltages of buses (all buses
+        by default) at each converged point are recorded into preallocated
+        arrays. The case is restored with a checkpoint rollback afterwards.
+        Returns a dict with TRANSFER (MW of each converged point), NUMBER,
+        PU (a row per converged point), NOSE (the largest converged
+        transfer), UPPER (the smallest failed transfer, NaN if none), LIMIT
+        ('NOSE', 'MAX_TRANSFER' or 'MAX_SOLVES'), SOLVES and ERROR. Raises
+        RuntimeError if the case cannot be restored."""
+        max_transfer = float(max_transfer)
+        step = float(step or max_transfer / 10.0)
+        min_step = float(min_step or max_transfer / 1000.0)
+        result = OrderedDict([('TRANSFER', np.zeros(0)), ('NUMBER', None),
+                              ('PU', None), ('NOSE', np.nan),
+                              ('UPPER', np.nan), ('LIMIT', None),
+                              ('SOLVES', 0), ('ERROR', '')])
+        base = self.checkpoint(voltages=True)
+        try:
+            self.__pv_trace__(result, source, sink, max_transfer, step,
+                              min_step, dv_target, buses, method, options,
+                              max_solves)
+        finally:
+            restored = self.rollback(base)
+            del self.__checkpoints__[base]
+        if not restored:
+            raise RuntimeError('Case not restored after the PV curve: {}'.format(
+                self.error_message))
+        return result
+
+    def __transfer_elements__(self, source, sink):
+        """Internal function returns a list of (kind, bus, id, p, q, share)
+        of the machines and loads of a transfer, where p and q are their
+        present output or demand and share is the signed MW change per MW of
+        transfer. Raises ValueError for an invalid table or an element not
+        in the case."""
+        present = {}
+        for kind, field in [('MACH', 'PGEN'), ('LOAD', 'MVANOM')]:
+            arrays = self.__fetch_arrays__(kind, ['NUMBER', 'ID', field],
+                                           flag=4)
+            if arrays is None:
+                raise RuntimeError('{} data not retrieved: {}'.format(
+                    kind, self.error_message))
+            for b, i, v in zip(arrays['NUMBER'], arrays['ID'], arrays[field]):
+                v = complex(v)
+                present[(kind, int(b), str(i).strip())] = (v.real, v.imag)
+        elements = []
+        for table, sign in [(source, 1.0), (sink, -1.0)]:
+            table = pd.DataFrame(table)
+            for c in ['KIND', 'BUS', 'ID']:
+                if c not in table.columns:
+                    raise ValueError(
+                        'Transfer table must have a {} column'.format(c))
+            factors = (table['FACTOR'].values.astype(float) if 'FACTOR' in
+                       table.columns else np.ones(len(table.index)))
+            if not len(factors) or factors.sum() <= 0:
+                raise ValueError('Transfer participation factors must sum to '
+                                 'a positive value')
+            factors = factors / factors.sum()
+            for kind, bus, uid, f in zip(table['KIND'], table['BUS'],
+                                         table['ID'], factors):
+                key = (kind, int(bus), str(uid).strip())
+                if key not in present:
+                    raise ValueError('{} {} \'{}\' is not in the case'.format(
+                        *key))
+                # loads take the transfer with the opposite sign to machines
+                share = sign * f if kind == 'MACH' else -sign * f
+                elements.append(key + present[key] + (share,))
+        return elements
+
+    def __pv_trace__(self, result, source, sink, max_transfer, step, min_step,
+                     dv_target, buses, method, options, max_solves):
+        """Internal function of pv_curve, fills in result."""
+        elements = self.__transfer_elements__(source, sink)
+        mach_intgar = [_i, _i, _i, _i, _i, _i]
+        load_intgar = [_i, _i, _i, _i, _i, _i, _i]
+        # journal the starting state once; the points are then applied with
+        # bare psspy calls instead of dispatch_gen and __change_load__
+        inverse = []
+        for kind, bus, uid, p, q, share in elements:
+            if kind == 'MACH':
+                inverse.append(('machine_chng_2', (bus, uid, mach_intgar,
+                                                   [p] + [_f] * 16), {}))
+            else:
+                old = self.__get_load_state__(bus, uid)
+                if old is None:
+                    raise RuntimeError(
+                        'LOAD {} \'{}\' data not retrieved'.format(bus, uid))
+                inverse.append(('load_chng_5', (bus, uid) + old, {}))
+        self.__journal_inverse__(inverse)
+
+        def transfer(mw):
+            """Sets every participating element for a transfer of mw."""
+            for kind, bus, uid, p, q, share in elements:
+                if kind == 'MACH':
+                    api = 'machine_chng_2'
+                    ierr = psspy.machine_chng_2(bus, uid, mach_intgar,
+                                                [p + share * mw] + [_f] * 16)
+                else:
+                    api = 'load_chng_5'
+                    pload = p + share * mw
+                    ierr = psspy.load_chng_5(
+                        bus, uid, load_intgar,
+                        [pload, q * pload / p if p else q] + [_f] * 6)
+                if ierr:
+                    self.__observe_mutation__('pv_curve', ierr)
+                    raise RuntimeError(
+                        '{} {} \'{}\' not changed. API \'{}\' error code {}'.format(
+                            kind, bus, uid, api, ierr))
+            self.__observe_mutation__('pv_curve', 0)
+
+        result['SOLVES'] = 1
+        if self.__solve__(method, options):
+            result['ERROR'] = 'Case does not solve before the transfer'
+            return
+        vsnap = self.__get_voltages__()
+        if vsnap is None:
+            raise RuntimeError('Voltages not retrieved: {}'.format(
+                self.error_message))
+        if buses is None:
+            cols = np.arange(len(vsnap[0]))
+        else:
+            order = np.argsort(vsnap[0])
+            pos = np.searchsorted(vsnap[0], buses, sorter=order)
+            pos = order[np.minimum(pos, len(order) - 1)]
+            if not (vsnap[0][pos] == np.asarray(buses)).all():
+                raise ValueError('Monitored buses are not all in the case')
+            cols = pos
+        transfers = np.zeros(max_solves + 1)
+        pu = np.empty((max_solves + 1, len(cols)))
+        pu[0] = vsnap[1][cols]
+        points = 1
+        mw, upper = 0.0, np.inf
+        result['LIMIT'] = 'MAX_SOLVES'
+        while result['SOLVES'] < max_solves:
+            if mw >= max_transfer:
+                result['LIMIT'] = 'MAX_TRANSFER'
+                break
+            if upper - mw <= min_step:
+                result['LIMIT'] = 'NOSE'
+                break
+            trial = min(mw + min(step, (upper - mw) / 2.0), max_transfer)
+            transfer(trial)
+            result['SOLVES'] += 1
+            if self.__solve__(method, options):
+                upper = trial
+                self.__set_voltages__(vsnap)
+                step /= 2.0
+                continue
+            vsnap = self.__get_voltages__()
+            if vsnap is None:
+                raise RuntimeError('Voltages not retrieved: {}'.format(
+                    self.error_message))
+            pu[points] = vsnap[1][cols]
+            transfers[points] = mw = trial
+            dv = np.abs(pu[points] - pu[points - 1]).max() if len(cols) else 0
+            points += 1
+            if dv > dv_target:
+                step /= 2.0
+            elif dv < dv_target / 2.0:
+                step *= 2.0
+        result['TRANSFER'] = transfers[:points].copy()
+        result['NUMBER'] = vsnap[0][cols].copy()
+        result['PU'] = pu[:points].copy()
+        result['NOSE'] = mw
+        result['UPPER'] = upper if np.isfinite(upper) else np.nan
+
+    def __create_load__(self, busnum, uid='1', pload=_f, qload=_f, solve=True):
         """redispatches the assigned generator to the specified power output"""
         intgar = [_i, _i, _i, _i, _i, _i, _i]
         realar = [pload, qload, _f, _f, _f, _f, _f, _f]
+        if self.__checkpoints__:
+            old = self.__get_load_state__(busnum, uid)
         ierr = psspy.load_data_5(busnum, uid, intgar, realar)
+        self.__observe_mutation__('__create_load__', ierr)
+        if not ierr and self.__checkpoints__:
+            if old is None:
+                self.__journal_inverse__([('purgload', (busnum, uid), {})])
+            else:
+                self.__journal_inverse__([('load_chng_5', (busnum, uid) + old,
+                                           {})])
         if not ierr:
-            psspy.fnsl([0, 0, 0, 0, 0, 0, 0, 0])
-            ierr = psspy.solved()
+            self.__record_load_change__(busnum, uid, pload, qload, None)
+        if not ierr and solve:
+            ierr = self.__solve__()
             if ierr:
                 self.error_message += 'API \'solved\' error code {} for {}\n'.format(
                     ierr, busnum)
-        else:
+        elif ierr:
             self.error_message += 'API \'load_data_5\' error code {} for {}\n'.format(
                 ierr, busnum)
         return ierr
 
     def __change_load__(self, busnum, uid='1', pload=_f, qload=_f, status=None):
         """redispatches the assigned generator to the specified power output"""
-        intgar = [_i if not status else status, _i, _i, _i, _i, _i, _i]
+        intgar = [_i if status is None else status, _i, _i, _i, _i, _i, _i]
         realar = [pload, qload, _f, _f, _f, _f, _f, _f]
+        if self.__checkpoints__:
+            old = self.__get_load_state__(busnum, uid)
         ierr = psspy.load_chng_5(busnum, uid, intgar, realar)
+        self.__observe_mutation__('__change_load__', ierr)
         if ierr:
             self.error_message += 'API \'load_chng_5\' error code {} for {}\n'.format(
                 ierr, busnum)
+        else:
+            self.__record_load_change__(busnum, uid, pload, qload, status)
+            if self.__checkpoints__ and old is not None:
+                self.__journal_inverse__([('load_chng_5', (busnum, uid) + old,
+                                           {})])
         return ierr
 
+    def __record_load_change__(self, busnum, uid, pload, qload, status):
+        """Internal function records a load change in the applied changes."""
+        for fld, val in [('PL', pload), ('QL', qload)]:
+            if val != _f:
+                self.__applied_changes__[('LOAD', busnum, uid, fld)] = val
+        if status is not None:
+            self.__applied_changes__[('LOAD', busnum, uid, 'STATUS')] = status
+
+    def __observe_mutation__(self, method, error):
+        """Internal function records a mutation in the metrics and advances the
+        case version, which invalidates indexes built on the case. A mutation
+        that is not journaled is marked so that rollback reports it."""
+        self.__case_version__ += 1
+        if self.__checkpoints__ and method not in _JOURNALED_MUTATIONS:
+            self.__journal__.append(('unjournaled', method))
+        self.metrics['pypsse_mutations_total'].inc(method=method)
+        if error:
+            self.metrics['pypsse_mutation_errors_total'].inc(method=method)
+
+    def __get_load_state__(self, busnum, uid='1'):
+        """Internal function returns the (intgar, realar) load_chng_5 inputs
+        that restore the load's status and nominal power, or None if the load
+        does not exist."""
+        ierr, mva = psspy.loddt2(busnum, uid, 'MVA', 'NOM')
+        if ierr:
+            return None
+        ierr, status = psspy.lodint(busnum, uid, 'STATUS')
+        if ierr:
+            return None
+        intgar = [status, _i, _i, _i, _i, _i, _i]
+        realar = [mva.real, mva.imag, _f, _f, _f, _f, _f, _f]
+        return (intgar, realar)
+
+
+
+def _predicate_mask(values, pred):
+    """Returns the boolean mask of values which satisfy a pypsse.query
+    predicate."""
+    if callable(pred):
+        return np.asarray(pred(values), dtype=bool)
+    if isinstance(pred, (list, set, frozenset, np.ndarray)):
+        return np.in1d(values, list(pred))
+    if not isinstance(pred, tuple):
+        return values == pred
+    op = pred[0]
+    if op == '==':
+        return values == pred[1]
+    elif op == '!=':
+        return values != pred[1]
+    elif op == '<':
+        return values < pred[1]
+    elif op == '<=':
+        return values <= pred[1]
+    elif op == '>':
+        return values > pred[1]
+    elif op == '>=':
+        return values >= pred[1]
+    elif op == 'in':
+        return np.in1d(values, list(pred[1]))
+    elif op == 'between':
+        return (values >= pred[1]) & (values <= pred[2])
+    raise ValueError('Invalid predicate operator \'{}\''.format(op))
+
+
+def _pushdown_values(pred):
+    """Returns the list of values an equality or membership predicate allows,
+    or None if the predicate cannot be pushed into a subsystem."""
+    if pred is None or callable(pred):
+        return None
+    if isinstance(pred, (list, set, frozenset, np.ndarray)):
+        return [int(v) for v in pred]
+    if isinstance(pred, tuple):
+        if pred[0] == '==':
+            return [int(pred[1])]
+        if pred[0] == 'in':
+            return [int(v) for v in pred[1]]
+        return None
+    return [int(pred)]
+
+
+def _pushdown_range(pred):
+    """Returns the inclusive (low, high) range a predicate on base kV allows,
+    or None if it cannot be pushed into a subsystem."""
+    if pred is None or callable(pred):
+        return None
+    if isinstance(pred, (list, set, frozenset, np.ndarray)):
+        return (float(min(pred)), float(max(pred))) if len(pred) else None
+    if not isinstance(pred, tuple):
+        return (float(pred), float(pred))
+    op = pred[0]
+    if op == '==':
+        return (float(pred[1]), float(pred[1]))
+    elif op in ('>', '>='):
+        return (float(pred[1]), 9999.0)
+    elif op in ('<', '<='):
+        return (0.0, float(pred[1]))
+    elif op == 'between':
+        return (float(pred[1]), float(pred[2]))
+    elif op == 'in':
+        return (float(min(pred[1])), float(max(pred[1])))
+    return None
+
+
+###############################################################################
+##### ResultTable keeps retrieved arrays and refreshes them after a solve #####
+###############################################################################
+class ResultTable(object):
+    """NumPy buffers of datafields for one element family, see
+    pypsse.get_result_table. refresh re-pulls only the fields listed in
+    pypsse.SOLUTION_FIELDS and copies them into the existing buffers, so views
+    of the buffers stay current. If the number of elements has changed, every
+    field is reloaded. A change that keeps the element count (e.g. one element
+    purged and another added) is not detected; call load after such changes."""
+
+    def __init__(self, psse, family, datafields, sid=-1, buslist=[], flag=2):
+        self.psse = psse
+        self.family = family
+        self.datafields = list(datafields)
+        self.buslist = list(buslist)
+        self.sid = 11 if self.buslist else sid
+        self.flag = flag
+        self.arrays = OrderedDict()
+        self.nrows = 0
+        self.load()
+
+    def __getitem__(self, fld):
+        return self.arrays[fld]
+
+    def __len__(self):
+        return self.nrows
+
+    def __define__(self):
+        """Internal function redefines subsystem 11 for a bus list table, as
+        other methods reuse it."""
+        if not self.buslist:
+            return True
+        ierr = psspy.bsys(sid=11, numbus=len(self.buslist), buses=self.buslist)
+        if ierr:
+            self.psse.error_message += 'Bus system not created for {}. API \'bsys\' error code {}.'.format(
+                self.buslist, ierr)
+            return False
+        return True
+
+    def load(self):
+        """Retrieves every field. Returns False on an API error."""
+        if not self.__define__():
+            return False
+        arrays = self.psse.__fetch_arrays__(self.family, self.datafields,
+                                            sid=self.sid, flag=self.flag)
+        if arrays is None:
+            return False
+        self.arrays = arrays
+        self.nrows = len(next(iter(arrays.values()))) if arrays else 0
+        return True
+
+    def count(self):
+        """Returns the current number of elements in the case, or None."""
+        if not self.__define__():
+            return None
+        prefix = _ARRAY_APIS[self.family]
+        ierr, n = getattr(psspy, prefix + 'count')(sid=self.sid,
+                                                   flag=self.flag)
+        if ierr:
+            self.psse.error_message += 'Error counting elements. API \'{}count\' error code {}\n'.format(
+                prefix, ierr)
+            return None
+        return n
+
+    def refresh(self, fields=None):
+        """Re-pulls the solution dependent fields (or the given fields) into
+        the existing buffers. Returns the list of fields retrieved, which is
+        every field if the element count changed, or None on an API error."""
+        if self.count() != self.nrows:
+            if not self.load():
+                return None
+            return list(self.arrays.keys())
+        if fields is None:
+            dynamic = self.psse.SOLUTION_FIELDS[self.family]
+            fields = [f for f in self.arrays if f in dynamic]
+        if not fields:
+            return []
+        arrays = self.psse.__fetch_arrays__(self.family, fields, sid=self.sid,
+                                            flag=self.flag)
+        if arrays is None:
+            return None
+        for fld, arr in arrays.items():
+            if fld in self.arrays and self.arrays[fld].dtype == arr.dtype:
+                self.arrays[fld][...] = arr
+            else:
+                self.arrays[fld] = arr
+        return list(arrays.keys())
+
+    def to_frame(self):
+        """Returns a dataframe copy of the table."""
+        return pd.DataFrame(OrderedDict((f, self.arrays[f].copy())
+                                        for f in self.arrays),
+                            columns=list(self.arrays.keys()))
+
+
+class LazyFrame(object):
+    """Column-on-access view of the data of one element family, returned by
+    the get_multiple methods with lazy=True. Only the key fields are
+    retrieved when it is created; each other column is retrieved through the
+    array APIs the first time it is accessed (lf['PU'] or lf.PU) and cached.
+    lf[[...]] retrieves the uncached columns of a list in one call per data
+    type, and materialize returns a dataframe of every column. Rows and index
+    follow the eager method: elements of the SID indexed by NUMBER (buses,
+    machines, loads) or by position, or, for bus lists, one row per requested
+    key (one per element at the bus for machines and loads, NaN if there is
+    none). Subsystem 11 is redefined from the stored bus list before each
+    retrieval, as other methods reuse it. Raises RuntimeError if the number
+    of elements has changed since the frame was created."""
+
+    KEYS = {'BUS': ['NUMBER'], 'MACH': ['NUMBER'], 'LOAD': ['NUMBER'],
+            'BRN': ['FROMNUMBER', 'TONUMBER', 'ID'],
+            'TRN': ['FROMNUMBER', 'TONUMBER', 'ID'],
+            'TR3': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER', 'ID']}
+
+    def __init__(self, psse, family, datafields, sid=-1, buslist=[], flag=2,
+                 keys=None):
+        self.psse = psse
+        self.family = family
+        self.columns = list(datafields)
+        self.buslist = list(buslist)
+        self.sid = 11 if keys is not None else sid
+        self.flag = flag
+        self.__cache__ = OrderedDict()
+        self.__nrows__ = 0
+        self.__take__ = None
+        keyfields = self.KEYS[family]
+        if keys is not None and not keys:
+            self.index = pd.Index([])
+            return
+        arrays = self.__fetch__(keyfields)
+        self.__nrows__ = len(arrays[keyfields[0]])
+        if keys is None:
+            if family in ('BUS', 'MACH', 'LOAD'):
+                self.index = pd.Index(arrays['NUMBER'], name='NUMBER')
+            else:
+                self.index = pd.RangeIndex(self.__nrows__)
+        else:
+            rows = {}
+            for r, k in enumerate(zip(*[arrays[f] for f in keyfields])):
+                rows.setdefault(self.__key__(k), []).append(r)
+            take = []
+            labels = []
+            for n, k in enumerate(keys):
+                match = rows.get(self.__key__(tuple(k) + ('',) * (
+                    len(keyfields) - len(k))), [-1])
+                if family in ('BRN', 'TRN'):
+                    match = match[:1]
+                take += match
+                labels += [k[0] if len(keyfields) == 1 else n] * len(match)
+            self.__take__ = np.array(take, dtype=int)
+            self.index = pd.Index(labels, name='NUMBER' if len(
+                keyfields) == 1 else None)
+        for f in keyfields:
+            if f in self.columns:
+                self.__cache__[f] = self.__align__(arrays[f])
+        if keys is not None and family in ('BRN', 'TRN'):
+            # report branches in the requested direction, as the eager method
+            for n, f in enumerate(keyfields):
+                self.__cache__[f] = np.array([k[n] for k in keys])
+
+    def __key__(self, k):
+        """Internal function normalizes an element key for list lookups:
+        branches match in either direction and three winding transformers
+        match any winding order and ID."""
+        if self.family in ('BRN', 'TRN'):
+            return (min(k[0], k[1]), max(k[0], k[1]), str(k[2]).strip())
+        if self.family == 'TR3':
+            return tuple(sorted(int(b) for b in k[:3]))
+        return (int(k[0]),)
+
+    def __fetch__(self, fields):
+        """Internal function retrieves fields for the element set."""
+        if self.buslist:
+            ierr = psspy.bsys(sid=11, numbus=len(self.buslist),
+                              buses=self.buslist)
+            if ierr:
+                self.psse.error_message += 'Bus system not created for {}. API \'bsys\' error code {}.'.format(
+                    self.buslist, ierr)
+                raise RuntimeError(self.psse.error_message)
+        arrays = self.psse.__fetch_arrays__(self.family, fields, sid=self.sid,
+                                            flag=self.flag)
+        if arrays is None:
+            raise RuntimeError('Columns {} not retrieved: {}'.format(
+                fields, self.psse.error_message))
+        for f, arr in arrays.items():
+            if self.__nrows__ and len(arr) != self.__nrows__:
+                raise RuntimeError(
+                    'The number of {} elements changed from {} to {}'.format(
+                        self.family, self.__nrows__, len(arr)))
+        return arrays
+
+    def __align__(self, arr):
+        """Internal function maps element rows to frame rows."""
+        if self.__take__ is None:
+            return arr
+        if not (self.__take__ < 0).any():
+            return arr[self.__take__]
+        if arr.dtype.kind in 'iuf':
+            out = arr.astype(float)[self.__take__]
+        else:
+            out = arr.astype(object)[self.__take__]
+        out[self.__take__ < 0] = np.nan
+        return out
+
+    def fetch(self, columns):
+        """Retrieves any uncached columns of a list, one call per data type."""
+        for c in columns:
+            if c not in self.columns:
+                raise KeyError(c)
+        missing = [c for c in columns if c not in self.__cache__]
+        if not missing:
+            return
+        if not self.__nrows__:
+            arrays = {}
+        else:
+            arrays = self.__fetch__(missing)
+        for c in missing:
+            if c in arrays:
+                self.__cache__[c] = self.__align__(arrays[c])
+            else:
+                self.__cache__[c] = np.full(len(self.index), np.nan)
+
+    @property
+    def fetched(self):
+        """Returns the names of the cached columns."""
+        return list(self.__cache__.keys())
+
+    def __getitem__(self, column):
+        if isinstance(column, (list, tuple)):
+            self.fetch(column)
+            return pd.DataFrame(OrderedDict((c, self.__cache__[c])
+                                            for c in column),
+                                index=self.index, columns=list(column))
+        self.fetch([column])
+        return pd.Series(self.__cache__[column], index=self.index, name=column)
+
+    def __getattr__(self, column):
+        if column.startswith('__') or column not in self.__dict__.get(
+                'columns', []):
+            raise AttributeError(column)
+        return self[column]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def materialize(self):
+        """Retrieves every uncached column and returns a dataframe."""
+        return self[self.columns]
+
+
+class BusNameIndex(object):
+    """Sorted arrays of bus NAME and EXNAME keys for bulk name to number
+    resolution with numpy.searchsorted. Names are compared with surrounding
+    blanks stripped and inner runs of blanks collapsed (so 'BUS A  345.00'
+    matches the EXNAME 'BUS A       345.00'). Bus names need not be unique; a
+    lookup returns every matching bus."""
+
+    FIELDS = ('NAME', 'EXNAME')
+    MATCHES = ('exact', 'nocase', 'prefix')
+
+    def __init__(self, numbers, names, exnames):
+        self.numbers = np.asarray(numbers, dtype=int)
+        self.__keys__ = {}
+        for field, values in zip(self.FIELDS, [names, exnames]):
+            keys = np.array([_name_key(v) for v in values], dtype=str)
+            upper = np.char.upper(keys) if len(keys) else keys
+            for case, arr in [('exact', keys), ('nocase', upper)]:
+                order = np.argsort(arr, kind='mergesort')
+                self.__keys__[(field, case)] = (arr[order], order)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def lookup(self, names, field='NAME', match='exact'):
+        """Returns a dataframe with one row per (query, matching bus), with
+        columns QUERY (the position of the name in names), NAME (the name as
+        given) and NUMBER, sorted by QUERY then NUMBER. A name that matches no
+        bus has one row with a NUMBER of -1. match is 'exact', 'nocase'
+        (case-insensitive) or 'prefix' (case-insensitive prefix)."""
+        if field not in self.FIELDS:
+            raise ValueError('Invalid field \'{}\'. Expected one of: {}'.format(
+                field, list(self.FIELDS)))
+        if match not in self.MATCHES:
+            raise ValueError('Invalid match \'{}\'. Expected one of: {}'.format(
+                match, list(self.MATCHES)))
+        if isinstance(names, basestring):
+            names = [names]
+        names = list(names)
+        queries = [_name_key(n) for n in names]
+        if match != 'exact':
+            queries = [q.upper() for q in queries]
+        keys, order = self.__keys__[(field, 'exact' if match == 'exact' else
+                                     'nocase')]
+        q = np.array(queries, dtype=str)
+        if not len(q):
+            return pd.DataFrame(columns=['QUERY', 'NAME', 'NUMBER'])
+        left = np.searchsorted(keys, q, side='left')
+        if match == 'prefix':
+            right = np.searchsorted(keys, np.array(
+                [_prefix_bound(x) for x in queries], dtype=str), side='left')
+        else:
+            right = np.searchsorted(keys, q, side='right')
+        counts = right - left
+        found = np.maximum(counts, 1)
+        query = np.repeat(np.arange(len(q)), found)
+        starts = np.repeat(left, found)
+        offsets = np.arange(found.sum()) - np.repeat(np.cumsum(found) - found,
+                                                     found)
+        hit = np.repeat(counts > 0, found)
+        pos = np.where(hit, starts + offsets, 0)
+        numbers = np.where(hit, self.numbers[order[np.minimum(
+            pos, len(order) - 1)]] if len(order) else -1, -1)
+        df = pd.DataFrame({'QUERY': query,
+                           'NAME': np.array(names, dtype=object)[query],
+                           'NUMBER': numbers},
+                          columns=['QUERY', 'NAME', 'NUMBER'])
+        return df.sort_values(['QUERY', 'NUMBER']).reset_index(drop=True)
+
+    def numbers_of(self, names, field='NAME', match='exact'):
+        """Returns an array with the lowest numbered matching bus of each name
+        (-1 if none), for names known to be unique."""
+        df = self.lookup(names, field=field, match=match)
+        return df.groupby('QUERY')['NUMBER'].first().values
+
+
+def _name_key(name):
+    """Returns a name with surrounding blanks stripped and inner runs of blanks
+    collapsed."""
+    return ' '.join(str(name).split())
+
+
+def _prefix_bound(prefix):
+    """Returns the smallest string greater than every string starting with
+    prefix."""
+    while prefix and prefix[-1] == '\xff':
+        prefix = prefix[:-1]
+    if not prefix:
+        return '\xff' * 64
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+###############################################################################
+#### Support file builders stream whole tables of subsystems, monitored #######
+########## elements and contingencies to .sub, .mon and .con files ############
+###############################################################################
+class SupportFileBuilder(object):
+    """Base of the support file builders. The file is opened once with a large
+    buffer, the COM header is written on creation and END on close. Entries
+    are formatted a table at a time and written in one call per table. If
+    registry (a list, e.g. the created files list of a pypsse instance) is
+    given, the path is appended to it."""
+
+    HEADER = 'Support file'
+
+    def __init__(self, filepath, registry=None, buffering=1 << 20):
+        self.filepath = filepath
+        self.entries = 0
+        self.__file__ = open(filepath, 'w', buffering)
+        self.__file__.write('COM\nCOM  {} created through pypsse \nCOM\n'.format(
+            self.HEADER))
+        if registry is not None:
+            registry.append(filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, lines):
+        """Writes a list of lines (each ending in a newline)."""
+        self.__file__.write(''.join(lines))
+
+    def close(self):
+        """Completes the file with END and closes it. Returns the path."""
+        if not self.__file__.closed:
+            self.__file__.write('\nEND\n')
+            self.__file__.close()
+        return self.filepath
+
+
+class SubsystemFileBuilder(SupportFileBuilder):
+    """Writes a .sub file of named subsystems of buses and areas, with
+    optional bus participation factors."""
+
+    HEADER = 'Subystem file'
+
+    def add(self, subname, buslist=[], arealist=[], partlist=[]):
+        """Adds one subsystem, as append_subfile."""
+        if partlist and len(partlist) != len(buslist):
+            raise ValueError(
+                'Participation factor list is length {} and bus list is length {}. These must be the same length.'.format(
+                    len(partlist), len(buslist)))
+        self.write(self.__lines__(subname, buslist, arealist, partlist))
+
+    def add_table(self, table):
+        """Adds the subsystems of a table with a SUBSYSTEM column and one row
+        per member: a BUS (with an optional PARTICIPATION factor) or an AREA.
+        Subsystems are written in order of first appearance. Raises
+        ValueError if only some buses of a subsystem have a participation
+        factor."""
+        table = pd.DataFrame(table)
+        if 'SUBSYSTEM' not in table.columns:
+            raise ValueError('Subsystem table must have a SUBSYSTEM column')
+        n = len(table.index)
+        names = table['SUBSYSTEM'].tolist()
+        buses = table['BUS'].tolist() if 'BUS' in table.columns else [None] * n
+        areas = table['AREA'].tolist() if 'AREA' in table.columns else [None] * n
+        parts = (table['PARTICIPATION'].tolist() if 'PARTICIPATION' in
+                 table.columns else [None] * n)
+        groups = OrderedDict()
+        for name, bus, area, part in zip(names, buses, areas, parts):
+            g = groups.setdefault(name, ([], [], []))
+            if bus is not None and not pd.isnull(bus):
+                g[0].append(int(bus))
+                g[2].append(part)
+            if area is not None and not pd.isnull(area):
+                g[1].append(int(area))
+        lines = []
+        for name, (buslist, arealist, partlist) in groups.items():
+            missing = [p is None or pd.isnull(p) for p in partlist]
+            if all(missing):
+                partlist = []
+            elif any(missing):
+                raise ValueError(
+                    'Subsystem {} has participation factors for {} of its {} buses. Give a factor for every bus or none.'.format(
+                        name, missing.count(False), len(buslist)))
+            lines += self.__lines__(name, buslist, arealist, partlist)
+        self.write(lines)
+
+    def __lines__(self, subname, buslist, arealist, partlist):
+        lines = ['SUBSYSTEM \'{}\'\n'.format(subname)]
+        lines += ['\tBUS {}\n'.format(b) for b in buslist]
+        if partlist:
+            lines.append('\tPARTICIPATE\n')
+            lines += ['\t\tBUS {} {}\n'.format(b, p) for b, p in
+                      zip(buslist, partlist)]
+            lines.append('\tEND\n')
+        lines += ['\tAREA {}\n'.format(a) for a in arealist]
+        lines.append('END\n')
+        self.entries += 1
+        return lines
+
+
+class MonitorFileBuilder(SupportFileBuilder):
+    """Writes a .mon file of monitored subsystems and branches."""
+
+    HEADER = 'Monitored element file'
+
+    def add(self, sublist, midtext='BRANCHES IN', fintext=''):
+        """Monitors subsystems, as append_monfile."""
+        self.write(['MONITOR {} SUBSYSTEM \'{}\' {}\n'.format(
+            midtext, s, fintext) for s in sublist])
+        self.entries += len(sublist)
+
+    def add_branches(self, table):
+        """Monitors the branches of a table with FROMNUMBER, TONUMBER and ID
+        columns."""
+        table = pd.DataFrame(table)
+        self.write(['MONITOR BRANCH FROM BUS {} TO BUS {} CIRCUIT {}\n'.format(
+            int(i), int(j), str(c).strip()) for i, j, c in zip(
+            table['FROMNUMBER'], table['TONUMBER'], table['ID'])])
+        self.entries += len(table.index)
+
+
+class ContingencyFileBuilder(SupportFileBuilder):
+    """Writes a .con file of automatic (subsystem) contingencies and named
+    branch contingencies."""
+
+    HEADER = 'Contingency file'
+
+    def add(self, subname, desc='SINGLE', element='BRANCH'):
+        """Adds an automatic contingency specification, as append_confile."""
+        self.write([desc + ' ' + element + ' IN SUBSYSTEM ' + subname + '\n'])
+        self.entries += 1
+
+    def add_table(self, table):
+        """Adds named contingencies from a table with LABEL, FROMNUMBER,
+        TONUMBER and ID columns and an optional ACTION column (default
+        'OPEN'). Rows with the same LABEL form one multiple element
+        contingency, written in order of first appearance."""
+        table = pd.DataFrame(table)
+        for c in ['LABEL', 'FROMNUMBER', 'TONUMBER', 'ID']:
+            if c not in table.columns:
+                raise ValueError(
+                    'Contingency table must have a {} column'.format(c))
+        n = len(table.index)
+        actions = (table['ACTION'].tolist() if 'ACTION' in table.columns else
+                   ['OPEN'] * n)
+        groups = OrderedDict()
+        for label, i, j, c, action in zip(table['LABEL'], table['FROMNUMBER'],
+                                          table['TONUMBER'], table['ID'],
+                                          actions):
+            groups.setdefault(label, []).append(
+                ' {} BRANCH FROM BUS {} TO BUS {} CIRCUIT {}\n'.format(
+                    action, int(i), int(j), str(c).strip()))
+        lines = []
+        for label, events in groups.items():
+            lines.append('CONTINGENCY \'{}\'\n'.format(label))
+            lines += events
+            lines.append('END\n')
+        self.write(lines)
+        self.entries += len(groups)
+
+
+###############################################################################
+###### CaseSnapshot and SnapshotDiff report what changed between two ##########
+############################## case states ####################################
+###############################################################################
+class CaseSnapshot(object):
+    """Tables of the key fields and compared fields of element families at
+    one case state (see pypsse.snapshot). The sorted keys of each family are
+    computed once, on first use, and reused by every diff against the
+    snapshot."""
+
+    KEYS = {'BUS': ['NUMBER'], 'MACH': ['NUMBER', 'ID'],
+            'LOAD': ['NUMBER', 'ID'], 'FXSH': ['NUMBER', 'ID'],
+            'BRN': ['FROMNUMBER', 'TONUMBER', 'ID'],
+            'TRN': ['FROMNUMBER', 'TONUMBER', 'ID'],
+            'TR3': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER', 'ID'],
+            'WND': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER', 'WNDNUM']}
+
+    def __init__(self, tables):
+        """tables maps each family to a dict of arrays or a structured array
+        holding at least its KEYS fields."""
+        self.tables = OrderedDict((family, _structured(table)) for family, table
+                                  in tables.items())
+        self.__index__ = {}
+
+    @classmethod
+    def from_model(cls, model, families=None):
+        """Returns a snapshot of the tables of a NetworkModel."""
+        families = families or [f for f in model.FAMILIES if f in cls.KEYS]
+        return cls(OrderedDict((f, model.table(f)) for f in families))
+
+    def fields(self):
+        """Returns a dict of family to the compared (non key) fields."""
+        return dict((family, [f for f in table.dtype.names or ()
+                              if f not in self.KEYS[family]])
+                    for family, table in self.tables.items())
+
+    def keys(self, family):
+        """Returns (keys, order): the key records of a family sorted, and the
+        table row of each sorted key."""
+        if family not in self.__index__:
+            table = self.tables[family]
+            names = self.KEYS[family]
+            keys = np.zeros(len(table), dtype=[
+                (str(f), 'S2' if f == 'ID' else 'i8') for f in names])
+            for f in names:
+                if f == 'ID':
+                    keys[f] = np.char.strip(table[f].astype(str))
+                else:
+                    keys[f] = table[f]
+            order = np.argsort(keys, kind='mergesort', order=names)
+            self.__index__[family] = (keys[order], order)
+        return self.__index__[family]
+
+    def align(self, other, family):
+        """Returns (rows, other_rows, removed, added): the rows of this
+        snapshot and of other holding the same elements of a family, the rows
+        of this snapshot missing from other and the rows of other missing
+        from this snapshot."""
+        skeys, sorder = self.keys(family)
+        okeys, oorder = other.keys(family)
+
+        def find(sorted_keys, keys):
+            if not len(sorted_keys):
+                return (np.zeros(len(keys), dtype=int),
+                        np.zeros(len(keys), dtype=bool))
+            pos = np.minimum(np.searchsorted(sorted_keys, keys),
+                             len(sorted_keys) - 1)
+            return pos, sorted_keys[pos] == keys
+
+        pos, found = find(skeys, okeys)
+        rpos, rfound = find(okeys, skeys)
+        return (sorder[pos[found]], oorder[found], sorder[~rfound],
+                oorder[~found])
+
+    def diff(self, after, thresholds=None, top=None):
+        """Returns the SnapshotDiff from this snapshot to after. A field
+        changes when the magnitude of its change exceeds its threshold;
+        thresholds maps a field to its threshold and defaults to
+        _DIFF_THRESHOLDS (0 for fields not listed). A field that becomes or
+        stops being NaN always changes. Non-numeric fields (e.g. names)
+        change when their values differ and have a NaN DELTA. With top, only
+        the top largest changes of each family and field are kept. Families
+        and fields that are not in both snapshots are skipped."""
+        limits = dict(_DIFF_THRESHOLDS)
+        limits.update(thresholds or {})
+        changed, added, removed = OrderedDict(), OrderedDict(), OrderedDict()
+        for family, before_table in self.tables.items():
+            if family not in after.tables:
+                continue
+            after_table = after.tables[family]
+            rows, after_rows, gone, new = self.align(after, family)
+            keys = self.KEYS[family]
+            fields = [f for f in before_table.dtype.names or ()
+                      if f not in keys and f in (after_table.dtype.names or ())]
+            parts = []
+            for f in fields:
+                old = before_table[f][rows]
+                cur = after_table[f][after_rows]
+                if not np.issubdtype(old.dtype, np.number) or \
+                        not np.issubdtype(cur.dtype, np.number):
+                    moved = np.asarray(cur != old, dtype=bool)
+                    delta = np.full(len(old), np.nan)
+                    size = np.zeros(len(old))
+                else:
+                    delta = cur - old
+                    size = np.abs(delta)
+                    with np.errstate(invalid='ignore'):
+                        moved = size > limits.get(f, 0)
+                    if np.issubdtype(size.dtype, np.floating):
+                        moved |= np.isnan(old) != np.isnan(cur)
+                idx = np.flatnonzero(moved)
+                # largest first, with changes to or from NaN ahead of all
+                weight = size[idx].astype(float)
+                weight[np.isnan(weight)] = np.inf
+                idx = idx[np.argsort(-weight, kind='mergesort')[:top]]
+                part = OrderedDict((k, after_table[k][after_rows[idx]])
+                                   for k in keys)
+                part['FIELD'] = np.repeat(f, len(idx))
+                part['BEFORE'] = old[idx]
+                part['AFTER'] = cur[idx]
+                part['DELTA'] = delta[idx]
+                parts.append(pd.DataFrame(part, columns=list(part)))
+            columns = keys + ['FIELD', 'BEFORE', 'AFTER', 'DELTA']
+            changed[family] = (pd.concat(parts, ignore_index=True) if parts
+                               else pd.DataFrame(columns=columns))
+            removed[family] = pd.DataFrame(before_table[np.sort(gone)])
+            added[family] = pd.DataFrame(after_table[np.sort(new)])
+        return SnapshotDiff(changed, added, removed)
+
+
+class SnapshotDiff(object):
+    """The changes between two CaseSnapshots: changed maps each family to a
+    dataframe with a row per changed field of an element (its key fields,
+    FIELD, BEFORE, AFTER and DELTA, largest changes first within each field),
+    and added and removed map each family to the rows of the elements that
+    exist in only one of the snapshots."""
+
+    def __init__(self, changed, added, removed):
+        self.changed = changed
+        self.added = added
+        self.removed = removed
+
+    def __len__(self):
+        return sum(len(t.index) for d in (self.changed, self.added,
+                                          self.removed) for t in d.values())
+
+    def summary(self):
+        """Returns a dataframe of the number of changed, added and removed
+        elements of each family."""
+        rows = [[family,
+                 len(self.changed[family].drop_duplicates(
+                     CaseSnapshot.KEYS[family]).index),
+                 len(self.added[family].index),
+                 len(self.removed[family].index)]
+                for family in self.changed]
+        return pd.DataFrame(rows, columns=['FAMILY', 'CHANGED', 'ADDED',
+                                           'REMOVED'])
+
+    def field(self, family, field):
+        """Returns the changes of one field of a family."""
+        table = self.changed[family]
+        return table[table['FIELD'] == field].reset_index(drop=True)
+
+
+###############################################################################
+###### ViolationScanner finds and ranks thermal and voltage violations ########
+########### across many runs without building dense per-run tables ############
+###############################################################################
+class ViolationScanner(object):
+    """Scans retrieved arrays for thermal violations (rating field above
+    thermal_limit percent) and voltage violations (PU outside the normal
+    NVLMHI/NVLMLO or emergency EVLMHI/EVLMLO limits). Each scan keeps only
+    the violating elements as sparse records, pushes them into bounded heaps
+    of the top_k worst violations over all runs and updates per-element
+    counts and worst values."""
+
+    def __init__(self, top_k=100, rating='MAXPCTRATE', thermal_limit=100.0,
+                 limits='normal', ignore_dead=True):
+        if limits not in ('normal', 'emergency'):
+            raise ValueError('Invalid limits \'{}\'. Expected one of: {}'.format(
+                limits, ['normal', 'emergency']))
+        self.top_k = top_k
+        self.rating = rating
+        self.thermal_limit = thermal_limit
+        if limits == 'normal':
+            self.voltage_limits = ('NVLMHI', 'NVLMLO')
+        else:
+            self.voltage_limits = ('EVLMHI', 'EVLMLO')
+        self.ignore_dead = ignore_dead
+        self.runs = 0
+        self.__thermal__ = []
+        self.__voltage__ = []
+        self.__records__ = []
+        self.__elements__ = {}
+        self.__keys__ = []
+        self.__count__ = []
+        self.__worst__ = []
+
+    def __element__(self, key):
+        """Internal function returns the integer ID of an element key."""
+        if key not in self.__elements__:
+            self.__elements__[key] = len(self.__keys__)
+            self.__keys__.append(key)
+            self.__count__.append(0)
+            self.__worst__.append(0.0)
+        return self.__elements__[key]
+
+    def __push__(self, heap, rows, severity, items):
+        """Internal function pushes the top_k most severe rows into a heap."""
+        if len(rows) > self.top_k:
+            rows = rows[np.argpartition(-severity[rows], self.top_k - 1)[
+                        :self.top_k]]
+        for r in rows:
+            item = (float(severity[r]),) + items(r)
+            if len(heap) < self.top_k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heappushpop(heap, item)
+
+    def scan_thermal(self, run, kind, frm, to, ckt, pct):
+        """Scans loadings (percent of rating) of branches (kind 'BRN') or
+        transformers ('TRN'). Returns the number of violations."""
+        pct = np.asarray(pct, dtype=float)
+        rows = np.flatnonzero(pct > self.thermal_limit)
+        if not len(rows):
+            return 0
+        ids = np.empty(len(rows), dtype=int)
+        for n, r in enumerate(rows):
+            e = self.__element__((kind, int(frm[r]), int(to[r]),
+                                  str(ckt[r]).strip()))
+            ids[n] = e
+            self.__count__[e] += 1
+            self.__worst__[e] = max(self.__worst__[e], float(pct[r]))
+        self.__records__.append((np.full(len(rows), run, dtype=object), ids,
+                                 pct[rows]))
+        self.__push__(self.__thermal__, rows, pct,
+                      lambda r: (run, kind, int(frm[r]), int(to[r]),
+                                 str(ckt[r]).strip()))
+        return len(rows)
+
+    def scan_voltage(self, run, busnums, pu, vmax, vmin):
+        """Scans bus voltages against upper and lower limits. Severity is the
+        per unit distance outside the limit. Returns the number of
+        violations."""
+        pu = np.asarray(pu, dtype=float)
+        severity = np.maximum(pu - np.asarray(vmax, dtype=float),
+                              np.asarray(vmin, dtype=float) - pu)
+        viol = severity > 0
+        if self.ignore_dead:
+            viol &= pu > 0
+        rows = np.flatnonzero(viol)
+        if not len(rows):
+            return 0
+        ids = np.empty(len(rows), dtype=int)
+        for n, r in enumerate(rows):
+            e = self.__element__(('BUS', int(busnums[r])))
+            ids[n] = e
+            self.__count__[e] += 1
+            self.__worst__[e] = max(self.__worst__[e], float(severity[r]))
+        self.__records__.append((np.full(len(rows), run, dtype=object), ids,
+                                 pu[rows]))
+        self.__push__(self.__voltage__, rows, severity,
+                      lambda r: (run, int(busnums[r]), float(pu[r])))
+        return len(rows)
+
+    def scan(self, run, brn=None, trn=None, bus=None):
+        """Scans one run. brn and trn hold FROMNUMBER, TONUMBER, ID and the
+        rating field; bus holds NUMBER, PU and the voltage limit fields. Each
+        may be a dict of arrays or a ResultTable. Returns the number of
+        violations."""
+        found = 0
+        for kind, arrs in [('BRN', brn), ('TRN', trn)]:
+            if arrs is not None:
+                found += self.scan_thermal(run, kind, arrs['FROMNUMBER'],
+                                           arrs['TONUMBER'], arrs['ID'],
+                                           arrs[self.rating])
+        if bus is not None:
+            found += self.scan_voltage(run, bus['NUMBER'], bus['PU'],
+                                       bus[self.voltage_limits[0]],
+                                       bus[self.voltage_limits[1]])
+        self.runs += 1
+        return found
+
+    def worst_thermal(self):
+        """Returns a dataframe of the top_k worst thermal violations."""
+        rows = sorted(self.__thermal__, reverse=True)
+        return pd.DataFrame([(r[1], r[2], r[3], r[4], r[5], r[0]) for r in rows],
+                            columns=['RUN', 'KIND', 'FROMNUMBER', 'TONUMBER',
+                                     'ID', self.rating])
+
+    def worst_voltage(self):
+        """Returns a dataframe of the top_k worst voltage violations."""
+        rows = sorted(self.__voltage__, reverse=True)
+        return pd.DataFrame([(r[1], r[2], r[3], r[0]) for r in rows],
+                            columns=['RUN', 'NUMBER', 'PU', 'DEVIATION'])
+
+    def element_summary(self):
+        """Returns a dataframe of each violating element's key, number of runs
+        in violation and worst value (percent loading or per unit deviation),
+        most frequent first."""
+        df = pd.DataFrame({'KEY': self.__keys__, 'COUNT': self.__count__,
+                           'WORST': self.__worst__},
+                          columns=['KEY', 'COUNT', 'WORST'])
+        return df.sort_values(['COUNT', 'WORST'], ascending=False)
+
+    def records(self):
+        """Returns a dataframe of every violation record (RUN, KEY, VALUE),
+        where VALUE is the percent loading or the per unit voltage."""
+        if not self.__records__:
+            return pd.DataFrame(columns=['RUN', 'KEY', 'VALUE'])
+        runs = np.concatenate([r[0] for r in self.__records__])
+        ids = np.concatenate([r[1] for r in self.__records__])
+        vals = np.concatenate([r[2] for r in self.__records__])
+        keys = np.empty(len(self.__keys__), dtype=object)
+        for n, k in enumerate(self.__keys__):
+            keys[n] = k
+        return pd.DataFrame({'RUN': runs, 'KEY': keys[ids], 'VALUE': vals},
+                            columns=['RUN', 'KEY', 'VALUE'])
+
+
+###############################################################################
+##### Shared tables publish arrays in memory mapped segments which other ######
+################ processes attach to as views without copying #################
+###############################################################################
+class SharedTablePublisher(object):
+    """Publishes tables (dicts of arrays, ResultTables or dataframes) as named
+    memory mapped segments in SHARED_LOCATION (tmpfs on Linux), with a JSON
+    schema descriptor and a generation counter. Each publish writes a new
+    segment for the table, replaces the descriptor (see _replace_file) and
+    increments the generation, so readers holding the previous segment keep a
+    valid (stale) snapshot until they reattach. The previous segment of a
+    table is removed on the publish after next, so a reader which read the
+    descriptor just before a publish can still map the segment it names."""
+
+    ALIGN = 64
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path or SHARED_LOCATION
+        self.generation = 0
+        self.tables = {}
+        self.__files__ = []
+        self.__retired__ = {}
+        self.__gen__ = np.memmap(self.__file__('gen'), dtype=np.int64,
+                                 mode='w+', shape=(1,))
+        self.__gen__[0] = 0
+        self.__files__.append(self.__file__('gen'))
+
+    def __file__(self, suffix):
+        """Internal function returns the path of one of the segment files."""
+        return os.path.join(self.path, 'pypsse.{}.{}'.format(self.name, suffix))
+
+    def publish(self, table, data):
+        """Publishes data as table. Returns the new generation."""
+        if isinstance(data, pd.DataFrame):
+            data = OrderedDict((c, data[c].values) for c in data.columns)
+        elif isinstance(data, ResultTable):
+            data = data.arrays
+        columns = []
+        offset = 0
+        arrays = []
+        nrows = None
+        for col, arr in data.items():
+            arr = np.asarray(arr)
+            if arr.dtype == object:
+                arr = np.array(arr.tolist())
+            if nrows is None:
+                nrows = len(arr)
+            elif len(arr) != nrows:
+                raise ValueError(
+                    'Column {} has {} rows. Expected {}.'.format(col, len(arr),
+                                                                 nrows))
+            offset = -(-offset // self.ALIGN) * self.ALIGN
+            columns.append([col, arr.dtype.str, offset])
+            arrays.append((offset, arr))
+            offset += arr.nbytes
+        self.generation += 1
+        segment = self.__file__('{}.{}'.format(table, self.generation))
+        mm = np.memmap(segment, dtype=np.uint8, mode='w+',
+                       shape=(max(offset, 1),))
+        for start, arr in arrays:
+            mm[start:start + arr.nbytes] = np.ascontiguousarray(arr).view(
+                np.uint8)
+        mm.flush()
+        del mm
+        self.__files__.append(segment)
+        previous = self.tables.get(table)
+        self.tables[table] = {'file': segment, 'rows': nrows or 0,
+                              'columns': columns,
+                              'generation': self.generation}
+        descriptor = self.__file__('json')
+        tmp = descriptor + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'generation': self.generation, 'tables': self.tables}, f)
+        _replace_file(tmp, descriptor)
+        if descriptor not in self.__files__:
+            self.__files__.append(descriptor)
+        self.__gen__[0] = self.generation
+        self.__gen__.flush()
+        if table in self.__retired__:
+            self.__remove__(self.__retired__.pop(table))
+        if previous is not None:
+            self.__retired__[table] = previous['file']
+        return self.generation
+
+    def __remove__(self, path):
+        """Internal function unlinks a segment. Attached readers keep their
+        mapping; where the platform refuses (Windows), the file is left for
+        close."""
+        try:
+            os.remove(path)
+            self.__files__.remove(path)
+        except OSError:
+            pass
+
+    def close(self):
+        """Removes every segment and the descriptor."""
+        self.__gen__ = None
+        for path in list(self.__files__):
+            self.__remove__(path)
+
+
+class SharedTableReader(object):
+    """Attaches to the tables of a SharedTablePublisher. arrays returns
+    read-only numpy views of the segment without copying. is_stale reports
+    whether the publisher has published since attach."""
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path or SHARED_LOCATION
+        self.__gen__ = np.memmap(os.path.join(
+            self.path, 'pypsse.{}.gen'.format(name)), dtype=np.int64, mode='r',
+            shape=(1,))
+        self.attach()
+
+    def attach(self):
+        """Reads the descriptor and maps the current segments."""
+        with open(os.path.join(self.path, 'pypsse.{}.json'.format(
+                self.name))) as f:
+            descriptor = json.load(f)
+        self.generation = descriptor['generation']
+        self.tables = descriptor['tables']
+        self.__maps__ = {}
+        for table, info in self.tables.items():
+            self.__maps__[table] = np.memmap(info['file'], dtype=np.uint8,
+                                             mode='r')
+        return self.generation
+
+    def is_stale(self):
+        """Returns True if the publisher has published since attach."""
+        return int(self.__gen__[0]) != self.generation
+
+    def arrays(self, table):
+        """Returns an ordered dict of read-only views of the table's columns."""
+        info = self.tables[table]
+        mm = self.__maps__[table]
+        out = OrderedDict()
+        for col, dtype, offset in info['columns']:
+            out[col] = np.ndarray(shape=(info['rows'],), dtype=np.dtype(dtype),
+                                  buffer=mm, offset=offset)
+        return out
+
+    def frame(self, table):
+        """Returns a dataframe of the table built on the views. pandas may
+        still copy when it consolidates columns of the same data type."""
+        arrays = self.arrays(table)
+        return pd.DataFrame(arrays, columns=list(arrays.keys()), copy=False)
+
+
+###############################################################################
+##### ContingencyStore keeps contingency results in compressed column #########
+######### blocks indexed by contingency and element for random access #########
+###############################################################################
+class ContingencyStoreWriter(object):
+    """Writes sparse contingency result records to a ContingencyStore
+    directory. Each record is a contingency, an element key (('BRN', from,
+    to, ckt), ('TRN', from, to, ckt) or ('BUS', number)), a VALUE (percent
+    loading or per unit voltage) and a SEVERITY (percent above the thermal
+    limit or per unit distance outside the voltage limits; negative when
+    within limits). Thermal records are kept for loadings of at least
+    min_loading percent (default: violations only), voltage records for
+    violations only.
+
+    Records are written twice as blocks of zlib compressed columns: once in
+    blocks of consecutive contingencies, and once in blocks of ranges of
+    bucket_elements elements (in order of first appearance), so that both
+    contingency and element queries decompress only a few blocks. Each
+    layout buffers up to block_rows records per block. The contingency and
+    element posting lists, element summaries and block index are written on
+    close."""
+
+    COLUMNS = [('CTG', np.int32), ('ELEMENT', np.int32),
+               ('VALUE', np.float32), ('SEVERITY', np.float32)]
+
+    def __init__(self, directory, block_rows=16384, bucket_elements=256,
+                 level=6,
+                 rating='MAXPCTRATE', thermal_limit=100.0, limits='normal',
+                 ignore_dead=True, min_loading=None):
+        if limits not in ('normal', 'emergency'):
+            raise ValueError('Invalid limits \'{}\'. Expected one of: {}'.format(
+                limits, ['normal', 'emergency']))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.block_rows = block_rows
+        self.bucket_elements = bucket_elements
+        self.level = level
+        self.rating = rating
+        self.thermal_limit = thermal_limit
+        if limits == 'normal':
+            self.voltage_limits = ('NVLMHI', 'NVLMLO')
+        else:
+            self.voltage_limits = ('EVLMHI', 'EVLMLO')
+        self.ignore_dead = ignore_dead
+        self.min_loading = thermal_limit if min_loading is None else min_loading
+        self.labels = []
+        self.keys = []
+        self.__labels__ = {}
+        self.__elements__ = {}
+        self.__buffer__ = []
+        self.__buffered__ = 0
+        self.__buckets__ = {}
+        self.__bucketed__ = {}
+        self.__blocks__ = []
+        self.__postings__ = {'CTG': [], 'ELEMENT': []}
+        self.__count__ = np.zeros(0, dtype=np.int64)
+        self.__worst__ = np.zeros(0, dtype=np.float32)
+        self.__file__ = open(os.path.join(directory, 'records.bin'), 'wb',
+                             1 << 20)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contingency__(self, label):
+        """Internal function returns the integer ID of a contingency label."""
+        if label not in self.__labels__:
+            self.__labels__[label] = len(self.labels)
+            self.labels.append(label)
+        return self.__labels__[label]
+
+    def __element__(self, key):
+        """Internal function returns the integer ID of an element key."""
+        if key not in self.__elements__:
+            self.__elements__[key] = len(self.keys)
+            self.keys.append(key)
+        return self.__elements__[key]
+
+    def add(self, label, keys, values, severity):
+        """Adds the records of one contingency: element keys with their
+        values and severities. Returns the number of records added."""
+        ctg = self.__contingency__(label)
+        ids = np.array([self.__element__(k) for k in keys], dtype=np.int32)
+        if not len(ids):
+            return 0
+        record = (np.full(len(ids), ctg, dtype=np.int32), ids,
+                  np.asarray(values, dtype=np.float32),
+                  np.asarray(severity, dtype=np.float32))
+        self.__buffer__.append(record)
+        self.__buffered__ += len(ids)
+        buckets = ids // self.bucket_elements
+        for bucket in np.unique(buckets).tolist():
+            rows = buckets == bucket
+            self.__buckets__.setdefault(bucket, []).append(
+                [c[rows] for c in record])
+            self.__bucketed__[bucket] = (self.__bucketed__.get(bucket, 0) +
+                                         int(rows.sum()))
+            if self.__bucketed__[bucket] >= self.block_rows:
+                self.__flush_bucket__(bucket)
+        if self.__buffered__ >= self.block_rows:
+            self.flush()
+        return len(ids)
+
+    def add_thermal(self, label, kind, frm, to, ckt, pct):
+        """Adds the loadings (percent of rating) of branches (kind 'BRN') or
+        transformers ('TRN') of at least min_loading percent. Returns the
+        number of records added."""
+        pct = np.asarray(pct, dtype=float)
+        rows = np.flatnonzero(pct >= self.min_loading)
+        keys = [(kind, int(frm[r]), int(to[r]), str(ckt[r]).strip())
+                for r in rows]
+        return self.add(label, keys, pct[rows], pct[rows] - self.thermal_limit)
+
+    def add_voltage(self, label, busnums, pu, vmax, vmin):
+        """Adds the bus voltages outside their upper and lower limits.
+        Returns the number of records added."""
+        pu = np.asarray(pu, dtype=float)
+        severity = np.maximum(pu - np.asarray(vmax, dtype=float),
+                              np.asarray(vmin, dtype=float) - pu)
+        viol = severity > 0
+        if self.ignore_dead:
+            viol &= pu > 0
+        rows = np.flatnonzero(viol)
+        return self.add(label, [('BUS', int(busnums[r])) for r in rows],
+                        pu[rows], severity[rows])
+
+    def scan(self, label, brn=None, trn=None, bus=None):
+        """Adds the records of one contingency from arrays in the
+        ViolationScanner.scan format. Returns the number of records
+        added."""
+        self.__contingency__(label)
+        added = 0
+        for kind, arrs in [('BRN', brn), ('TRN', trn)]:
+            if arrs is not None:
+                added += self.add_thermal(label, kind, arrs['FROMNUMBER'],
+                                          arrs['TONUMBER'], arrs['ID'],
+                                          arrs[self.rating])
+        if bus is not None:
+            added += self.add_voltage(label, bus['NUMBER'], bus['PU'],
+                                      bus[self.voltage_limits[0]],
+                                      bus[self.voltage_limits[1]])
+        return added
+
+    def __write__(self, parts, name):
+        """Internal function writes record column parts as one block sorted
+        by the CTG or ELEMENT column (name) and adds the block to that
+        column's posting lists. Returns the sorted columns."""
+        cols = [np.concatenate([p[n] for p in parts])
+                for n in range(len(self.COLUMNS))]
+        primary = 0 if name == 'CTG' else 1
+        order = np.lexsort((cols[1 - primary], cols[primary]))
+        cols = [c[order] for c in cols]
+        block = len(self.__blocks__)
+        entry = [len(order)]
+        for col in cols:
+            data = zlib.compress(col.tostring(), self.level)
+            entry += [self.__file__.tell(), len(data)]
+            self.__file__.write(data)
+        self.__blocks__.append(entry)
+        ids = np.unique(cols[primary])
+        self.__postings__[name].append(np.column_stack(
+            [ids, np.repeat(block, len(ids))]))
+        return cols
+
+    def __flush_bucket__(self, bucket):
+        """Internal function writes the buffered records of an element bucket
+        as one block."""
+        self.__write__(self.__buckets__.pop(bucket), 'ELEMENT')
+        del self.__bucketed__[bucket]
+
+    def flush(self):
+        """Writes the buffered records of consecutive contingencies as one
+        block. Element buckets are written when full and on close."""
+        if not self.__buffered__:
+            return
+        cols = self.__write__(self.__buffer__, 'CTG')
+        self.__buffer__ = []
+        self.__buffered__ = 0
+        element, severity = cols[1], cols[3]
+        n = len(self.keys)
+        if len(self.__count__) < n:
+            self.__count__ = np.append(
+                self.__count__, np.zeros(n - len(self.__count__), np.int64))
+            self.__worst__ = np.append(
+                self.__worst__, np.full(n - len(self.__worst__), -np.inf,
+                                        np.float32))
+        np.add.at(self.__count__, element, severity > 0)
+        np.maximum.at(self.__worst__, element, severity)
+
+    def __save__(self, name, array):
+        """Internal function writes an index array as a .npy file."""
+        np.save(os.path.join(self.directory, name + '.npy'), array)
+
+    def close(self):
+        """Writes the last block and the index. Returns the directory."""
+        if self.__file__.closed:
+            return self.directory
+        self.flush()
+        for bucket in sorted(self.__buckets__):
+            self.__flush_bucket__(bucket)
+        self.__file__.close()
+        self.__save__('blocks', np.array(self.__blocks__, dtype=np.int64)
+                      .reshape(-1, 1 + 2 * len(self.COLUMNS)))
+        for name, size in [('CTG', len(self.labels)),
+                           ('ELEMENT', len(self.keys))]:
+            pairs = (np.concatenate(self.__postings__[name]) if
+                     self.__postings__[name] else np.zeros((0, 2), np.int64))
+            pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+            ptr = np.concatenate([[0], np.cumsum(np.bincount(
+                pairs[:, 0], minlength=size))]).astype(np.int64)
+            self.__save__(name.lower() + '_ptr', ptr)
+            self.__save__(name.lower() + '_blocks', pairs[:, 1].astype(np.int64))
+        n = len(self.keys)
+        self.__save__('count', np.append(
+            self.__count__, np.zeros(n - len(self.__count__), np.int64)))
+        self.__save__('worst', np.append(
+            self.__worst__, np.full(n - len(self.__worst__), -np.inf,
+                                    np.float32)))
+        tmp = os.path.join(self.directory, 'store.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'labels': self.labels,
+                       'keys': [list(k) for k in self.keys],
+                       'columns': [[c, np.dtype(t).str] for c, t in
+                                   self.COLUMNS],
+                       'rating': self.rating,
+                       'thermal_limit': self.thermal_limit}, f)
+        _replace_file(tmp, os.path.join(self.directory, 'store.json'))
+        return self.directory
+
+
+class ContingencyStore(object):
+    """Reads a store written by ContingencyStoreWriter. The record file and
+    index arrays are memory mapped, and only the blocks holding the
+    requested contingency or element are decompressed; the last cache_blocks
+    decompressed blocks are kept."""
+
+    def __init__(self, directory, cache_blocks=32):
+        self.directory = directory
+        with open(os.path.join(directory, 'store.json')) as f:
+            meta = json.load(f)
+        self.labels = meta['labels']
+        self.keys = [tuple(k) for k in meta['keys']]
+        self.columns = [(c, np.dtype(str(t))) for c, t in meta['columns']]
+        self.rating = meta['rating']
+        self.thermal_limit = meta['thermal_limit']
+        self.__labels__ = dict((l, n) for n, l in enumerate(self.labels))
+        self.__elements__ = dict((k, n) for n, k in enumerate(self.keys))
+        # object arrays to look up labels and keys by ID
+        self.__label_array__ = np.empty(len(self.labels), dtype=object)
+        self.__label_array__[:] = self.labels
+        self.__key_array__ = np.empty(len(self.keys), dtype=object)
+        for n, k in enumerate(self.keys):
+            self.__key_array__[n] = k
+        self.__index__ = {}
+        for name in ['blocks', 'ctg_ptr', 'ctg_blocks', 'element_ptr',
+                     'element_blocks', 'count', 'worst']:
+            self.__index__[name] = np.load(os.path.join(
+                directory, name + '.npy'), mmap_mode='r')
+        path = os.path.join(directory, 'records.bin')
+        self.__records__ = (np.memmap(path, dtype=np.uint8, mode='r') if
+                            os.path.getsize(path) else np.zeros(0, np.uint8))
+        self.cache_blocks = cache_blocks
+        self.__cache__ = OrderedDict()
+
+    def __len__(self):
+        blocks = np.unique(self.__index__['ctg_blocks'])
+        return int(self.__index__['blocks'][blocks, 0].sum())
+
+    def __block__(self, block):
+        """Internal function returns the decompressed columns of a block."""
+        if block in self.__cache__:
+            cols = self.__cache__.pop(block)
+        else:
+            entry = self.__index__['blocks'][block]
+            cols = []
+            for n, (name, dtype) in enumerate(self.columns):
+                start, size = int(entry[1 + 2 * n]), int(entry[2 + 2 * n])
+                cols.append(np.frombuffer(zlib.decompress(
+                    self.__records__[start:start + size].tostring()),
+                    dtype=dtype))
+            if len(self.__cache__) >= self.cache_blocks:
+                self.__cache__.popitem(last=False)
+        self.__cache__[block] = cols
+        return cols
+
+    def __postings__(self, name, n):
+        """Internal function returns the blocks holding a contingency or
+        element ID."""
+        ptr = self.__index__[name + '_ptr']
+        return self.__index__[name + '_blocks'][ptr[n]:ptr[n + 1]]
+
+    def __frame__(self, parts):
+        """Internal function returns a dataframe of record column parts."""
+        if parts:
+            cols = [np.concatenate([p[n] for p in parts])
+                    for n in range(len(self.columns))]
+        else:
+            cols = [np.zeros(0, dtype=t) for c, t in self.columns]
+        return pd.DataFrame(OrderedDict([
+            ('CONTINGENCY', self.__label_array__[cols[0]]),
+            ('KEY', self.__key_array__[cols[1]]),
+            ('VALUE', cols[2]), ('SEVERITY', cols[3])]))
+
+    def contingency(self, label, violations=False):
+        """Returns a dataframe of the records (CONTINGENCY, KEY, VALUE,
+        SEVERITY) of a contingency, most severe first. With violations, only
+        records with positive severity are returned."""
+        if label not in self.__labels__:
+            raise KeyError('Unknown contingency {}'.format(label))
+        ctg = self.__labels__[label]
+        parts = []
+        for block in self.__postings__('ctg', ctg):
+            cols = self.__block__(int(block))
+            rows = cols[0] == ctg
+            if violations:
+                rows &= cols[3] > 0
+            parts.append([c[rows] for c in cols])
+        df = self.__frame__(parts)
+        return df.sort_values('SEVERITY', ascending=False, kind='mergesort'
+                              ).reset_index(drop=True)
+
+    def element(self, key, top=None, violations=False):
+        """Returns a dataframe of the records of an element key over all
+        contingencies, most severe first (the worst contingencies for the
+        element); the top most severe if top is given."""
+        key = tuple(key)
+        if key not in self.__elements__:
+            raise KeyError('Unknown element {}'.format(key))
+        element = self.__elements__[key]
+        parts = []
+        for block in self.__postings__('element', element):
+            cols = self.__block__(int(block))
+            lo, hi = np.searchsorted(cols[1], [element, element + 1])
+            part = [c[lo:hi] for c in cols]
+            if violations:
+                part = [c[part[3] > 0] for c in part]
+            parts.append(part)
+        df = self.__frame__(parts)
+        df = df.sort_values('SEVERITY', ascending=False, kind='mergesort')
+        return df.head(top).reset_index(drop=True) if top else \
+            df.reset_index(drop=True)
+
+    def element_summary(self):
+        """Returns a dataframe of each element's key, number of
+        contingencies in violation and worst severity, read from the index
+        without decompressing any block. Most frequent first."""
+        df = pd.DataFrame(OrderedDict([
+            ('KEY', self.__key_array__),
+            ('COUNT', np.asarray(self.__index__['count'])),
+            ('WORST', np.asarray(self.__index__['worst']))]))
+        return df.sort_values(['COUNT', 'WORST'], ascending=False)
+
+
+###############################################################################
+#### NetworkModel holds the case tables as numpy structured arrays with bus ###
+############# number indexes and lightweight element views ####################
+###############################################################################
+class Element(object):
+    """View of one row of a NetworkModel table. Fields are read as attributes
+    (or items, for names such as 'RX1-2ACT') and written as items."""
+    __slots__ = ('table', 'row')
+    kind = None
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getattr__(self, name):
+        try:
+            return self.table[name][self.row]
+        except (ValueError, KeyError):
+            raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self.table[name][self.row]
+
+    def __setitem__(self, name, value):
+        self.table[name][self.row] = value
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(f, self.table[f][self.row])
+            for f in self.table.dtype.names[:4]))
+
+
+class Bus(Element):
+    __slots__ = ()
+    kind = 'BUS'
+
+
+class Branch(Element):
+    __slots__ = ()
+    kind = 'BRN'
+
+
+class Transformer(Element):
+    __slots__ = ()
+    kind = 'TRN'
+
+
+class Transformer3(Element):
+    __slots__ = ()
+    kind = 'TR3'
+
+
+class Winding(Element):
+    __slots__ = ()
+    kind = 'WND'
+
+
+class Machine(Element):
+    __slots__ = ()
+    kind = 'MACH'
+
+
+class Load(Element):
+    __slots__ = ()
+    kind = 'LOAD'
+
+
+class FixedShunt(Element):
+    __slots__ = ()
+    kind = 'FXSH'
+
+
+class NetworkModel(object):
+    """Case tables as numpy structured arrays: buses, branches, transformers,
+    transformers3, machines and loads. Bus numbers map to bus rows through a
+    sorted index, and the terminal bus rows of branches and transformers are
+    precomputed (e.g. branch_rows['FROMNUMBER']). Elements are returned as
+    __slots__ views (Bus, Branch, ...) which read the arrays directly."""
+
+    FAMILIES = OrderedDict([('BUS', ('buses', Bus)),
+                            ('BRN', ('branches', Branch)),
+                            ('TRN', ('transformers', Transformer)),
+                            ('TR3', ('transformers3', Transformer3)),
+                            ('WND', ('windings', Winding)),
+                            ('MACH', ('machines', Machine)),
+                            ('LOAD', ('loads', Load)),
+                            ('FXSH', ('shunts', FixedShunt))])
+    TERMINALS = {'BRN': ['FROMNUMBER', 'TONUMBER'],
+                 'TRN': ['FROMNUMBER', 'TONUMBER'],
+                 'TR3': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER'],
+                 'WND': ['WIND1NUMBER', 'WIND2NUMBER', 'WIND3NUMBER'],
+                 'MACH': ['NUMBER'], 'LOAD': ['NUMBER'], 'FXSH': ['NUMBER']}
+
+    def __init__(self, tables, sbase=100.0):
+        """tables maps each family to a dict of arrays (as returned by
+        pypsse.__fetch_arrays__) or a structured array. sbase is the system
+        MVA base."""
+        for family, (attr, view) in self.FAMILIES.items():
+            setattr(self, attr, _structured(tables.get(family, {})))
+        self.sbase = sbase
+        self.reindex()
+
+    def table(self, family):
+        """Returns the structured array of a family."""
+        return getattr(self, self.FAMILIES[family][0])
+
+    def reindex(self):
+        """Rebuilds the bus number index and terminal rows. Call after rows
+        are added to or removed from the tables."""
+        numbers = self.buses['NUMBER'] if len(self.buses) else np.array(
+            [], dtype=int)
+        self.__order__ = np.argsort(numbers, kind='mergesort')
+        self.__sorted__ = numbers[self.__order__]
+        self.__terminals__ = {}
+        self.__incidence__ = {}
+        for family, fields in self.TERMINALS.items():
+            table = self.table(family)
+            self.__terminals__[family] = OrderedDict(
+                (f, self.bus_rows(table[f]) if len(table) else
+                 np.array([], dtype=int)) for f in fields
+                if f in (table.dtype.names or ()))
+
+    def bus_rows(self, busnums, missing=None):
+        """Returns the bus row of each bus number. Unknown numbers raise
+        KeyError, or map to missing if it is given."""
+        busnums = np.asarray(busnums, dtype=int)
+        if not len(self.__sorted__):
+            pos = np.zeros(busnums.shape, dtype=int)
+            found = np.zeros(busnums.shape, dtype=bool)
+        else:
+            pos = np.minimum(np.searchsorted(self.__sorted__, busnums),
+                             len(self.__sorted__) - 1)
+            found = self.__sorted__[pos] == busnums
+        if not found.all():
+            if missing is None:
+                raise KeyError('Unknown bus numbers: {}'.format(
+                    busnums[~found].tolist()))
+            rows = np.where(found, self.__order__[pos] if len(
+                self.__order__) else 0, missing)
+            return rows
+        return self.__order__[pos]
+
+    def terminal_rows(self, family):
+        """Returns an ordered dict of terminal field to bus rows of a family."""
+        return self.__terminals__[family]
+
+    def __rows_at__(self, family, busnum):
+        """Internal function returns the rows of a family connected to a bus,
+        from an incidence index built on first use."""
+        if family not in self.__incidence__:
+            nbus = len(self.buses)
+            ends = np.concatenate(list(self.__terminals__[family].values()) or
+                                  [np.array([], dtype=int)])
+            rows = np.concatenate([np.arange(len(self.table(family)))] * max(
+                len(self.__terminals__[family]), 1))[:len(ends)]
+            order = np.argsort(ends, kind='mergesort')
+            ptr = np.concatenate([[0], np.cumsum(np.bincount(
+                ends, minlength=nbus))]) if nbus else np.zeros(1, dtype=int)
+            self.__incidence__[family] = (ptr, rows[order])
+        ptr, rows = self.__incidence__[family]
+        b = self.bus_rows([busnum])[0]
+        return np.unique(rows[ptr[b]:ptr[b + 1]])
+
+    def bus(self, busnum):
+        """Returns the Bus view of a bus number."""
+        return Bus(self.buses, int(self.bus_rows([busnum])[0]))
+
+    def elements(self, family):
+        """Iterates over the element views of a family."""
+        table = self.table(family)
+        view = self.FAMILIES[family][1]
+        for row in xrange(len(table)):
+            yield view(table, row)
+
+    def at_bus(self, family, busnum):
+        """Returns the element views of a family connected to a bus."""
+        table = self.table(family)
+        view = self.FAMILIES[family][1]
+        return [view(table, int(r)) for r in self.__rows_at__(family, busnum)]
+
+    def neighbors(self, busnum):
+        """Returns the numbers of buses connected to a bus through branches
+        and transformers of any status."""
+        b = self.bus_rows([busnum])[0]
+        out = set()
+        for family in ['BRN', 'TRN', 'TR3']:
+            rows = self.__rows_at__(family, busnum)
+            for ends in self.__terminals__[family].values():
+                out.update(ends[rows].tolist())
+        out.discard(b)
+        return sorted(self.buses['NUMBER'][list(out)].tolist())
+
+    def copy(self):
+        """Returns a deep copy of the model."""
+        return NetworkModel(dict((f, self.table(f).copy())
+                                 for f in self.FAMILIES), sbase=self.sbase)
+
+    def apply(self, changes):
+        """Applies changes in the pypsse.run_study format to the model tables:
+        ['MACH', bus, id, pgen] or ['LOAD', bus, id, pload, qload, status],
+        where None leaves a value unchanged. Raises ValueError for an invalid
+        change type or an element not in the model."""
+        for change in changes:
+            if change[0] not in ('MACH', 'LOAD'):
+                raise ValueError('Invalid change type \'{}\''.format(change[0]))
+            table = self.table(change[0])
+            rows = np.flatnonzero((table['NUMBER'] == change[1]) &
+                                  (table['ID'] == str(change[2])))
+            if not len(rows):
+                raise ValueError('{} {} \'{}\' is not in the model'.format(
+                    change[0], change[1], change[2]))
+            row = rows[0]
+            if change[0] == 'MACH':
+                if change[3] is not None:
+                    table['PGEN'][row] = change[3]
+                continue
+            old = table['MVANOM'][row]
+            table['MVANOM'][row] = complex(
+                old.real if change[3] is None else change[3],
+                old.imag if change[4] is None else change[4])
+            if len(change) > 5 and change[5] is not None:
+                table['STATUS'][row] = change[5]
+
+    def to_frame(self, family):
+        """Returns a dataframe copy of a family's table."""
+        return pd.DataFrame(self.table(family).copy())
+
+    def topology(self):
+        """Returns a Topology of the model. Requires bus TYPE and element
+        STATUS and ID fields."""
+        return Topology(self.buses, self.branches, self.transformers,
+                        self.transformers3)
+
+
+def write_raw(model, filepath, rev=33, titles=('', '')):
+    """Writes a NetworkModel to a PSS/E RAW file of revision 33 or 34. Buses,
+    loads, fixed shunts, machines, branches and two and three winding
+    transformers are written; the remaining sections are left empty, so DC
+    lines, FACTS devices, switched shunts and area interchange data are not
+    carried over. Transformers are written with CW = CZ = CM = 1 (per unit
+    ratios, and impedances and magnetizing admittances on the system base).
+    Machines are written with the regulated bus and scheduled voltage of
+    their plant (IREG and VSPU, see pypsse.get_network_model), or with the
+    voltage of their own bus if the model has no plant data. Each section is
+    formatted column-wise and written in bulk."""
+    if rev not in _RAW_SECTIONS:
+        raise ValueError('RAW revision must be 33 or 34, not {}'.format(rev))
+    sections = _RAW_SECTIONS[rev]
+    writers = {'BUS': _raw_buses, 'LOAD': _raw_loads,
+               'FIXED SHUNT': _raw_shunts, 'GENERATOR': _raw_machines,
+               'BRANCH': _raw_branches, 'TRANSFORMER': _raw_transformers}
+    tmppath = filepath + '.tmp'
+    with open(tmppath, 'w', 1 << 20) as f:
+        f.write('0,{:9.2f}, {}, 0, 1, 60.00     / PSS(R)E-{} RAW created by '
+                'pypsse  {}\n'.format(model.sbase, rev, rev,
+                                      time.strftime('%a, %b %d %Y  %H:%M')))
+        f.write('{}\n{}\n'.format(*titles))
+        for n, section in enumerate(sections):
+            if section in writers:
+                f.write(''.join(writers[section](model, rev)))
+            if n + 1 < len(sections):
+                f.write('0 / END OF {} DATA, BEGIN {} DATA\n'.format(
+                    section, sections[n + 1]))
+            else:
+                f.write('0 / END OF {} DATA\nQ\n'.format(section))
+    _replace_file(tmppath, filepath)
+    return filepath
+
+
+def write_raw_variants(model, variants, directory, rev=33, processes=None):
+    """Writes one RAW file per scenario variant of a NetworkModel in parallel
+    processes. variants maps a variant name to a list of changes for
+    NetworkModel.apply; files are written to directory as <name>.raw.
+    Returns a dict of variant name to file path."""
+    names = list(variants)
+    tasks = [(variants[n], os.path.join(directory, '{}.raw'.format(n)), rev,
+              ('pypsse variant {}'.format(n), '')) for n in names]
+    pool = multiprocessing.Pool(processes, _raw_variant_init, (model,))
+    try:
+        paths = pool.map(_raw_variant, tasks)
+    finally:
+        pool.close()
+        pool.join()
+    return OrderedDict(zip(names, paths))
+
+
+_raw_variant_model = None
+# error raised by a pool initializer in this worker process. An initializer
+# that raises makes multiprocessing.Pool replace the worker forever, so the
+# error is kept here and raised by the worker's task function instead.
+_pool_init_error = None
+
+
+def _raw_variant_init(model):
+    """Pool initializer keeps one copy of the base model in each process."""
+    global _raw_variant_model, _pool_init_error
+    try:
+        _raw_variant_model = model
+        model.reindex()
+    except Exception as e:
+        _pool_init_error = e
+
+
+def _raw_variant(task):
+    """Applies one variant's changes to a copy of the base model and writes
+    it."""
+    if _pool_init_error is not None:
+        raise _pool_init_error
+    changes, filepath, rev, titles = task
+    model = _raw_variant_model.copy()
+    model.apply(changes)
+    return write_raw(model, filepath, rev=rev, titles=titles)
+
+
+def _raw_col(table, field, default=0):
+    """Returns a column of a table as a list, or default for every row if the
+    field was not retrieved."""
+    if field in (table.dtype.names or ()):
+        return table[field].tolist()
+    return [default] * len(table)
+
+
+def _raw_parts(table, field, default=0j):
+    """Returns the real and imaginary parts of a complex column as lists."""
+    if field in (table.dtype.names or ()):
+        values = np.asarray(table[field], dtype=complex)
+    else:
+        values = np.full(len(table), default, dtype=complex)
+    return values.real.tolist(), values.imag.tolist()
+
+
+def _raw_quote(values, width=0):
+    """Returns values as quoted RAW strings padded to width."""
+    return ["'{:<{}}'".format(str(v), width) for v in values]
+
+
+def _raw_lines(cols):
+    """Returns a comma separated line for each row of a list of columns."""
+    fmt = ','.join(['{}'] * len(cols)) + '\n'
+    return [fmt.format(*row) for row in zip(*cols)]
+
+
+def _raw_buses(model, rev):
+    t = model.buses
+    return _raw_lines([
+        _raw_col(t, 'NUMBER'), _raw_quote(_raw_col(t, 'NAME', ''), 12),
+        _raw_col(t, 'BASE', 0.0), _raw_col(t, 'TYPE', 1),
+        _raw_col(t, 'AREA', 1), _raw_col(t, 'ZONE', 1),
+        _raw_col(t, 'OWNER', 1), _raw_col(t, 'PU', 1.0),
+        _raw_col(t, 'ANGLED', 0.0), _raw_col(t, 'NVLMHI', 1.1),
+        _raw_col(t, 'NVLMLO', 0.9), _raw_col(t, 'EVLMHI', 1.1),
+        _raw_col(t, 'EVLMLO', 0.9)])
+
+
+def _raw_loads(model, rev):
+    t = model.loads
+    pl, ql = _raw_parts(t, 'MVANOM')
+    ip, iq = _raw_parts(t, 'ILNOM')
+    yp, yq = _raw_parts(t, 'YLNOM')
+    cols = [_raw_col(t, 'NUMBER'), _raw_quote(_raw_col(t, 'ID', '1')),
+            _raw_col(t, 'STATUS', 1), _raw_col(t, 'AREA', 1),
+            _raw_col(t, 'ZONE', 1), pl, ql, ip, iq, yp, yq,
+            _raw_col(t, 'OWNER', 1), [1] * len(t), [0] * len(t)]
+    if rev >= 34:
+        cols += [[0.0] * len(t), [0.0] * len(t), [0] * len(t)]
+    return _raw_lines(cols)
+
+
+def _raw_shunts(model, rev):
+    t = model.shunts
+    gl, bl = _raw_parts(t, 'SHUNTNOM')
+    return _raw_lines([_raw_col(t, 'NUMBER'),
+                       _raw_quote(_raw_col(t, 'ID', '1')),
+                       _raw_col(t, 'STATUS', 1), gl, bl])
+
+
+def _raw_machines(model, rev):
+    t = model.machines
+    n = len(t)
+    ireg = _raw_col(t, 'IREG', 0)
+    regbus = [r or b for r, b in zip(ireg, _raw_col(t, 'NUMBER'))]
+    vs = (model.buses['PU'][model.bus_rows(regbus)] if n and 'PU' in
+          model.buses.dtype.names else np.ones(n))
+    if 'VSPU' in (t.dtype.names or ()):
+        vs = np.where(np.isnan(t['VSPU']), vs, t['VSPU'])
+    vs = vs.tolist()
+    zr, zx = _raw_parts(t, 'ZSORCE', 1j)
+    rt, xt = _raw_parts(t, 'XTRAN')
+    cols = [_raw_col(t, 'NUMBER'), _raw_quote(_raw_col(t, 'ID', '1')),
+            _raw_col(t, 'PGEN', 0.0), _raw_col(t, 'QGEN', 0.0),
+            _raw_col(t, 'QMAX', 9999.0), _raw_col(t, 'QMIN', -9999.0), vs,
+            ireg]
+    if rev >= 34:
+        cols.append([0] * n)
+    cols += [_raw_col(t, 'MBASE', model.sbase), zr, zx, rt, xt,
+             _raw_col(t, 'GENTAP', 1.0), _raw_col(t, 'STATUS', 1),
+             _raw_col(t, 'PERCENT', 100.0), _raw_col(t, 'PMAX', 9999.0),
+             _raw_col(t, 'PMIN', -9999.0), _raw_col(t, 'OWN1', 1),
+             _raw_col(t, 'FRACT1', 1.0), _raw_col(t, 'WMOD', 0),
+             _raw_col(t, 'WPF', 1.0)]
+    return _raw_lines(cols)
+
+
+def _raw_branches(model, rev):
+    t = model.branches
+    n = len(t)
+    r, x = _raw_parts(t, 'RX')
+    gi, bi = _raw_parts(t, 'FROMSHNT')
+    gj, bj = _raw_parts(t, 'TOSHNT')
+    met = [1 if m in (0, f) else 2 for m, f in zip(
+        _raw_col(t, 'METERNUMBER', 0), _raw_col(t, 'FROMNUMBER'))]
+    cols = [_raw_col(t, 'FROMNUMBER'), _raw_col(t, 'TONUMBER'),
+            _raw_quote(_raw_col(t, 'ID', '1')), r, x,
+            _raw_col(t, 'CHARGING', 0.0)]
+    if rev >= 34:
+        cols.append(_raw_quote([''] * n))
+    cols += [_raw_col(t, 'RATEA', 0.0), _raw_col(t, 'RATEB', 0.0),
+             _raw_col(t, 'RATEC', 0.0)]
+    if rev >= 34:
+        cols += [[0.0] * n] * 9
+    cols += [gi, bi, gj, bj, _raw_col(t, 'STATUS', 1), met,
+             _raw_col(t, 'LENGTH', 0.0), _raw_col(t, 'OWN1', 1),
+             _raw_col(t, 'FRACT1', 1.0)]
+    return _raw_lines(cols)
+
+
+def _raw_winding(w, rev):
+    """Returns the RAW winding record of a dict of winding data."""
+    rates = [w.get('RATEA', 0.0), w.get('RATEB', 0.0), w.get('RATEC', 0.0)]
+    if rev >= 34:
+        rates += [0.0] * 9
+    vals = ([w.get('RATIO', 1.0), w.get('NOMV', 0.0), w.get('ANGLE', 0.0)] +
+            rates + [w.get('CODE', 0), w.get('ICONTNUMBER', 0)])
+    if rev >= 34:
+        vals.append(0)
+    vals += [w.get('RMAX', 1.1), w.get('RMIN', 0.9), w.get('VMAX', 1.1),
+             w.get('VMIN', 0.9), w.get('NTPOSN', 33), w.get('TABLE', 0), 0.0,
+             0.0, w.get('CNXANG', 0.0)]
+    return ','.join(str(v) for v in vals) + '\n'
+
+
+def _raw_transformers(model, rev):
+    lines = []
+    sbase = model.sbase
+    for row in model.transformers.tolist():
+        t = dict(zip(model.transformers.dtype.names, row))
+        rx = t.get('RXNOM', t.get('RXACT', 0j))
+        ymag = t.get('YMAG', 0j)
+        ends = [t['FROMNUMBER'], t['TONUMBER']]
+        nmetr = 1 if t.get('NMETERNUMBER') == ends[0] else 2
+        head = [ends[0], ends[1], 0, "'{}'".format(t.get('ID', '1')), 1, 1, 1,
+                ymag.real, ymag.imag, nmetr, "'            '",
+                t.get('STATUS', 1), t.get('OWN1', 1), t.get('FRACT1', 1.0)]
+        if rev >= 34:
+            head += [0, 1.0, 0, 1.0, 0, 1.0, "'            '"]
+        lines.append(','.join(str(v) for v in head) + '\n')
+        lines.append('{},{},{}\n'.format(rx.real, rx.imag, sbase))
+        lines.append(_raw_winding(dict(t, NOMV=t.get('NOMV1', 0.0)), rev))
+        lines.append('{},{}\n'.format(t.get('RATIO2', 1.0),
+                                       t.get('NOMV2', 0.0)))
+    windings = {}
+    for row in model.windings.tolist():
+        w = dict(zip(model.windings.dtype.names, row))
+        windings[(w.get('WIND1NUMBER'), w.get('WIND2NUMBER'),
+                  w.get('WIND3NUMBER'), w.get('ID'), w.get('WNDNUM'))] = w
+    for row in model.transformers3.tolist():
+        t = dict(zip(model.transformers3.dtype.names, row))
+        key = (t['WIND1NUMBER'], t['WIND2NUMBER'], t['WIND3NUMBER'],
+               t.get('ID', '1'))
+        ymag = t.get('YMAG', 0j)
+        nmetr = (key.index(t['NMETERNUMBER']) + 1 if
+                 t.get('NMETERNUMBER') in key[:3] else 2)
+        head = list(key[:3]) + ["'{}'".format(key[3]), 1, 1, 1, ymag.real,
+                                ymag.imag, nmetr, "'            '",
+                                t.get('STATUS', 1), t.get('OWN1', 1),
+                                t.get('FRACT1', 1.0)]
+        if rev >= 34:
+            head += [0, 1.0, 0, 1.0, 0, 1.0, "'            '"]
+        lines.append(','.join(str(v) for v in head) + '\n')
+        vals = []
+        for leg in ['1-2', '2-3', '3-1']:
+            rx = t.get('RX{}NOM'.format(leg), t.get('RX{}ACT'.format(leg), 0j))
+            vals += [rx.real, rx.imag, sbase]
+        vals += [t.get('VMSTAR', 1.0), t.get('ANSTAR', 0.0)]
+        lines.append(','.join(str(v) for v in vals) + '\n')
+        for wnd in (1, 2, 3):
+            lines.append(_raw_winding(windings.get(key + (wnd,), {}), rev))
+    return lines
+
+
+def _with_plant_data(machines, plants):
+    """Returns the machine arrays with the IREG and VSPU fields of each
+    machine's plant added. Machines without plant data get IREG 0 and a NaN
+    VSPU."""
+    machines = OrderedDict(machines)
+    if 'NUMBER' not in machines or 'NUMBER' not in plants:
+        return machines
+    busnums = np.asarray(machines['NUMBER'], dtype=int)
+    numbers = np.asarray(plants['NUMBER'], dtype=int)
+    order = np.argsort(numbers, kind='mergesort')
+    if len(numbers):
+        rows = order[np.minimum(np.searchsorted(numbers[order], busnums),
+                                len(numbers) - 1)]
+        found = numbers[rows] == busnums
+    else:
+        rows = np.zeros(len(busnums), dtype=int)
+        found = np.zeros(len(busnums), dtype=bool)
+    for fld, default in [('IREG', 0), ('VSPU', np.nan)]:
+        if fld in plants and len(numbers):
+            machines[fld] = np.where(found, np.asarray(plants[fld])[rows],
+                                     default)
+        elif fld in plants:
+            machines[fld] = np.full(len(busnums), default)
+    return machines
+
+
+def _structured(arrays):
+    """Returns a structured array from a dict of equal length arrays."""
+    if isinstance(arrays, np.ndarray) and arrays.dtype.names:
+        return arrays
+    arrays = OrderedDict((k, np.asarray(v)) for k, v in arrays.items())
+    nrows = len(next(iter(arrays.values()))) if arrays else 0
+    table = np.zeros(nrows, dtype=[(str(k), v.dtype) for k, v in
+                                   arrays.items()])
+    for k, v in arrays.items():
+        table[str(k)] = v
+    return table
+
+
+###############################################################################
+###### PowerFlow solves a NetworkModel offline with Newton-Raphson on a #######
+################################ sparse Ybus ##################################
+###############################################################################
+class PowerFlow(object):
+    """An approximate AC power flow of a NetworkModel that runs without PSS/E.
+    The bus admittance matrix is built from the branches (RX, CHARGING and
+    line shunts), two winding transformers (RXACT, YMAG, RATIO, RATIO2 and
+    ANGLE) and three winding transformers (star equivalents with a bus at
+    each star point) and fixed shunts. Machines are constant P (and Q at PQ
+    buses), loads are constant power, current and admittance (MVANOM, ILNOM,
+    YLNOM), and TYPE 2 and 3 buses hold the voltage magnitude of the case as
+    last solved (bus PU), not the scheduled voltage (VS) of their plants.
+    Reactive limits are not modelled either, so a TYPE 2 bus never switches
+    to PQ, nor do switched shunts, tap and phase shifter control, area
+    interchange and DC lines, and buses of islands without a TYPE 3 bus are
+    left unsolved at zero voltage.
+
+    The Jacobian is filled into a sparsity structure computed once per set of
+    bus types, and factored with a sparse LU (scipy; dense numpy matrices are
+    used without it). With reuse_lu, the factorization is kept across
+    iterations while the mismatch at least halves each iteration."""
+
+    def __init__(self, model, tol=1e-6, max_iter=20, reuse_lu=False,
+                 zmin=1e-4):
+        """tol is the largest mismatch (pu on the system base) of a solved
+        case. Impedances smaller than zmin pu are raised to zmin."""
+        self.model = model
+        self.sbase = model.sbase
+        self.tol = tol
+        self.max_iter = max_iter
+        self.reuse_lu = reuse_lu
+        self.zmin = zmin
+        self.iterations = 0
+        self.mismatch = np.inf
+        self.converged = False
+        self.__build__()
+        self.reset()
+
+    @staticmethod
+    def __col__(table, field, default=0):
+        """Internal function returns a column of a table as an array, or
+        default for every row if the field was not retrieved."""
+        if field in (table.dtype.names or ()):
+            return np.asarray(table[field])
+        return np.repeat(default, len(table))
+
+    def __admittance__(self, z):
+        """Internal function returns the admittance of impedances."""
+        z = np.asarray(z, dtype=complex)
+        small = np.abs(z) < self.zmin
+        return 1.0 / np.where(small, 1j * self.zmin, z)
+
+    def __build__(self):
+        """Internal function builds the bus index, the Ybus triplets and the
+        element to bus maps of machines, loads and branch flows."""
+        model, col = self.model, self.__col__
+        buses = model.buses
+        live = col(buses, 'TYPE', 1) != 4
+        nbus = int(live.sum())
+        busidx = np.repeat(-1, len(buses))
+        busidx[live] = np.arange(nbus)
+        vm = col(buses, 'PU', 1.0)[live].astype(float)
+        va = np.deg2rad(col(buses, 'ANGLED', 0.0)[live].astype(float))
+        self.numbers = np.asarray(buses['NUMBER'])[live]
+        self.__types__ = col(buses, 'TYPE', 1)[live].astype(int)
+        rows, cols, vals = [], [], []
+        # branches and two winding transformers
+        self.__flows__ = {}
+        for family in ['BRN', 'TRN']:
+            t = model.table(family)
+            ends = model.terminal_rows(family)
+            if not len(t):
+                continue
+            f = busidx[ends['FROMNUMBER']]
+            k = busidx[ends['TONUMBER']]
+            on = (col(t, 'STATUS', 1) == 1) & (f >= 0) & (k >= 0)
+            if family == 'BRN':
+                ys = self.__admittance__(col(t, 'RX', 0j))
+                ych = 0.5j * col(t, 'CHARGING', 0.0)
+                yff = ys + ych + col(t, 'FROMSHNT', 0j)
+                ytt = ys + ych + col(t, 'TOSHNT', 0j)
+                yft = ytf = -ys
+            else:
+                ys = self.__admittance__(col(t, 'RXACT', 0j))
+                tap = (col(t, 'RATIO', 1.0) / col(t, 'RATIO2', 1.0) *
+                       np.exp(1j * np.deg2rad(col(t, 'ANGLE', 0.0))))
+                yff = (ys + col(t, 'YMAG', 0j)) / np.abs(tap) ** 2
+                yft = -ys / np.conj(tap)
+                ytf = -ys / tap
+                ytt = ys
+            fi, ki = f[on], k[on]
+            rows += [fi, fi, ki, ki]
+            cols += [fi, ki, fi, ki]
+            vals += [yff[on], yft[on], ytf[on], ytt[on]]
+            self.__flows__[family] = (on, f, k, yff, yft)
+        # three winding transformers, with a bus at each star point
+        t3 = model.transformers3
+        windings = {}
+        for row in model.windings.tolist():
+            w = dict(zip(model.windings.dtype.names, row))
+            windings[(w.get('WIND1NUMBER'), w.get('WIND2NUMBER'),
+                      w.get('WIND3NUMBER'), str(w.get('ID', '1')).strip(),
+                      w.get('WNDNUM'))] = w
+        # STATUS 2, 3 and 4 take winding 2, 3 and 1 out of service
+        outwnd = {2: 2, 3: 3, 4: 1}
+        star = nbus
+        for row in t3.tolist():
+            t = dict(zip(t3.dtype.names, row))
+            status = t.get('STATUS', 1)
+            if status == 0:
+                continue
+            z12, z23, z31 = [t.get('RX{}ACT'.format(leg), 0j)
+                             for leg in ['1-2', '2-3', '3-1']]
+            zleg = [(z12 + z31 - z23) / 2, (z12 + z23 - z31) / 2,
+                    (z23 + z31 - z12) / 2]
+            key = (t['WIND1NUMBER'], t['WIND2NUMBER'], t['WIND3NUMBER'],
+                   str(t.get('ID', '1')).strip())
+            ends = busidx[model.bus_rows(key[:3])]
+            legs = [n for n in (1, 2, 3) if ends[n - 1] >= 0 and
+                    outwnd.get(status) != n]
+            if len(legs) < 2:
+                continue
+            for n in legs:
+                w = windings.get(key + (n,), {})
+                tap = w.get('RATIO', 1.0) * np.exp(
+                    1j * np.deg2rad(w.get('ANGLE', 0.0)))
+                ys = self.__admittance__([zleg[n - 1]])[0]
+                ym = t.get('YMAG', 0j) if n == 1 else 0j
+                i = ends[n - 1]
+                rows.append(np.array([i, i, star, star]))
+                cols.append(np.array([i, star, i, star]))
+                vals.append(np.array([(ys + ym) / abs(tap) ** 2,
+                                      -ys / np.conj(tap), -ys / tap, ys]))
+            vm = np.append(vm, t.get('VMSTAR', 1.0))
+            va = np.append(va, np.deg2rad(t.get('ANSTAR', 0.0)))
+            self.__types__ = np.append(self.__types__, 1)
+            star += 1
+        n = star
+        self.nbus = n
+        # fixed shunts and an entry for every diagonal
+        sh = model.shunts
+        si = busidx[model.terminal_rows('FXSH')['NUMBER']] if len(sh) else \
+            np.array([], dtype=int)
+        on = (col(sh, 'STATUS', 1) == 1) & (si >= 0)
+        rows += [si[on], np.arange(n)]
+        cols += [si[on], np.arange(n)]
+        vals += [col(sh, 'SHUNTNOM', 0j)[on] / self.sbase, np.zeros(n, complex)]
+        rows = np.concatenate(rows).astype(int)
+        cols = np.concatenate(cols).astype(int)
+        vals = np.concatenate(vals).astype(complex)
+        flat, inverse = np.unique(rows * n + cols, return_inverse=True)
+        self.__yr__, self.__yc__ = flat // n, flat % n
+        self.__yv__ = (np.bincount(inverse, vals.real, len(flat)) +
+                       1j * np.bincount(inverse, vals.imag, len(flat)))
+        self.__diag__ = np.flatnonzero(self.__yr__ == self.__yc__)
+        # buses of islands without a TYPE 3 bus are not solved
+        link = (self.__yr__ != self.__yc__) & (self.__yv__ != 0)
+        lr, lc = self.__yr__[link], self.__yc__[link]
+        self.__energized__ = self.__types__ == 3
+        count = -1
+        while count != self.__energized__.sum():
+            count = self.__energized__.sum()
+            self.__energized__[lc[self.__energized__[lr]]] = True
+        if sparse is not None:
+            self.ybus = sparse.csr_matrix(
+                (self.__yv__, (self.__yr__, self.__yc__)), shape=(n, n))
+        else:
+            self.ybus = np.zeros((n, n), dtype=complex)
+            self.ybus[self.__yr__, self.__yc__] = self.__yv__
+        self.__v0__ = vm * np.exp(1j * va)
+        # machines and loads
+        mach, load = model.machines, model.loads
+        self.__mbus__ = busidx[model.terminal_rows('MACH')['NUMBER']] if len(
+            mach) else np.array([], dtype=int)
+        self.__lbus__ = busidx[model.terminal_rows('LOAD')['NUMBER']] if len(
+            load) else np.array([], dtype=int)
+        self.__mkeys__ = [(int(b), str(uid).strip()) for b, uid in zip(
+            col(mach, 'NUMBER'), col(mach, 'ID', '1'))]
+        self.__lkeys__ = [(int(b), str(uid).strip()) for b, uid in zip(
+            col(load, 'NUMBER'), col(load, 'ID', '1'))]
+        self.__base__ = (col(mach, 'PGEN', 0.0).astype(float),
+                         col(mach, 'QGEN', 0.0).astype(float),
+                         col(mach, 'STATUS', 1).astype(int),
+                         col(load, 'MVANOM', 0j).astype(complex),
+                         col(load, 'STATUS', 1).astype(int))
+        self.__il__ = col(load, 'ILNOM', 0j).astype(complex)
+        self.__yl__ = col(load, 'YLNOM', 0j).astype(complex)
+        self.__pattern__ = None
+
+    def reset(self):
+        """Restores the machine and load data and the voltages of the
+        model."""
+        self.pgen, self.qgen, self.gstatus, self.sload, self.lstatus = [
+            a.copy() for a in self.__base__]
+        self.voltage = self.__v0__.copy()
+        self.__dirty__ = True
+
+    def __row__(self, keys, busnum, uid, kind):
+        """Internal function returns the row of a machine or load."""
+        try:
+            return keys.index((int(busnum), str(uid).strip()))
+        except ValueError:
+            raise ValueError('{} {} \'{}\' is not in the model'.format(
+                kind, busnum, uid))
+
+    def set_gen(self, busnum, uid='1', pgen=None, qgen=None, status=None):
+        """Changes the output (MW, Mvar) or status of a machine, as
+        pypsse.dispatch_gen. None leaves a value unchanged."""
+        row = self.__row__(self.__mkeys__, busnum, uid, 'MACH')
+        if pgen is not None:
+            self.pgen[row] = pgen
+        if qgen is not None:
+            self.qgen[row] = qgen
+        if status is not None:
+            self.gstatus[row] = status
+        self.__dirty__ = True
+
+    def set_load(self, busnum, uid='1', pload=None, qload=None, status=None):
+        """Changes the constant power (MW, Mvar) or status of a load, as
+        pypsse.__change_load__. None leaves a value unchanged."""
+        row = self.__row__(self.__lkeys__, busnum, uid, 'LOAD')
+        old = self.sload[row]
+        self.sload[row] = complex(old.real if pload is None else pload,
+                                  old.imag if qload is None else qload)
+        if status is not None:
+            self.lstatus[row] = status
+        self.__dirty__ = True
+
+    def apply(self, changes):
+        """Applies changes in the pypsse.run_study format: ['MACH', bus, id,
+        pgen] or ['LOAD', bus, id, pload, qload, status]. Raises ValueError
+        for an invalid change type or an element not in the model."""
+        for change in changes:
+            if change[0] == 'MACH':
+                self.set_gen(change[1], change[2], pgen=change[3])
+            elif change[0] == 'LOAD':
+                self.set_load(change[1], change[2], *change[3:6])
+            else:
+                raise ValueError('Invalid change type \'{}\''.format(change[0]))
+
+    def __update__(self):
+        """Internal function sums the machine and load data at each bus and
+        classifies the buses. A TYPE 2 bus without an in service machine is
+        solved as a PQ bus."""
+        n, sbase = self.nbus, self.sbase
+
+        def total(idx, values, on):
+            keep = on & (idx >= 0)
+            values = np.asarray(values, dtype=complex)[keep]
+            return (np.bincount(idx[keep], values.real, n) +
+                    1j * np.bincount(idx[keep], values.imag, n)) / sbase
+
+        gon = self.gstatus == 1
+        lon = self.lstatus == 1
+        self.__sg__ = total(self.__mbus__, self.pgen + 1j * self.qgen, gon)
+        self.__sp__ = total(self.__lbus__, self.sload, lon)
+        self.__ilbus__ = total(self.__lbus__, self.__il__, lon)
+        self.__ylbus__ = total(self.__lbus__, self.__yl__, lon)
+        hasgen = np.bincount(self.__mbus__[gon & (self.__mbus__ >= 0)],
+                             minlength=n) > 0
+        ref = np.flatnonzero(self.__types__ == 3)
+        pv = np.flatnonzero((self.__types__ == 2) & hasgen &
+                            self.__energized__)
+        pq = np.flatnonzero((self.__types__ != 3) & ~np.in1d(
+            np.arange(n), pv) & self.__energized__)
+        if (self.__pattern__ is None or not np.array_equal(pv, self.pv) or
+                not np.array_equal(pq, self.pq)):
+            self.ref, self.pv, self.pq = ref, pv, pq
+            self.__pattern__ = self.__structure__()
+        self.__dirty__ = False
+
+    def __structure__(self):
+        """Internal function returns the Jacobian structure: the Ybus entries
+        of each Jacobian block, the Jacobian row and column of each, and (with
+        scipy) the CSC index arrays and the order of the values in them."""
+        r, c = self.__yr__, self.__yc__
+        pvpq = np.concatenate([self.pv, self.pq])
+        npvpq = len(pvpq)
+        ppos = np.repeat(-1, self.nbus)
+        ppos[pvpq] = np.arange(npvpq)
+        qpos = np.repeat(-1, self.nbus)
+        qpos[self.pq] = np.arange(len(self.pq)) + npvpq
+        blocks = []
+        for rpos, cpos in [(ppos, ppos), (ppos, qpos), (qpos, ppos),
+                           (qpos, qpos)]:
+            k = np.flatnonzero((rpos[r] >= 0) & (cpos[c] >= 0))
+            blocks.append((k, rpos[r[k]], cpos[c[k]]))
+        jr = np.concatenate([b[1] for b in blocks])
+        jc = np.concatenate([b[2] for b in blocks])
+        size = npvpq + len(self.pq)
+        structure = {'blocks': [b[0] for b in blocks], 'rows': jr,
+                     'cols': jc, 'size': size, 'pvpq': pvpq}
+        if sparse is not None:
+            template = sparse.csc_matrix(
+                (np.arange(1, len(jr) + 1, dtype=float), (jr, jc)),
+                shape=(size, size))
+            structure['order'] = template.data.astype(int) - 1
+            structure['indices'] = template.indices
+            structure['indptr'] = template.indptr
+        return structure
+
+    def __jacobian__(self, v, i, vm):
+        """Internal function returns the Jacobian at voltages v and bus
+        currents i."""
+        r, c, y = self.__yr__, self.__yc__, self.__yv__
+        d = self.__diag__
+        yv = y * v[c]
+        dth = -1j * v[r] * np.conj(yv)
+        dth[d] += 1j * v * np.conj(i)
+        dvm = v[r] * np.conj(yv / vm[c])
+        dvm[d] += (np.conj(i) * v / vm + self.__ilbus__ +
+                   2 * self.__ylbus__ * vm)
+        s = self.__pattern__
+        k11, k12, k21, k22 = s['blocks']
+        vals = np.concatenate([dth[k11].real, dvm[k12].real, dth[k21].imag,
+                               dvm[k22].imag])
+        if sparse is not None:
+            return sparse.csc_matrix(
+                (vals[s['order']], s['indices'], s['indptr']),
+                shape=(s['size'], s['size']))
+        jac = np.zeros((s['size'], s['size']))
+        jac[s['rows'], s['cols']] = vals
+        return jac
+
+    @staticmethod
+    def __factor__(jac):
+        """Internal function returns a solver of a factored Jacobian."""
+        if sparse is not None:
+            return sparse_linalg.splu(jac).solve
+        return lambda b: np.linalg.solve(jac, b)
+
+    def solve(self, flat=False):
+        """Solves from the last solution (the model voltages after reset), or
+        from a flat start. Returns True if the case solved within max_iter
+        iterations; iterations, mismatch and voltage are updated either
+        way."""
+        if self.__dirty__:
+            self.__update__()
+        s = self.__pattern__
+        pvpq, pq = s['pvpq'], self.pq
+        npvpq = len(pvpq)
+        v = np.where(self.__energized__, self.voltage, 0j)
+        if flat:
+            v[pvpq] = np.abs(v[pvpq])
+            v[pq] = 1.0
+        vm, va = np.abs(v), np.angle(v)
+        solver, last = None, np.inf
+        self.converged = False
+        vm[vm == 0] = 1.0
+        for it in xrange(self.max_iter + 1):
+            i = self.ybus.dot(v)
+            mis = v * np.conj(i) - (self.__sg__ - self.__sp__ -
+                                    self.__ilbus__ * vm -
+                                    self.__ylbus__ * vm ** 2)
+            f = np.concatenate([mis[pvpq].real, mis[pq].imag])
+            self.mismatch = np.abs(f).max() if len(f) else 0.0
+            self.iterations = it
+            if not np.isfinite(self.mismatch):
+                break
+            if self.mismatch < self.tol:
+                self.converged = True
+                break
+            if it == self.max_iter:
+                break
+            if solver is None or not self.reuse_lu or self.mismatch > 0.5 * last:
+                try:
+                    solver = self.__factor__(self.__jacobian__(v, i, vm))
+                except (RuntimeError, np.linalg.LinAlgError):
+                    break
+            last = self.mismatch
+            dx = solver(-f)
+            va[pvpq] += dx[:npvpq]
+            vm[pq] += dx[npvpq:]
+            v = vm * np.exp(1j * va)
+        self.voltage = np.where(self.__energized__, v, 0j)
+        return self.converged
+
+    def bus_frame(self):
+        """Returns a dataframe of the voltage (PU, ANGLED) and net injection
+        (P, Q in MW and Mvar) of each bus, star points excluded."""
+        n = len(self.numbers)
+        v = self.voltage[:n]
+        s = v * np.conj(self.ybus.dot(self.voltage))[:n] * self.sbase
+        return pd.DataFrame(OrderedDict([
+            ('NUMBER', self.numbers), ('PU', np.abs(v)),
+            ('ANGLED', np.rad2deg(np.angle(v))), ('P', s.real),
+            ('Q', s.imag)]))
+
+    def flows(self, family='BRN'):
+        """Returns a dataframe of the flow (P, Q in MW and Mvar) at the from
+        bus of each branch ('BRN') or two winding transformer ('TRN'), and
+        the loading in percent of RATEA (PCTRATEA) if RATEA was retrieved.
+        Out of service elements have zero flow."""
+        table = self.model.table(family)
+        columns = OrderedDict((k, self.__col__(table, k))
+                              for k in ['FROMNUMBER', 'TONUMBER', 'ID'])
+        s = np.zeros(len(table), dtype=complex)
+        if family in self.__flows__:
+            on, f, k, yff, yft = self.__flows__[family]
+            v = self.voltage
+            s[on] = v[f[on]] * np.conj(yff[on] * v[f[on]] +
+                                        yft[on] * v[k[on]]) * self.sbase
+        columns['P'] = s.real
+        columns['Q'] = s.imag
+        if 'RATEA' in (table.dtype.names or ()):
+            rate = np.asarray(table['RATEA'], dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                columns['PCTRATEA'] = np.where(rate > 0, 100.0 * np.abs(s) /
+                                               rate, 0.0)
+        return pd.DataFrame(columns)
+
+
+def parallel_power_flow(model, cases, processes=None, **kwargs):
+    """Solves scenario variants of a NetworkModel offline in parallel
+    processes. cases maps a case name to a list of changes for
+    PowerFlow.apply; each is solved from the base case solution. kwargs are
+    passed to PowerFlow. Returns an ordered dict of case name to an ordered
+    dict of CONVERGED, ITERATIONS, MISMATCH and the PU and ANGLED arrays of
+    the buses in PowerFlow.numbers order."""
+    names = list(cases)
+    processes = processes or multiprocessing.cpu_count()
+    chunksize = max(1, len(names) // (4 * processes))
+    pool = multiprocessing.Pool(processes, _power_flow_init, (model, kwargs))
+    try:
+        results = pool.map(_power_flow_task, [cases[n] for n in names],
+                           chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return OrderedDict(zip(names, results))
+
+
+_power_flow = None
+
+
+def _power_flow_init(model, kwargs):
+    """Pool initializer builds one PowerFlow of the base model in each
+    process and solves it."""
+    global _power_flow, _pool_init_error
+    try:
+        _power_flow = PowerFlow(model, **kwargs)
+        _power_flow.solve()
+        _power_flow.__v0__ = _power_flow.voltage.copy()
+    except Exception as e:
+        _pool_init_error = e
+
+
+def _power_flow_task(changes):
+    """Solves one case's changes from the base solution."""
+    if _pool_init_error is not None:
+        raise _pool_init_error
+    pf = _power_flow
+    pf.reset()
+    pf.apply(changes)
+    pf.solve()
+    n = len(pf.numbers)
+    return OrderedDict([('CONVERGED', pf.converged),
+                        ('ITERATIONS', pf.iterations),
+                        ('MISMATCH', pf.mismatch),
+                        ('PU', np.abs(pf.voltage[:n])),
+                        ('ANGLED', np.rad2deg(np.angle(pf.voltage[:n])))])
+
+
+###############################################################################
+#### Chunk helpers consume the (key, chunk) pairs of pypsse.iter_chunks #######
+###############################################################################
+def _prefetch(chunks, depth):
+    """Yields the items of an iterator that is advanced up to depth items ahead
+    in a background thread. Exceptions are raised in the consumer."""
+    buf = Queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def put(entry):
+        # gives up once the consumer has stopped, so the thread can be joined
+        while not stop.is_set():
+            try:
+                buf.put(entry, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in chunks:
+                if not put((None, item)):
+                    return
+        except Exception:
+            put((sys.exc_info(), None))
+            return
+        put((None, done))
+
+    worker = threading.Thread(target=produce)
+    worker.daemon = True
+    worker.start()
+    try:
+        while True:
+            err, item = buf.get()
+            if err is not None:
+                raise err[0], err[1], err[2]
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def write_chunks(chunks, filepath, sep=','):
+    """Writes the chunks of pypsse.iter_chunks to one delimited file as they
+    arrive, with the chunk key in the first column. Returns the number of
+    rows written."""
+    rows = 0
+    header = True
+    with open(filepath, 'w', 1 << 20) as f:
+        for key, chunk in chunks:
+            df = pd.DataFrame(chunk)
+            df.insert(0, 'CHUNK', key)
+            df.to_csv(f, sep=sep, index=False, header=header)
+            header = False
+            rows += len(df)
+    return rows
+
+
+def reduce_chunks(chunks, aggregations):
+    """Aggregates the chunks of pypsse.iter_chunks in one pass. aggregations
+    maps an output name to a (field, how) pair where how is 'sum', 'min',
+    'max', 'count' or 'mean'; NaN values are ignored. Returns a dict of output
+    name to value (NaN if no values were seen)."""
+    funcs = {'sum': np.nansum, 'min': np.nanmin, 'max': np.nanmax}
+    for name, (field, how) in aggregations.items():
+        if how not in ('sum', 'min', 'max', 'count', 'mean'):
+            raise ValueError('Invalid aggregation \'{}\' for {}'.format(
+                how, name))
+    totals = dict((name, None) for name in aggregations)
+    counts = dict((name, 0) for name in aggregations)
+    for key, chunk in chunks:
+        for name, (field, how) in aggregations.items():
+            values = np.asarray(chunk[field], dtype=float)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            counts[name] += len(values)
+            if how in ('count', 'mean'):
+                value = np.sum(values)
+                how = 'sum'
+            else:
+                value = funcs[how](values)
+            totals[name] = value if totals[name] is None else funcs[how](
+                [totals[name], value])
+    out = {}
+    for name, (field, how) in aggregations.items():
+        if how == 'count':
+            out[name] = counts[name]
+        elif totals[name] is None:
+            out[name] = np.nan
+        elif how == 'mean':
+            out[name] = totals[name] / counts[name]
+        else:
+            out[name] = totals[name]
+    return out
+
+
+###############################################################################
+###### Traces record the psspy and pssarrays calls made by pypsse so that #####
+############ a study can be replayed and profiled without PSS/E ###############
+###############################################################################
+TRACE_MAGIC = 'PYPSSETRACE1\n'
+# names of the PSS/E modules which are recorded and replaced on replay
+TRACE_MODULES = ('psspy', 'pssarrays', 'pssexcel')
+
+
+class ReplayError(RuntimeError):
+    """Raised when a replayed call does not match the next recorded call."""
+
+
+class TraceRecorder(object):
+    """Writes (module, api, args, kwargs, result, seconds) records of wrapped
+    module calls to a trace file. Records are pickled and zlib compressed in
+    batches of batch records, each written with a 4 byte length prefix. An
+    exception raised by a call is recorded as its result and re-raised."""
+
+    def __init__(self, filepath, batch=1000):
+        self.filepath = filepath
+        self.batch = batch
+        self.calls = 0
+        self.seconds = 0.0
+        self.__buffer__ = []
+        self.__file__ = open(filepath, 'wb')
+        self.__file__.write(TRACE_MAGIC)
+
+    def wrap(self, name, module):
+        """Returns a recording proxy of a module."""
+        return _RecordingModule(self, name, module)
+
+    def record(self, name, api, args, kwargs, result, seconds):
+        self.__buffer__.append((name, api, args, kwargs, result, seconds))
+        self.calls += 1
+        self.seconds += seconds
+        if len(self.__buffer__) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records as one compressed block."""
+        if not self.__buffer__:
+            return
+        try:
+            data = cPickle.dumps(self.__buffer__, 2)
+        except (cPickle.PicklingError, TypeError):
+            data = cPickle.dumps([_picklable_record(r) for r in
+                                  self.__buffer__], 2)
+        block = zlib.compress(data)
+        self.__file__.write(struct.pack('<I', len(block)))
+        self.__file__.write(block)
+        self.__file__.flush()
+        self.__buffer__ = []
+
+    def close(self):
+        if not self.__file__.closed:
+            self.flush()
+            self.__file__.close()
+
+
+class _RecordingModule(object):
+    """Proxy of a module which records each call through a TraceRecorder."""
+
+    def __init__(self, recorder, name, module):
+        self.__recorder__ = recorder
+        self.__name__ = name
+        self.__target__ = module
+
+    def __getattr__(self, api):
+        attr = getattr(self.__target__, api)
+        if not callable(attr):
+            return attr
+        recorder = self.__recorder__
+        name = self.__name__
+
+        def call(*args, **kwargs):
+            start = time.time()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                recorder.record(name, api, args, kwargs, _TraceException(e),
+                                time.time() - start)
+                raise
+            recorder.record(name, api, args, kwargs, result,
+                            time.time() - start)
+            return result
+
+        call.__name__ = api
+        setattr(self, api, call)
+        return call
+
+
+class _TraceException(object):
+    """Recorded exception of a traced call."""
+
+    def __init__(self, error):
+        self.type = type(error).__name__
+        self.message = str(error)
+
+    def error(self):
+        return RuntimeError('{} (replayed): {}'.format(self.type, self.message))
+
+
+def _picklable_record(record):
+    """Returns a record with any unpicklable argument or result replaced by its
+    repr."""
+    out = []
+    for item in record:
+        try:
+            cPickle.dumps(item, 2)
+            out.append(item)
+        except (cPickle.PicklingError, TypeError):
+            out.append(repr(item))
+    return tuple(out)
+
+
+def read_trace(filepath):
+    """Yields the records of a trace file in call order."""
+    with open(filepath, 'rb') as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError('{} is not a pypsse trace'.format(filepath))
+        while True:
+            head = f.read(4)
+            if len(head) < 4:
+                return
+            size = struct.unpack('<I', head)[0]
+            for record in cPickle.loads(zlib.decompress(f.read(size))):
+                yield record
+
+
+def trace_frame(filepath):
+    """Returns a dataframe of the MODULE, API and SECONDS of each recorded
+    call, e.g. for trace_frame(path).groupby('API')['SECONDS'].sum()."""
+    rows = [(r[0], r[1], r[5]) for r in read_trace(filepath)]
+    return pd.DataFrame(rows, columns=['MODULE', 'API', 'SECONDS'])
+
+
+class TraceReplayer(object):
+    """Serves the recorded results of a trace file in call order. If strict,
+    each call must match the module, API and arguments of the next record;
+    otherwise only the module and API must match. Arguments are compared
+    with _replay_equal, so arrays compare by value and the temporary
+    snapshot paths of checkpoints match any other snapshot path. A mismatch
+    raises ReplayError. calls and seconds count the replayed calls and the
+    PSS/E time they took when recorded."""
+
+    def __init__(self, filepath, strict=True):
+        self.filepath = filepath
+        self.strict = strict
+        self.calls = 0
+        self.seconds = 0.0
+        self.__records__ = read_trace(filepath)
+
+    def wrap(self, name, module=None):
+        """Returns a replaying proxy of a module."""
+        return _ReplayModule(self, name)
+
+    def next(self, name, api, args, kwargs):
+        """Returns the recorded result of the next call."""
+        try:
+            record = next(self.__records__)
+        except StopIteration:
+            raise ReplayError('Trace exhausted at call {} of {}.{}'.format(
+                self.calls + 1, name, api))
+        if record[:2] != (name, api):
+            raise ReplayError('Call {} is {}.{}, recorded {}.{}'.format(
+                self.calls + 1, name, api, record[0], record[1]))
+        if self.strict:
+            if not _replay_equal((tuple(args), kwargs),
+                                 (tuple(record[2]), record[3])):
+                raise ReplayError(
+                    'Call {} to {}.{} has arguments {} {}, recorded {} {}'.format(
+                        self.calls + 1, name, api, args, kwargs, record[2],
+                        record[3]))
+        self.calls += 1
+        self.seconds += record[5]
+        if isinstance(record[4], _TraceException):
+            raise record[4].error()
+        return record[4]
+
+
+def _replay_equal(a, b):
+    """Returns whether two recorded call arguments are equal. Containers are
+    compared item by item, numpy arrays by value, and snapshot paths (see
+    pypsse.journal_snapshot) are equal to each other."""
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(
+            _replay_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return sorted(a) == sorted(b) and all(
+            _replay_equal(a[k], b[k]) for k in a)
+    if isinstance(a, basestring) and isinstance(b, basestring):
+        return _snapshot_token(a) == _snapshot_token(b)
+    return a == b
+
+
+def _snapshot_token(value):
+    """Returns '<snapshot>' for the path of a snapshot file made by
+    pypsse.__journal_snapshot__, otherwise value."""
+    name = os.path.basename(value)
+    if (name.startswith('pypsse') and name.endswith('.sav') and
+            os.path.dirname(value) in (SNAPSHOT_LOCATION,
+                                       tempfile.gettempdir())):
+        return '<snapshot>'
+    return value
+
+
+class _ReplayModule(object):
+    """Proxy of a module which serves calls from a TraceReplayer."""
+
+    def __init__(self, replayer, name):
+        self.__replayer__ = replayer
+        self.__name__ = name
+
+    def __getattr__(self, api):
+        replayer = self.__replayer__
+        name = self.__name__
+
+        def call(*args, **kwargs):
+            return replayer.next(name, api, args, kwargs)
+
+        call.__name__ = api
+        setattr(self, api, call)
+        return call
+
+
+_trace_state = {'tracer': None, 'modules': {}}
+
+
+def start_recording(filepath, batch=1000):
+    """Records every call pypsse makes to the PSS/E modules (TRACE_MODULES) in
+    a trace file until stop_recording. The module names are rebound to
+    recording proxies, so pypsse instances use them at once. Returns the
+    TraceRecorder."""
+    return _start_trace(TraceRecorder(filepath, batch=batch))
+
+
+def start_replay(filepath, strict=True):
+    """Serves the PSS/E module calls pypsse makes from a trace file until
+    stop_replay, without PSS/E. Setting the PYPSSE_REPLAY environment variable
+    to a trace file starts a replay at import instead of importing PSS/E.
+    Returns the TraceReplayer."""
+    return _start_trace(TraceReplayer(filepath, strict=strict))
+
+
+def _start_trace(tracer):
+    """Rebinds the PSS/E module names to proxies of a tracer."""
+    _stop_trace()
+    module = sys.modules[__name__]
+    _trace_state['tracer'] = tracer
+    _trace_state['modules'] = dict((name, getattr(module, name)) for name in
+                                   TRACE_MODULES)
+    for name, original in _trace_state['modules'].items():
+        setattr(module, name, tracer.wrap(name, original))
+    return tracer
+
+
+def stop_recording():
+    """Stops recording, writes the remaining records and restores the PSS/E
+    modules. Returns the TraceRecorder, or None if none was running."""
+    return _stop_trace()
+
+
+def stop_replay():
+    """Stops a replay and restores the PSS/E modules. Returns the
+    TraceReplayer, or None if none was running."""
+    return _stop_trace()
+
+
+def _stop_trace():
+    tracer = _trace_state['tracer']
+    if tracer is None:
+        return None
+    module = sys.modules[__name__]
+    for name, original in _trace_state['modules'].items():
+        setattr(module, name, original)
+    if isinstance(tracer, TraceRecorder):
+        tracer.close()
+    _trace_state['tracer'] = None
+    _trace_state['modules'] = {}
+    return tracer
+
+
+###############################################################################
+#### Topology tracks bus connectivity (islands) with a vectorized union-find ##
+###############################################################################
+def _connected_labels(n, u, v):
+    """Returns the connected component label of each of n nodes joined by the
+    edges u-v. Vectorized union-find: roots are hooked to the smaller label and
+    paths are compressed until every edge joins nodes with the same label."""
+    labels = np.arange(n)
+    while True:
+        lu = labels[u]
+        lv = labels[v]
+        mask = lu != lv
+        if not mask.any():
+            return labels
+        np.minimum.at(labels, np.maximum(lu[mask], lv[mask]),
+                      np.minimum(lu[mask], lv[mask]))
+        while True:
+            nxt = labels[labels]
+            if (nxt == labels).all():
+                break
+            labels = nxt
+
+
+class Topology(object):
+    """Bus connectivity of a case. Island IDs are computed for all buses with a
+    vectorized union-find over the in-service branches, two winding and three
+    winding transformers. set_status toggles one element and updates the
+    islands incrementally: closing an element merges two islands, opening one
+    searches outward from both terminals (smaller frontier first) so that the
+    cost depends on the size of the smaller side rather than the case.
+
+    Elements are keyed ('BRN', ibus, jbus, ckt), ('TRN', ibus, jbus, ckt) or
+    ('TR3', ibus, jbus, kbus, ckt). Bus TYPE 3 marks a swing bus."""
+
+    # three winding transformer status -> in-service (w1-w2, w2-w3, w1-w3) legs
+    TR3_LEGS = {0: (False, False, False), 1: (True, True, True),
+                2: (False, False, True), 3: (True, False, False),
+                4: (False, True, False)}
+
+    def __init__(self, bus, brn, trn, tr3):
+        """bus, brn, trn and tr3 are dicts of arrays as returned by
+        pypsse.__fetch_arrays__ (see pypsse.get_topology)."""
+        self.busnums = np.asarray(bus['NUMBER'], dtype=int)
+        self.swing = np.asarray(bus['TYPE'], dtype=int) == 3
+        order = np.argsort(self.busnums)
+        self.__sorted__ = self.busnums[order]
+        self.__order__ = order
+        keys = []
+        status = []
+        frm = []
+        to = []
+        edge_elem = []
+        for kind, arrs in [('BRN', brn), ('TRN', trn)]:
+            for n in xrange(len(arrs['FROMNUMBER'])):
+                i = int(arrs['FROMNUMBER'][n])
+                j = int(arrs['TONUMBER'][n])
+                keys.append((kind, i, j, str(arrs['ID'][n]).strip()))
+                status.append(int(arrs['STATUS'][n]))
+                frm.append(i)
+                to.append(j)
+                edge_elem.append(len(keys) - 1)
+        for n in xrange(len(tr3['WIND1NUMBER'])):
+            w = [int(tr3['WIND1NUMBER'][n]), int(tr3['WIND2NUMBER'][n]),
+                 int(tr3['WIND3NUMBER'][n])]
+            keys.append(('TR3', w[0], w[1], w[2], str(tr3['ID'][n]).strip()))
+            status.append(int(tr3['STATUS'][n]))
+            frm.extend([w[0], w[1], w[0]])
+            to.extend([w[1], w[2], w[2]])
+            edge_elem.extend([len(keys) - 1] * 3)
+        self.keys = keys
+        self.status = np.array(status, dtype=int)
+        self.__index__ = {}
+        for n, k in enumerate(keys):
+            self.__index__[k] = n
+            if k[0] != 'TR3':
+                self.__index__[(k[0], k[2], k[1], k[3])] = n
+        self.edge_from = self.rows(frm)
+        self.edge_to = self.rows(to)
+        self.edge_elem = np.array(edge_elem, dtype=int)
+
+        # adjacency in compressed sparse row form over all edges
+        nbus = len(self.busnums)
+        ends = np.concatenate([self.edge_from, self.edge_to])
+        other = np.concatenate([self.edge_to, self.edge_from])
+        eids = np.concatenate([np.arange(len(edge_elem))] * 2)
+        order = np.argsort(ends, kind='mergesort')
+        self.__adj_ptr__ = np.concatenate(
+            [[0], np.cumsum(np.bincount(ends, minlength=nbus))])
+        self.__adj_bus__ = other[order]
+        self.__adj_edge__ = eids[order]
+        self.__elem_ptr__ = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.edge_elem,
+                                        minlength=len(keys)))])
+        self.edge_on = np.zeros(len(edge_elem), dtype=bool)
+        for n in xrange(len(keys)):
+            self.edge_on[self.__edges__(n)] = self.__legs__(n, self.status[n])
+        self.island = np.zeros(nbus, dtype=int)
+        self.relabel()
+
+    def rows(self, busnums):
+        """Returns the row index of each bus number. Raises KeyError for an
+        unknown bus."""
+        busnums = np.asarray(busnums, dtype=int)
+        pos = np.searchsorted(self.__sorted__, busnums)
+        pos = np.minimum(pos, len(self.__sorted__) - 1)
+        if len(busnums) and (self.__sorted__[pos] != busnums).any():
+            raise KeyError('Unknown bus numbers: {}'.format(
+                busnums[self.__sorted__[pos] != busnums].tolist()))
+        return self.__order__[pos]
+
+    def relabel(self):
+        """Recomputes all island IDs from the in-service edges."""
+        on = self.edge_on
+        self.island = np.unique(
+            _connected_labels(len(self.busnums), self.edge_from[on],
+                              self.edge_to[on]), return_inverse=True)[1]
+        self.__next_island__ = int(self.island.max()) + 1 if len(
+            self.island) else 0
+        return self.island
+
+    def __edges__(self, elem):
+        """Internal function returns the edge indices of an element."""
+        return np.arange(self.__elem_ptr__[elem], self.__elem_ptr__[elem + 1])
+
+    def __legs__(self, elem, status):
+        """Internal function returns the in-service flags of an element's
+        edges for the given status."""
+        if self.keys[elem][0] == 'TR3':
+            return list(self.TR3_LEGS.get(status, (True, True, True)))
+        return [bool(status)]
+
+    def set_status(self, key, status):
+        """Sets the status of the element with the given key and updates the
+        islands. Returns the change in the number of islands."""
+        key = tuple([key[0]] + [int(k) for k in key[1:-1]] +
+                    [str(key[-1]).strip()])
+        if key not in self.__index__:
+            raise KeyError('Unknown element {}'.format(key))
+        elem = self.__index__[key]
+        edges = self.__edges__(elem)
+        new = np.array(self.__legs__(elem, status), dtype=bool)
+        self.status[elem] = status
+        change = 0
+        for e in edges[new & ~self.edge_on[edges]]:
+            self.edge_on[e] = True
+            a = self.island[self.edge_from[e]]
+            b = self.island[self.edge_to[e]]
+            if a != b:
+                self.island[self.island == b] = a
+                change -= 1
+        for e in edges[~new & self.edge_on[edges]]:
+            self.edge_on[e] = False
+            side = self.__separated__(self.edge_from[e], self.edge_to[e])
+            if side is not None:
+                self.island[side] = self.__next_island__
+                self.__next_island__ += 1
+                change += 1
+        return change
+
+    def __separated__(self, a, b):
+        """Internal function searches from rows a and b over in-service edges,
+        always expanding the smaller frontier. Returns the rows of the side
+        that is exhausted first if a and b are no longer connected, otherwise
+        None."""
+        seen = [set([a]), set([b])]
+        frontier = [[a], [b]]
+        ptr = self.__adj_ptr__
+        while frontier[0] and frontier[1]:
+            s = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            nxt = []
+            for row in frontier[s]:
+                for k in xrange(ptr[row], ptr[row + 1]):
+                    if not self.edge_on[self.__adj_edge__[k]]:
+                        continue
+                    other = self.__adj_bus__[k]
+                    if other in seen[1 - s]:
+                        return None
+                    if other not in seen[s]:
+                        seen[s].add(other)
+                        nxt.append(other)
+            frontier[s] = nxt
+        s = 0 if not frontier[0] else 1
+        return np.array(sorted(seen[s]), dtype=int)
+
+    def island_of(self, busnum):
+        """Returns the island ID of a bus. Island IDs match islands and
+        summary."""
+        raw = self.island[self.rows([busnum])[0]]
+        return int(np.searchsorted(np.unique(self.island), raw))
+
+    def islands(self):
+        """Returns a dataframe of ISLAND and SWING (whether the bus's island
+        has a swing bus) indexed by bus NUMBER. Island IDs match summary."""
+        ids, inverse = np.unique(self.island, return_inverse=True)
+        has_swing = np.bincount(inverse, weights=self.swing,
+                                minlength=len(ids)) > 0
+        df = pd.DataFrame({'ISLAND': inverse, 'SWING': has_swing[inverse]},
+                          index=self.busnums, columns=['ISLAND', 'SWING'])
+        df.index.name = 'NUMBER'
+        return df
+
+    def summary(self):
+        """Returns a dataframe of SIZE (number of buses) and SWING (number of
+        swing buses) indexed by ISLAND, largest island first."""
+        ids, inverse = np.unique(self.island, return_inverse=True)
+        df = pd.DataFrame({'SIZE': np.bincount(inverse, minlength=len(ids)),
+                           'SWING': np.bincount(inverse, weights=self.swing,
+                                                minlength=len(ids)).astype(
+                               int)}, columns=['SIZE', 'SWING'])
+        df = df.sort_values('SIZE', ascending=False)
+        df.index.name = 'ISLAND'
+        return df
+
+    def count(self):
+        """Returns the number of islands."""
+        return len(np.unique(self.island))
+
+    def dead_buses(self):
+        """Returns the numbers of buses in islands without a swing bus."""
+        ids, inverse = np.unique(self.island, return_inverse=True)
+        has_swing = np.bincount(inverse, weights=self.swing,
+                                minlength=len(ids)) > 0
+        return self.busnums[~has_swing[inverse]]
+
+
+
+def _replace_file(src, dst):
+    """Moves src over dst. On POSIX this is a single atomic rename. Windows
+    cannot rename onto an existing file, so MoveFileEx with
+    MOVEFILE_REPLACE_EXISTING is used there; it replaces the file in one call
+    but is not guaranteed to be atomic. If MoveFileEx is unavailable or fails,
+    dst is removed and src renamed, which leaves a short window in which dst
+    does not exist."""
+    if os.name != 'nt':
+        os.rename(src, dst)
+        return
+    try:
+        import ctypes
+        # MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH
+        if ctypes.windll.kernel32.MoveFileExW(unicode(src), unicode(dst), 0x9):
+            return
+    except (ImportError, AttributeError):
+        pass
+    if os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+def _save_arrays(path, arrays):
+    """Writes a dict of element family to dicts of arrays to an .npz file. The
+    file is written under a temporary name and moved into place with
+    _replace_file, so readers never see a partial file."""
+    flat = {}
+    for family, fields in arrays.items():
+        for fld, arr in fields.items():
+            flat['{}/{}'.format(family, fld)] = arr
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.savez(f, **flat)
+    _replace_file(tmp, path)
+
+
+def _load_arrays(path):
+    """Reads a dict of element family to dicts of arrays from an .npz file."""
+    arrays = {}
+    npz = np.load(path)
+    try:
+        for name in npz.files:
+            family, fld = name.split('/', 1)
+            arrays.setdefault(family, OrderedDict())[fld] = npz[name]
+    finally:
+        npz.close()
+    return arrays
+
+
+###############################################################################
+###### MetricsRegistry holds counters, gauges and histograms in memory and ####
+#################### renders them in Prometheus text format ##################
+###############################################################################
+def _label_text(labels):
+    """Returns the Prometheus label text of a tuple of (name, value) pairs."""
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\')
+                                            .replace('"', '\\"')
+                                            .replace('\n', '\\n'))
+                          for k, v in labels) + '}'
+
+
+class Counter(object):
+    """Monotonically increasing value per label set."""
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, k, v) for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    """Value per label set which may go up or down."""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Counter):
+    """Distribution of observations in cumulative buckets per label set."""
+    kind = 'histogram'
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+               30.0, 60.0)
+
+    def __init__(self, name, help, buckets=None):
+        Counter.__init__(self, name, help)
+        self.buckets = tuple(buckets) if buckets else self.BUCKETS
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = self.values[key]
+            for n, b in enumerate(self.buckets):
+                if value <= b:
+                    counts[0][n] += 1
+            counts[1] += 1
+            counts[2] += value
+
+    def samples(self):
+        out = []
+        with self.lock:
+            for key, (counts, count, total) in sorted(self.values.items()):
+                for b, c in zip(self.buckets, counts):
+                    out.append((self.name + '_bucket',
+                                key + (('le', repr(float(b))),), c))
+                out.append((self.name + '_bucket', key + (('le', '+Inf'),),
+                            count))
+                out.append((self.name + '_sum', key, total))
+                out.append((self.name + '_count', key, count))
+        return out
+
+
+class MetricsRegistry(object):
+    """Named metrics of a pypsse instance. Metrics are registered once with
+    counter, gauge or histogram and looked up by name."""
+
+    def __init__(self):
+        self.__metrics__ = OrderedDict()
+
+    def __getitem__(self, name):
+        return self.__metrics__[name]
+
+    def __register__(self, metric):
+        """Internal function registers a metric unless the name exists."""
+        if metric.name not in self.__metrics__:
+            self.__metrics__[metric.name] = metric
+        return self.__metrics__[metric.name]
+
+    def counter(self, name, help):
+        return self.__register__(Counter(name, help))
+
+    def gauge(self, name, help):
+        return self.__register__(Gauge(name, help))
+
+    def histogram(self, name, help, buckets=None):
+        return self.__register__(Histogram(name, help, buckets))
+
+    def render(self):
+        """Returns all metrics in Prometheus text exposition format."""
+        lines = []
+        for metric in self.__metrics__.values():
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            for name, labels, value in metric.samples():
+                lines.append('{}{} {}'.format(name, _label_text(labels),
+                                              repr(float(value))))
+        return '\n'.join(lines) + '\n'
+
+
+###############################################################################
+######## SolvedStateCache memoizes solved results by applied changes ##########
+###############################################################################
+class SolvedStateCache(object):
+    """Least recently used cache of solved results for pypsse.solvecase_cached.
+    Entries are dicts of element family to dicts of numpy arrays. The cache is
+    bounded by the total bytes of the arrays it holds. If path is given,
+    entries are also written there as .npz files and reloaded on a miss, so
+    the cache persists between sessions."""
+
+    def __init__(self, max_bytes=256 * 1024 ** 2, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries__ = OrderedDict()
+        if path and not os.path.isdir(path):
+            os.makedirs(path)
+
+    @staticmethod
+    def key(token, changes, resolution=None, query=None):
+        """Returns the cache key of a case token and a dict of changes. Numeric
+        change values are rounded to resolution if given. query holds anything
+        else the entry depends on, such as the solution method and the
+        retrieved fields."""
+        items = []
+        for k in sorted(changes.keys()):
+            v = changes[k]
+            if resolution and isinstance(v, (int, long, float)):
+                v = int(round(v / float(resolution)))
+            items.append((k, v))
+        return hashlib.sha1(
+            repr((token, items, query)).encode('utf-8')).hexdigest()
+
+    def __len__(self):
+        return len(self.__entries__)
+
+    def __contains__(self, key):
+        return key in self.__entries__ or (
+            self.path is not None and os.path.exists(self.__file__(key)))
+
+    def __file__(self, key):
+        """Internal function returns the persisted file path of a key."""
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """Returns the entry for key, or None on a miss."""
+        if key in self.__entries__:
+            self.__entries__[key] = self.__entries__.pop(key)
+            self.hits += 1
+            return self.__entries__[key][0]
+        if self.path is not None and os.path.exists(self.__file__(key)):
+            arrays = _load_arrays(self.__file__(key))
+            self.__insert__(key, arrays)
+            self.hits += 1
+            return arrays
+        self.misses += 1
+        return None
+
+    def put(self, key, arrays):
+        """Adds an entry, evicting the least recently used entries as needed."""
+        if key in self.__entries__:
+            self.nbytes -= self.__entries__.pop(key)[1]
+        self.__insert__(key, arrays)
+        if self.path is not None:
+            _save_arrays(self.__file__(key), arrays)
+        return True
+
+    def __insert__(self, key, arrays):
+        """Internal function stores an entry in memory and enforces the bound."""
+        size = sum(arr.nbytes for fields in arrays.values()
+                   for arr in fields.values())
+        self.__entries__[key] = (arrays, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes and len(self.__entries__) > 1:
+            k, (arr, n) = self.__entries__.popitem(last=False)
+            self.nbytes -= n
+
+    def clear(self):
+        """Empties the in-memory cache. Persisted entries are kept."""
+        self.__entries__ = OrderedDict()
+        self.nbytes = 0
+
+
+
+###############################################################################
+######### Study queue distributes run_study tasks to worker processes #########
+####### on any number of machines through a broker and sharded results ########
+###############################################################################
+class StudyBroker(object):
+    """Interface of a study queue broker. Tasks move from queued to running
+    (leased to a worker) to done or failed. A running task whose lease expires
+    (its worker crashed) is claimed again until max_attempts is reached."""
+
+    def submit(self, task_id, payload):
+        """Queues a task. Returns False if the task ID already exists."""
+        raise NotImplementedError
+
+    def claim(self, worker):
+        """Leases the next task to worker. Returns (task_id, payload) or None."""
+        raise NotImplementedError
+
+    def heartbeat(self, task_id, worker):
+        """Extends the lease of a running task."""
+        raise NotImplementedError
+
+    def complete(self, task_id, worker, result):
+        """Marks a task done with the result location."""
+        raise NotImplementedError
+
+    def fail(self, task_id, worker, error):
+        """Requeues a task, or marks it failed after max_attempts."""
+        raise NotImplementedError
+
+    def status(self):
+        """Returns a dict of task state to number of tasks."""
+        raise NotImplementedError
+
+    def results(self):
+        """Returns a list of (task_id, result location) of done tasks."""
+        raise NotImplementedError
+
+
+class SQLiteBroker(StudyBroker):
+    """StudyBroker backed by a SQLite database file. Needs no services: workers
+    on other machines use the same file on a shared file system that supports
+    file locking. lease is the number of seconds a worker may hold a task
+    without a heartbeat."""
+
+    def __init__(self, path, lease=600.0, max_attempts=3):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.__conns__ = {}
+        self.__pid__ = None
+        with self.__connect__() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS tasks ('
+                         'task_id TEXT PRIMARY KEY, payload TEXT, state TEXT, '
+                         'attempts INTEGER, worker TEXT, expires REAL, '
+                         'result TEXT, error TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS tasks_state ON tasks '
+                         '(state, expires)')
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['__conns__'] = {}
+        return state
+
+    def __connect__(self):
+        """Internal function returns this thread's connection. Connections
+        are not shared between threads or with forked worker processes."""
+        if self.__pid__ != os.getpid():
+            self.__conns__ = {}
+            self.__pid__ = os.getpid()
+        thread = threading.current_thread().ident
+        if thread not in self.__conns__:
+            self.__conns__[thread] = sqlite3.connect(
+                self.path, timeout=60.0, isolation_level=None)
+        return _SQLiteTransaction(self.__conns__[thread])
+
+    def submit(self, task_id, payload):
+        with self.__connect__() as conn:
+            cur = conn.execute('INSERT OR IGNORE INTO tasks VALUES '
+                               '(?, ?, \'queued\', 0, NULL, 0, NULL, NULL)',
+                               (task_id, json.dumps(payload)))
+            return cur.rowcount == 1
+
+    def claim(self, worker):
+        now = time.time()
+        with self.__connect__() as conn:
+            conn.execute('UPDATE tasks SET state = \'failed\', error = '
+                         '\'lease expired after max attempts\' WHERE state = '
+                         '\'running\' AND expires < ? AND attempts >= ?',
+                         (now, self.max_attempts))
+            row = conn.execute('SELECT task_id, payload FROM tasks WHERE '
+                               'state = \'queued\' OR (state = \'running\' '
+                               'AND expires < ?) LIMIT 1', (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE tasks SET state = \'running\', worker = ?, '
+                         'expires = ?, attempts = attempts + 1 WHERE '
+                         'task_id = ?', (worker, now + self.lease, row[0]))
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, task_id, worker):
+        with self.__connect__() as conn:
+            cur = conn.execute('UPDATE tasks SET expires = ? WHERE task_id = ? '
+                               'AND worker = ? AND state = \'running\'',
+                               (time.time() + self.lease, task_id, worker))
+            return cur.rowcount == 1
+
+    def complete(self, task_id, worker, result):
+        with self.__connect__() as conn:
+            cur = conn.execute('UPDATE tasks SET state = \'done\', result = ? '
+                               'WHERE task_id = ? AND worker = ? AND state = '
+                               '\'running\'', (result, task_id, worker))
+            return cur.rowcount == 1
+
+    def fail(self, task_id, worker, error):
+        with self.__connect__() as conn:
+            cur = conn.execute('UPDATE tasks SET state = CASE WHEN attempts < ? '
+                               'THEN \'queued\' ELSE \'failed\' END, error = ? '
+                               'WHERE task_id = ? AND worker = ? AND state = '
+                               '\'running\'',
+                               (self.max_attempts, error, task_id, worker))
+            return cur.rowcount == 1
+
+    def status(self):
+        with self.__connect__() as conn:
+            rows = conn.execute('SELECT state, COUNT(*) FROM tasks GROUP BY '
+                                'state').fetchall()
+        return dict((str(r[0]), r[1]) for r in rows)
+
+    def results(self):
+        with self.__connect__() as conn:
+            rows = conn.execute('SELECT task_id, result FROM tasks WHERE '
+                                'state = \'done\'').fetchall()
+        return [(str(r[0]), str(r[1])) for r in rows]
+
+    def errors(self):
+        """Returns a list of (task_id, error) of failed tasks."""
+        with self.__connect__() as conn:
+            rows = conn.execute('SELECT task_id, error FROM tasks WHERE '
+                                'state = \'failed\'').fetchall()
+        return [(str(r[0]), r[1]) for r in rows]
+
+
+class _SQLiteTransaction(object):
+    """Context manager which runs statements in one immediate transaction, so
+    that a claim cannot be taken by two workers."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
+
+
+class StudyQueue(object):
+    """Submits studies (see pypsse.run_study) to a StudyBroker and reads their
+    results. Results are .npz files sharded into nshards subdirectories of
+    result_path by task ID. Task IDs default to a hash of the study, so
+    resubmitting a study is a no-op."""
+
+    def __init__(self, broker, result_path, nshards=64):
+        self.broker = broker
+        self.result_path = result_path
+        self.nshards = nshards
+
+    def task_id(self, study):
+        """Returns the default task ID of a study."""
+        return hashlib.sha1(json.dumps(study, sort_keys=True).encode(
+            'utf-8')).hexdigest()
+
+    def result_file(self, task_id):
+        """Returns the result file path of a task."""
+        digest = hashlib.sha1(task_id.encode('utf-8')).hexdigest()
+        shard = 'shard{:03d}'.format(int(digest[:8], 16) % self.nshards)
+        return os.path.join(self.result_path, shard, task_id + '.npz')
+
+    def submit(self, study, task_id=None):
+        """Queues a study. Returns its task ID."""
+        if task_id is None:
+            task_id = self.task_id(study)
+        self.broker.submit(task_id, study)
+        return task_id
+
+    def submit_many(self, studies):
+        """Queues a list of studies. Returns their task IDs."""
+        return [self.submit(s) for s in studies]
+
+    def result(self, task_id):
+        """Returns the result arrays of a done task, or None."""
+        path = self.result_file(task_id)
+        if not os.path.exists(path):
+            return None
+        return _load_arrays(path)
+
+    def wait(self, poll=5.0, timeout=None):
+        """Blocks until no task is queued or running. Returns the status."""
+        start = time.time()
+        while True:
+            status = self.broker.status()
+            if not status.get('queued', 0) and not status.get('running', 0):
+                return status
+            if timeout is not None and time.time() - start > timeout:
+                return status
+            time.sleep(poll)
+
+    def work(self, psse=None, worker=None, idle_timeout=None, poll=1.0):
+        """Runs the worker loop in this process: claims tasks, runs them with
+        psse (a new pypsse by default), writes the results and reports them to
+        the broker. While a study runs, a thread extends its lease every third
+        of the broker's lease, so long studies are not claimed again.
+        Exceptions fail the task, which is retried by the broker. Returns the
+        number of tasks completed when no task has been available for
+        idle_timeout seconds (never returns if idle_timeout is None)."""
+        if psse is None:
+            psse = pypsse()
+        if worker is None:
+            worker = '{}:{}'.format(os.uname()[1] if hasattr(os, 'uname')
+                                    else os.environ.get('COMPUTERNAME', ''),
+                                    os.getpid())
+        done = 0
+        idle = time.time()
+        while True:
+            task = self.broker.claim(worker)
+            if task is None:
+                if idle_timeout is not None and time.time() - idle > idle_timeout:
+                    return done
+                time.sleep(poll)
+                continue
+            task_id, study = task
+            psse.error_message = ''
+            stop = threading.Event()
+            beat = threading.Thread(target=self.__heartbeat__,
+                                    args=(task_id, worker, stop))
+            beat.daemon = True
+            beat.start()
+            try:
+                arrays = psse.run_study(study)
+                path = self.result_file(task_id)
+                if not os.path.isdir(os.path.dirname(path)):
+                    try:
+                        os.makedirs(os.path.dirname(path))
+                    except OSError:
+                        pass
+                _save_arrays(path, arrays)
+                self.broker.complete(task_id, worker, path)
+                done += 1
+            except Exception as e:
+                self.broker.fail(task_id, worker, '{}: {}'.format(
+                    type(e).__name__, str(e)))
+            finally:
+                stop.set()
+                beat.join()
+            idle = time.time()
+
+    def __heartbeat__(self, task_id, worker, stop):
+        """Internal function extends the lease of a running task every third
+        of the broker's lease until stop is set."""
+        interval = getattr(self.broker, 'lease', 600.0) / 3.0
+        while not stop.wait(interval):
+            self.broker.heartbeat(task_id, worker)
+
+    def start_workers(self, n, idle_timeout=60.0):
+        """Starts n worker processes on this machine running work. Returns the
+        list of processes."""
+        procs = []
+        for k in xrange(n):
+            proc = multiprocessing.Process(target=_study_worker,
+                                           args=(self, idle_timeout))
+            proc.daemon = True
+            proc.start()
+            procs.append(proc)
+        return procs
+
+
+def _study_worker(queue, idle_timeout):
+    """Target of worker processes started by StudyQueue.start_workers."""
+    queue.work(idle_timeout=idle_timeout)
+
+
+###############################################################################
+#### WarmPool keeps worker processes with PSS/E initialized and a base case ###
+############ loaded, and resets them by rollback between jobs #################
+###############################################################################
+class WarmPool(object):
+    """Pool of pre-forked worker processes, each of which initializes PSS/E
+    once, opens case and checkpoints it as WARMBASE (after solving it if
+    method is given). Jobs are functions called as func(psse, *args, **kwargs)
+    with the worker's pypsse instance; they and their arguments and results
+    must be picklable, so use module level functions. After each job the
+    worker rolls back to WARMBASE (reopening the case if the rollback fails),
+    so the next job starts from the base case without reloading it. The
+    rollback only undoes the changes checkpoint journals (see
+    pypsse.checkpoint): a job that changes the case directly through psspy
+    must call psse.journal_snapshot first, or its changes are carried into
+    the next job on that worker. After a job that raised, the case is
+    reopened instead, as the job may have left it partly restored. Bus
+    voltages are not restored, so a job starts from the solution the previous
+    job left."""
+
+    def __init__(self, case, processes=None, buscap=80000, method=None):
+        self.case = case
+        self.processes = processes or multiprocessing.cpu_count()
+        self.__tasks__ = multiprocessing.Queue()
+        self.__results__ = multiprocessing.Queue()
+        self.__done__ = {}
+        self.__job__ = 0
+        self.__ready__ = 0
+        self.workers = []
+        for n in xrange(self.processes):
+            p = multiprocessing.Process(target=_warm_worker, args=(
+                case, buscap, method, self.__tasks__, self.__results__))
+            p.daemon = True
+            p.start()
+            self.workers.append(p)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def wait_ready(self, timeout=None):
+        """Blocks until every worker has loaded the base case. Raises
+        RuntimeError if a worker could not open it."""
+        while self.__ready__ < self.processes:
+            self.__collect__(timeout)
+        return True
+
+    def submit(self, func, *args, **kwargs):
+        """Queues a job. Returns its job ID."""
+        job = self.__job__
+        self.__job__ += 1
+        self.__tasks__.put((job, func, args, kwargs))
+        return job
+
+    def result(self, job, timeout=None):
+        """Returns the result of a job, waiting for it if necessary. Raises
+        RuntimeError if the job raised, or if timeout seconds pass while
+        waiting for any result."""
+        while job not in self.__done__:
+            self.__collect__(timeout)
+        ok, value = self.__done__.pop(job)
+        if not ok:
+            raise RuntimeError('Job {} failed: {}'.format(job, value))
+        return value
+
+    def map(self, func, iterable):
+        """Runs func(psse, item) for each item. Returns the results in order."""
+        jobs = [self.submit(func, item) for item in iterable]
+        return [self.result(job) for job in jobs]
+
+    def __collect__(self, timeout):
+        """Internal function takes one message from the result queue."""
+        try:
+            job, ok, value = self.__results__.get(timeout=timeout)
+        except Queue.Empty:
+            raise RuntimeError('No worker result within {} seconds'.format(
+                timeout))
+        if job is None:
+            if not ok:
+                raise RuntimeError('Worker did not start: {}'.format(value))
+            self.__ready__ += 1
+        else:
+            self.__done__[job] = (ok, value)
+
+    def close(self):
+        """Stops the workers once the queued jobs are done. The result queue
+        is drained while waiting, since a worker cannot exit before the
+        results it queued are read; they remain available to result."""
+        for p in self.workers:
+            self.__tasks__.put(None)
+        while any(p.is_alive() for p in self.workers):
+            try:
+                self.__collect__(0.1)
+            except RuntimeError:
+                pass
+        for p in self.workers:
+            p.join()
+        self.workers = []
+
+
+def _warm_worker(case, buscap, method, tasks, results):
+    """Target of WarmPool worker processes."""
+    psse = pypsse()
+    sys.stdout = stdout
+    try:
+        loaded = psse.opencase(case, buscap=buscap) and (
+            not method or psse.solvecase(method=method))
+    except Exception as e:
+        psse.error_message += '{}: {}'.format(type(e).__name__, e)
+        loaded = False
+    if not loaded:
+        results.put((None, False, psse.error_message))
+        return
+    psse.checkpoint('WARMBASE')
+    psse.error_message = ''
+    results.put((None, True, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job, func, args, kwargs = task
+        try:
+            results.put((job, True, func(psse, *args, **kwargs)))
+            failed = False
+        except Exception as e:
+            results.put((job, False, '{}: {}'.format(type(e).__name__, e)))
+            failed = True
+        if failed or not psse.rollback('WARMBASE'):
+            psse.clear_checkpoints()
+            psse.opencase(case, buscap=buscap)
+            if method:
+                psse.solvecase(method=method)
+            psse.checkpoint('WARMBASE')
+        psse.error_message = ''
+
+
+def parallel_hosting_capacity(case, table, processes=None, **kwargs):
+    """Runs pypsse.hosting_capacity for each row of a table with columns BUS
+    and PMAX (and optionally GENBUS) in a pool of worker processes, each of
+    which opens case once; hosting_capacity rolls the case back after each
+    POI. kwargs are passed to hosting_capacity. Returns a dataframe with one
+    row per POI."""
+    table = pd.DataFrame(table).reset_index(drop=True)
+    if 'GENBUS' not in table.columns:
+        table['GENBUS'] = None
+    tasks = [(int(b), float(p), None if pd.isnull(g) else int(g), kwargs)
+             for b, p, g in zip(table['BUS'], table['PMAX'], table['GENBUS'])]
+    pool = multiprocessing.Pool(processes, _hosting_init, (case,))
+    try:
+        rows = pool.map(_hosting_task, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return pd.DataFrame(rows, columns=['POI', 'GENBUS', 'MW', 'UPPER', 'LIMIT',
+                                       'SOLVES', 'ERROR'])
+
+
+_hosting_psse = None
+_hosting_case = None
+
+
+def _hosting_init(case):
+    """Pool initializer opens the case once in each worker process."""
+    global _hosting_psse, _hosting_case, _pool_init_error
+    _hosting_case = case
+    try:
+        _hosting_psse = pypsse()
+        if not _hosting_psse.opencase(case):
+            _pool_init_error = RuntimeError('Case {} not opened: {}'.format(
+                case, _hosting_psse.error_message))
+    except Exception as e:
+        _pool_init_error = e
+
+
+def _hosting_task(task):
+    """Runs one POI of parallel_hosting_capacity. The case is reopened after
+    an error, since it may not have been restored."""
+    global _pool_init_error
+    if _pool_init_error is not None:
+        raise _pool_init_error
+    bus, pmax, genbus, kwargs = task
+    try:
+        return _hosting_psse.hosting_capacity(bus, pmax, genbus=genbus,
+                                              **kwargs)
+    except RuntimeError as e:
+        if not _hosting_psse.opencase(_hosting_case):
+            _pool_init_error = RuntimeError('Case {} not reopened: {}'.format(
+                _hosting_case, _hosting_psse.error_message))
+        return OrderedDict([('POI', bus), ('GENBUS', genbus), ('MW', np.nan),
+                            ('UPPER', np.nan), ('LIMIT', None), ('SOLVES', 0),
+                            ('ERROR', str(e))])
+
+
+def parallel_pv_curves(case, transfers, processes=None, **kwargs):
+    """Runs pypsse.pv_curve for each transfer direction in a WarmPool of
+    worker processes, each of which opens case once and rolls back to it
+    between directions. transfers maps a name to a (source, sink,
+    max_transfer) tuple; kwargs are passed to pv_curve. Returns an ordered
+    dict of name to pv_curve result."""
+    names = list(transfers)
+    with WarmPool(case, processes=processes) as pool:
+        pool.wait_ready()
+        results = pool.map(_pv_curve_job, [tuple(transfers[n]) + (kwargs,)
+                                           for n in names])
+    return OrderedDict(zip(names, results))
+
+
+def _pv_curve_job(psse, task):
+    """Runs one transfer direction of parallel_pv_curves."""
+    source, sink, max_transfer, kwargs = task
+    return psse.pv_curve(source, sink, max_transfer, **kwargs)
+
+
+if REPLAY_TRACE:
+    start_replay(REPLAY_TRACE)
 
 if __name__ == '__main__':
     psse_ = pypsse()
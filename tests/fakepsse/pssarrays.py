@@ -0,0 +1 @@
+"""Stand-in for the PSS/E pssarrays module used by the pypsse tests."""
@@ -0,0 +1 @@
+"""Stand-in for the PSS/E psse34 module used by the pypsse tests."""
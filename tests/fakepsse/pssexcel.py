@@ -0,0 +1 @@
+"""Stand-in for the PSS/E pssexcel module used by the pypsse tests."""
@@ -0,0 +1,346 @@
+"""Stand-in for the PSS/E psspy module used by the pypsse tests. It holds a
+small in-memory case (reset() rebuilds it) and implements the subset of the
+API that pypsse calls. CALLS logs the array API calls."""
+import copy, pickle
+import numpy as np
+
+S = {}
+CALLS = []
+
+def reset():
+    S.clear()
+    S['bus'] = {}
+    S['brn'] = []
+    S['trn'] = []
+    S['tr3'] = []
+    S['mach'] = []
+    S['load'] = []
+    S['wnd'] = []
+    S['plant'] = [dict(NUMBER=1, IREG=0, VSPU=1.02), dict(NUMBER=3, IREG=4, VSPU=1.01)]
+    S['fxsh'] = [dict(NUMBER=4, ID='1', STATUS=1, SHUNTNOM=complex(0, 15.0))]
+    S['sid'] = {}
+    S['solved'] = 0
+    S['limit'] = 1e9
+    def bus(n, name, base, typ, area, zone=1, owner=1):
+        S['bus'][n] = dict(NUMBER=n, NAME=name, EXNAME='%-12s%6.1f' % (name, base),
+                           BASE=float(base), TYPE=typ, AREA=area, ZONE=zone, OWNER=owner,
+                           PU=1.0, KV=float(base), ANGLE=0.0, ANGLED=0.0, NVLMHI=1.1, NVLMLO=0.9,
+                           EVLMHI=1.2, EVLMLO=0.8, DUMMY=0, SHUNTNOM=0j, SHUNTACT=0j, VOLTAGE=1+0j)
+    bus(1, 'ALPHA', 345, 3, 1); bus(2, 'BETA', 345, 1, 1); bus(3, 'GAMMA', 138, 2, 2)
+    bus(4, 'DELTA', 138, 1, 2); bus(5, 'EPS', 345, 1, 5); bus(6, 'ISLE', 138, 1, 5)
+    def brn(i, j, ckt='1', x=0.01, rate=100.0, st=1):
+        S['brn'].append(dict(FROMNUMBER=i, TONUMBER=j, ID=ckt, STATUS=st, RX=complex(0.001, x),
+                             CHARGING=0.01, RATEA=rate, RATEB=rate * 1.1, RATEC=rate * 1.2, LENGTH=1.0,
+                             P=0.0, Q=0.0, MVA=0.0, PCTRATEA=0.0, PCTRATEB=0.0, PCTRATEC=0.0,
+                             MAXPCTRATE=0.0, PCTRATE=0.0, FROMSHNT=0j, TOSHNT=0j))
+    brn(1, 2); brn(2, 5); brn(1, 5, x=0.02); brn(3, 4, rate=50.0); brn(5, 6, st=0)
+    S['trn'].append(dict(FROMNUMBER=2, TONUMBER=3, ID='T1', STATUS=1, RXACT=complex(0, 0.05),
+                         RXNOM=complex(0, 0.05), RATIO=1.0, RATIO2=1.0, ANGLE=0.0, RATEA=200.0,
+                         RATEB=200.0, RATEC=200.0, P=0.0, Q=0.0, MVA=0.0, PCTRATEA=0.0,
+                         PCTRATEB=0.0, PCTRATEC=0.0, MAXPCTRATE=0.0, PCTRATE=0.0, YMAG=0j,
+                         NOMV1=345.0, NOMV2=138.0, SBASE1=100.0, CW=1, CZ=1, CM=1))
+    S['mach'].append(dict(NUMBER=1, ID='1', STATUS=1, PGEN=50.0, QGEN=0.0, PMAX=500.0, PMIN=0.0,
+                          QMAX=200.0, QMIN=-200.0, MBASE=600.0, MVA=50.0, ZSORCE=complex(0, 1), OWN1=1))
+    S['mach'].append(dict(NUMBER=3, ID='1', STATUS=1, PGEN=40.0, QGEN=0.0, PMAX=100.0, PMIN=0.0,
+                          QMAX=50.0, QMIN=-50.0, MBASE=100.0, MVA=40.0, ZSORCE=complex(0, 1), OWN1=1))
+    for b, p in ((2, 40.0), (4, 30.0), (5, 20.0)):
+        S['load'].append(dict(NUMBER=b, ID='1', STATUS=1, AREA=S['bus'][b]['AREA'],
+                              ZONE=1, OWNER=1, MVANOM=complex(p, p / 4), MVAACT=complex(p, p / 4),
+                              TOTALNOM=complex(p, p / 4), TOTALACT=complex(p, p / 4),
+                              ILNOM=0j, YLNOM=0j, ILACT=0j, YLACT=0j, NAME=S['bus'][b]['NAME'],
+                              PU=1.0, BASE=S['bus'][b]['BASE']))
+reset()
+
+TYPES = {}
+def _typ(v):
+    if isinstance(v, bool) or isinstance(v, int):
+        return 'I'
+    if isinstance(v, float):
+        return 'R'
+    if isinstance(v, complex):
+        return 'X'
+    return 'C'
+
+def _ties(ends, buses, ties):
+    # 1: all terminals in the subsystem, 2: some but not all, 3: any
+    inside = sum(1 for b in ends if b in buses)
+    if ties == 2:
+        return 0 < inside < len(ends)
+    if ties == 3:
+        return inside > 0
+    return inside == len(ends)
+
+def _rows(fam, sid, flag, ties=None):
+    buses = S['sid'].get(sid) if sid not in (-1, None) else None
+    if fam == 'bus':
+        rows = [S['bus'][k] for k in sorted(S['bus'])]
+        if flag == 1:
+            rows = [r for r in rows if r['TYPE'] != 4]
+        return [r for r in rows if buses is None or r['NUMBER'] in buses]
+    rows = S[fam]
+    if fam in ('brn', 'trn'):
+        if flag in (1, 3):
+            rows = [r for r in rows if r['STATUS']]
+        return [r for r in rows if buses is None or _ties((r['FROMNUMBER'], r['TONUMBER']), buses, ties)]
+    if fam in ('tr3', 'wnd'):
+        return [r for r in rows if buses is None or _ties((r['WIND1NUMBER'], r['WIND2NUMBER'], r['WIND3NUMBER']), buses, ties)]
+    if flag in (1, 3):
+        rows = [r for r in rows if r.get('STATUS', 1)]
+    return [r for r in rows if buses is None or r['NUMBER'] in buses]
+
+def _sample(fam):
+    if fam == 'bus':
+        return S['bus'][min(S['bus'])]
+    if S[fam]:
+        return S[fam][0]
+    return {}
+
+def _mk(fam):
+    def get(sid=-1, owner=None, ties=None, flag=2, entry=None, string=''):
+        CALLS.append((fam, string))
+        if isinstance(string, str):
+            string = [string]
+        rows = _rows(fam, sid, flag, ties)
+        out = []
+        for f in string:
+            out.append([r.get(f) for r in rows])
+        return 0, out
+    def types(string):
+        if isinstance(string, str):
+            string = [string]
+        smp = _sample(fam)
+        out = [_typ(smp.get(f, 0.0)) if f in smp else ('C' if f in ('ID', 'NAME', 'EXNAME') else 'R') for f in string]
+        for n, f in enumerate(string):
+            if smp and f not in smp and f not in ('ID', 'NAME', 'EXNAME'):
+                return n + 1, out
+        return 0, out
+    def count(sid=-1, owner=None, ties=None, flag=2, entry=None):
+        return 0, len(_rows(fam, sid, flag, ties))
+    return get, types, count
+
+for fam, pre in (('bus', 'abus'), ('brn', 'abrn'), ('trn', 'atrn'), ('tr3', 'atr3'), ('mach', 'amach'), ('load', 'aload'), ('wnd', 'awnd'), ('fxsh', 'afxshunt'), ('plant', 'agenbus')):
+    g, t, c = _mk(fam)
+    for suf in ('int', 'real', 'cplx', 'char'):
+        globals()[pre + suf] = g
+    globals()[pre + 'types'] = t
+    globals()[pre + 'count'] = c
+alodbusint = abusint
+
+def aareaint(sid=-1, usekv=None, flag=1, string='NUMBER'):
+    return 0, [sorted(set(b['AREA'] for b in S['bus'].values()))]
+
+def azoneint(sid=-1, usekv=None, flag=1, string='NUMBER'):
+    return 0, [sorted(set(b['ZONE'] for b in S['bus'].values()))]
+
+def bsys(sid=0, usekv=0, basekv=[0, 0], numarea=0, areas=[], numbus=0, buses=[], numowner=0, owners=[], numzone=0, zones=[]):
+    sel = set()
+    for b in S['bus'].values():
+        ok = True
+        if numbus and b['NUMBER'] not in buses[:numbus]: ok = False
+        if numarea and b['AREA'] not in areas[:numarea]: ok = False
+        if numzone and b['ZONE'] not in zones[:numzone]: ok = False
+        if numowner and b['OWNER'] not in owners[:numowner]: ok = False
+        if usekv and not (basekv[0] <= b['BASE'] <= basekv[1]): ok = False
+        if ok: sel.add(b['NUMBER'])
+    S['sid'][sid] = sel
+    return 0
+
+def busexs(n):
+    return 0 if n in S['bus'] else 1
+
+def psseinit(n):
+    return 0
+
+def _solve(options=None):
+    loads = sum(l['MVANOM'].real for l in S['load'] if l['STATUS'])
+    S['solved'] = 0 if loads < S['limit'] else 1
+    gen = sum(m['PGEN'] for m in S['mach'] if m['STATUS'])
+    for r in S['brn'] + S['trn']:
+        r['P'] = gen * 0.3 * r['STATUS']
+        r['PCTRATEA'] = abs(r['P']) / r['RATEA'] * 100.0
+        r['MAXPCTRATE'] = r['PCTRATEA']
+        r['PCTRATE'] = r['PCTRATEA']
+    for b in S['bus'].values():
+        b['PU'] = 1.0 - 0.0004 * loads / 10.0 if b['TYPE'] != 3 else 1.0
+    return 0
+fnsl = fdns = _solve
+
+def solved():
+    return S['solved']
+
+def save(path):
+    with open(path, 'wb') as f:
+        pickle.dump({k: copy.deepcopy(v) for k, v in S.items() if k != 'sid'}, f)
+    return 0
+
+def case(path):
+    with open(path, 'rb') as f:
+        d = pickle.load(f)
+    S.update(d)
+    return 0
+
+def bus_data_3(ibus, intgar1=1, intgar2=1, intgar3=1, intgar4=1, realar1=0.0, name='', **kw):
+    S['bus'][ibus] = dict(NUMBER=ibus, NAME=name, EXNAME=name, BASE=realar1, TYPE=intgar1, AREA=intgar2,
+                          ZONE=intgar3, OWNER=intgar4, PU=1.0, KV=realar1, ANGLE=0.0, ANGLED=0.0,
+                          NVLMHI=1.1, NVLMLO=0.9, EVLMHI=1.2, EVLMLO=0.8, DUMMY=0, SHUNTNOM=0j,
+                          SHUNTACT=0j, VOLTAGE=1 + 0j)
+    return 0
+
+def bus_chng_3(ibus, **kw):
+    if ibus not in S['bus']:
+        return 1
+    if 'realar2' in kw: S['bus'][ibus]['PU'] = kw['realar2']
+    if 'realar3' in kw: S['bus'][ibus]['ANGLED'] = kw['realar3']
+    return 0
+
+def plant_data(ibus, ireg, realar):
+    if ibus not in S['bus']:
+        return 1
+    S['plant'] = [r for r in S['plant'] if r['NUMBER'] != ibus]
+    S['plant'].append(dict(NUMBER=ibus, IREG=ireg, VSPU=realar[0]))
+    return 0
+
+def plant_chng(ibus, ireg, realar):
+    return plant_data(ibus, ireg, realar)
+
+def two_winding_data(i, j, ckt, intgar=None, **kw):
+    if i not in S['bus'] or j not in S['bus']:
+        return 1, None
+    S['trn'].append(dict(FROMNUMBER=i, TONUMBER=j, ID=ckt, STATUS=1, RXACT=complex(0, 0.05),
+                         RXNOM=complex(0, 0.05), RATIO=1.0, RATIO2=1.0, ANGLE=0.0, RATEA=200.0,
+                         RATEB=200.0, RATEC=200.0, P=0.0, Q=0.0, MVA=0.0, PCTRATEA=0.0,
+                         PCTRATEB=0.0, PCTRATEC=0.0, MAXPCTRATE=0.0, PCTRATE=0.0, YMAG=0j,
+                         NOMV1=1.0, NOMV2=1.0, SBASE1=100.0, CW=1, CZ=1, CM=1))
+    return 0, [0.0]
+
+def machine_data_2(ibus, id, realar1=0.0, realar3=0.0, realar4=0.0, realar5=0.0, realar6=0.0, **kw):
+    if ibus not in S['bus']:
+        return 1
+    S['mach'].append(dict(NUMBER=ibus, ID=id, STATUS=1, PGEN=realar1, QGEN=0.0, PMAX=realar5, PMIN=realar6,
+                          QMAX=realar3, QMIN=realar4, MBASE=100.0, MVA=0.0, ZSORCE=complex(0, 1), OWN1=1))
+    return 0
+
+def _mach(ibus, id):
+    for m in S['mach']:
+        if m['NUMBER'] == ibus and m['ID'] == id:
+            return m
+
+def machine_chng_2(ibus, id, intgar=None, realar=None):
+    m = _mach(ibus, id)
+    if m is None:
+        return 1
+    if intgar and intgar[0] < 1e7: m['STATUS'] = intgar[0]
+    if realar and realar[0] < 1e19: m['PGEN'] = realar[0]
+    if realar and len(realar) > 1 and realar[1] < 1e19: m['QGEN'] = realar[1]
+    return 0
+
+def macdat(ibus, id, string):
+    m = _mach(ibus, id)
+    if m is None:
+        return 1, None
+    return 0, {'P': m['PGEN'], 'Q': m['QGEN']}.get(string)
+
+def macint(ibus, id, string):
+    m = _mach(ibus, id)
+    if m is None:
+        return 1, None
+    return 0, m['STATUS']
+
+def _load(ibus, id):
+    for m in S['load']:
+        if m['NUMBER'] == ibus and m['ID'] == id:
+            return m
+
+def load_data_5(ibus, id, intgar=None, realar=None):
+    if ibus not in S['bus']:
+        return 1
+    l = _load(ibus, id)
+    if l is None:
+        l = dict(NUMBER=ibus, ID=id, STATUS=1, AREA=1, ZONE=1, OWNER=1, MVANOM=0j, MVAACT=0j,
+                 TOTALNOM=0j, TOTALACT=0j, ILNOM=0j, YLNOM=0j, ILACT=0j, YLACT=0j, NAME='', PU=1.0, BASE=1.0)
+        S['load'].append(l)
+    return load_chng_5(ibus, id, intgar, realar)
+
+def load_chng_5(ibus, id, intgar=None, realar=None):
+    l = _load(ibus, id)
+    if l is None:
+        return 1
+    if intgar and intgar[0] < 1e7: l['STATUS'] = intgar[0]
+    p, q = l['MVANOM'].real, l['MVANOM'].imag
+    if realar and realar[0] < 1e19: p = realar[0]
+    if realar and realar[1] < 1e19: q = realar[1]
+    l['MVANOM'] = l['MVAACT'] = l['TOTALNOM'] = l['TOTALACT'] = complex(p, q)
+    return 0
+
+def loddt2(ibus, id, string, string2):
+    l = _load(ibus, id)
+    if l is None:
+        return 1, None
+    return 0, l['MVANOM']
+
+def lodint(ibus, id, string):
+    l = _load(ibus, id)
+    if l is None:
+        return 1, None
+    return 0, l['STATUS']
+
+def purgload(ibus, id):
+    l = _load(ibus, id)
+    if l is None:
+        return 1
+    S['load'].remove(l)
+    return 0
+
+def purgmac(ibus, id):
+    m = _mach(ibus, id)
+    if m is None:
+        return 1
+    S['mach'].remove(m)
+    return 0
+
+def extr(sid, all, status):
+    for b in list(S['sid'].get(sid, ())):
+        S['bus'].pop(b, None)
+        S['brn'] = [r for r in S['brn'] if b not in (r['FROMNUMBER'], r['TONUMBER'])]
+        S['trn'] = [r for r in S['trn'] if b not in (r['FROMNUMBER'], r['TONUMBER'])]
+        S['mach'] = [r for r in S['mach'] if r['NUMBER'] != b]
+        S['plant'] = [r for r in S['plant'] if r['NUMBER'] != b]
+        S['load'] = [r for r in S['load'] if r['NUMBER'] != b]
+    return 0
+
+def ltap(frmbus, tobus, ckt, fraction, newnum, newnam, newkv):
+    for r in S['brn']:
+        if r['FROMNUMBER'] == frmbus and r['TONUMBER'] == tobus and r['ID'] == ckt:
+            bus_data_3(newnum, intgar1=1, realar1=S['bus'][frmbus]['BASE'], name=newnam)
+            r2 = dict(r); r2['FROMNUMBER'] = newnum
+            r['TONUMBER'] = newnum
+            S['brn'].append(r2)
+            return 0
+    return 1
+
+def splt(bus, newnum, newnam, newkv):
+    if bus not in S['bus']:
+        return 1
+    bus_data_3(newnum, intgar1=1, realar1=S['bus'][bus]['BASE'], name=newnam)
+    return 0
+
+def branch_chng_3(i, j, ckt, **kw):
+    for r in S['brn']:
+        if r['FROMNUMBER'] == i and r['TONUMBER'] == j and r['ID'] == ckt:
+            if 'st' in kw: r['STATUS'] = kw['st']
+            return 0
+    return 1
+
+def busint(ibus, string):
+    if ibus not in S['bus']: return 1, None
+    return 0, S['bus'][ibus].get(string)
+
+def busdat(ibus, string):
+    if ibus not in S['bus']: return 1, None
+    return 0, S['bus'][ibus].get(string)
+
+def busdt1(ibus, string, other):
+    return busdat(ibus, string)
+
+def sysmva():
+    return 100.0
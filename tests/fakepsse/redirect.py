@@ -0,0 +1 @@
+"""Stand-in for the PSS/E redirect module used by the pypsse tests."""
@@ -0,0 +1,12 @@
+"""Imports pypsse against the PSS/E stand-in modules in tests/fakepsse."""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, 'fakepsse'))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import psspy
+import pypsse
+
+sys.stdout = pypsse.stdout
@@ -0,0 +1,53 @@
+import unittest
+
+from support import psspy, pypsse
+
+
+class BusNameIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = pypsse.BusNameIndex(
+            [10, 20, 30, 40, 50],
+            ['North', 'NORTH', 'North East', 'South', 'North'],
+            ['North       345.00', 'NORTH       138.00',
+             'North East  345.00', 'South       138.00',
+             'North       138.00'])
+
+    def test_exact_nocase_and_prefix(self):
+        df = self.index.lookup(['North', 'south', '  North   East '])
+        self.assertEqual(df['QUERY'].tolist(), [0, 0, 1, 2])
+        self.assertEqual(df['NUMBER'].tolist(), [10, 50, -1, 30])
+        df = self.index.lookup(['north', 'SOUTH'], match='nocase')
+        self.assertEqual(df['NUMBER'].tolist(), [10, 20, 50, 40])
+        df = self.index.lookup('nor', match='prefix')
+        self.assertEqual(df['NUMBER'].tolist(), [10, 20, 30, 50])
+        self.assertEqual(df['NAME'].tolist(), ['nor'] * 4)
+
+    def test_exnames(self):
+        df = self.index.lookup(['North 138.00', 'North 345'], field='EXNAME')
+        self.assertEqual(df['NUMBER'].tolist(), [50, -1])
+        df = self.index.lookup('north 345', field='EXNAME', match='prefix')
+        self.assertEqual(df['NUMBER'].tolist(), [10])
+
+    def test_numbers_of_and_errors(self):
+        self.assertEqual(self.index.numbers_of(['South', 'North', 'West'])
+                         .tolist(), [40, 10, -1])
+        self.assertEqual(len(self.index.lookup([]).index), 0)
+        self.assertRaises(ValueError, self.index.lookup, 'North', field='ID')
+        self.assertRaises(ValueError, self.index.lookup, 'North',
+                          match='fuzzy')
+
+    def test_case_index_is_rebuilt_after_changes(self):
+        psspy.reset()
+        psse = pypsse.pypsse()
+        self.assertEqual(psse.bus_numbers(['GAMMA'])['NUMBER'].tolist(), [3])
+        index = psse.get_bus_name_index()
+        self.assertIs(psse.get_bus_name_index(), index)
+        psse.create_bus_from_split(2, newnum=200, newnam='GAMMA')
+        self.assertIsNot(psse.get_bus_name_index(), index)
+        self.assertEqual(psse.bus_numbers('gamma', match='nocase')
+                         ['NUMBER'].tolist(), [3, 200])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from support import psspy, pypsse
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+
+    def tearDown(self):
+        self.psse.clear_checkpoints()
+
+    def machine(self, bus):
+        return psspy._mach(bus, '1')
+
+    def test_rollback_undoes_journaled_changes(self):
+        base = self.psse.checkpoint()
+        self.psse.dispatch_gen(3, '1', 75.0, solve=False)
+        self.psse.__change_load__(4, '1', 55.0, 5.0)
+        self.assertEqual(self.machine(3)['PGEN'], 75.0)
+        self.assertTrue(self.psse.rollback(base))
+        self.assertEqual(self.machine(3)['PGEN'], 40.0)
+        self.assertEqual(psspy._load(4, '1')['MVANOM'], complex(30, 7.5))
+
+    def test_rollback_to_earlier_checkpoint_discards_later_ones(self):
+        first = self.psse.checkpoint()
+        self.psse.dispatch_gen(3, '1', 60.0, solve=False)
+        self.psse.checkpoint()
+        self.psse.dispatch_gen(3, '1', 80.0, solve=False)
+        self.assertTrue(self.psse.rollback(first))
+        self.assertEqual(self.machine(3)['PGEN'], 40.0)
+        self.assertEqual(list(self.psse.__checkpoints__), [first])
+
+    def test_mutation_without_inverse_reloads_snapshot(self):
+        base = self.psse.checkpoint()
+        self.psse.create_bus_from_split(2, newnum=200)
+        self.assertIn(200, psspy.S['bus'])
+        self.assertTrue(self.psse.rollback(base))
+        self.assertNotIn(200, psspy.S['bus'])
+
+    def test_unjournaled_mutation_fails_rollback(self):
+        base = self.psse.checkpoint()
+        self.psse.__observe_mutation__('some_new_method', 0)
+        self.assertFalse(self.psse.rollback(base))
+        self.assertIn('some_new_method', self.psse.error_message)
+
+    def test_journal_snapshot_covers_direct_psspy_changes(self):
+        base = self.psse.checkpoint()
+        self.assertTrue(self.psse.journal_snapshot())
+        psspy.machine_chng_2(3, '1', realar=[90.0])
+        self.assertTrue(self.psse.rollback(base))
+        self.assertEqual(self.machine(3)['PGEN'], 40.0)
+
+    def test_voltages_are_restored_on_request(self):
+        base = self.psse.checkpoint(voltages=True)
+        for b in psspy.S['bus'].values():
+            b['PU'], b['ANGLED'] = 0.5, -10.0
+        self.assertTrue(self.psse.rollback(base))
+        self.assertEqual(set(b['PU'] for b in psspy.S['bus'].values()),
+                         set([1.0]))
+        self.assertEqual(psspy.S['bus'][4]['ANGLED'], 0.0)
+
+    def test_plain_rollback_leaves_voltages(self):
+        base = self.psse.checkpoint()
+        self.psse.dispatch_gen(3, '1', 75.0, solve=False)
+        psspy.S['bus'][2]['PU'] = 0.5
+        self.assertTrue(self.psse.rollback(base))
+        self.assertEqual(psspy.S['bus'][2]['PU'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from support import psspy, pypsse
+
+
+def counting(n, log):
+    for k in xrange(n):
+        log.append(k)
+        yield k, {'X': np.arange(k, k + 2, dtype=float)}
+
+
+def failing():
+    yield 0, {'X': np.zeros(2)}
+    raise KeyError('bad chunk')
+
+
+class ChunksTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def branches(self, **kwargs):
+        keys = []
+        for key, chunk in self.psse.iter_chunks(
+                'BRN', ['FROMNUMBER', 'TONUMBER', 'ID'], **kwargs):
+            keys += zip(chunk['FROMNUMBER'], chunk['TONUMBER'], chunk['ID'])
+        return sorted(keys)
+
+    def test_crossing_branches_are_yielded_once(self):
+        expected = sorted((r['FROMNUMBER'], r['TONUMBER'], r['ID'])
+                          for r in psspy.S['brn'])
+        for chunksize in (1, 2, 4, 10):
+            self.assertEqual(self.branches(chunksize=chunksize), expected)
+        self.assertEqual(self.branches(by='AREA'), expected)
+        self.assertEqual(self.branches(chunksize=2, prefetch=2), expected)
+
+    def test_reduce_chunks(self):
+        out = pypsse.reduce_chunks(
+            self.psse.iter_chunks('LOAD', ['STATUS'], chunksize=2,
+                                  frame=False),
+            {'n': ('STATUS', 'count')})
+        self.assertEqual(out['n'], 3)
+        out = pypsse.reduce_chunks(counting(3, []),
+                                   {'total': ('X', 'sum'), 'low': ('X', 'min'),
+                                    'mean': ('X', 'mean')})
+        self.assertEqual((out['total'], out['low'], out['mean']),
+                         (9.0, 0.0, 1.5))
+
+    def test_prefetch_reads_ahead_and_stops_early(self):
+        log = []
+        chunks = pypsse._prefetch(counting(100, log), 2)
+        self.assertEqual(next(chunks)[0], 0)
+        closer = threading.Thread(target=chunks.close)
+        closer.start()
+        closer.join(10)
+        self.assertFalse(closer.is_alive())
+        self.assertLess(len(log), 10)
+
+    def test_prefetch_stops_after_last_item(self):
+        chunks = pypsse._prefetch(counting(2, []), 1)
+        next(chunks)
+        # let the producer finish and wait to queue the end marker
+        time.sleep(0.3)
+        closer = threading.Thread(target=chunks.close)
+        closer.daemon = True
+        closer.start()
+        closer.join(10)
+        self.assertFalse(closer.is_alive())
+
+    def test_prefetch_raises_in_consumer(self):
+        chunks = pypsse._prefetch(failing(), 1)
+        self.assertEqual(next(chunks)[0], 0)
+        self.assertRaises(KeyError, next, chunks)
+
+    def test_write_chunks_header_after_empty_chunks(self):
+        empty = {'X': np.array([], dtype=float)}
+        chunks = [(0, empty), (1, empty), (2, {'X': np.array([1.0, 2.0])})]
+        path = os.path.join(self.dir, 'chunks.csv')
+        self.assertEqual(pypsse.write_chunks(chunks, path), 2)
+        df = pd.read_csv(path)
+        self.assertEqual(df.columns.tolist(), ['CHUNK', 'X'])
+        self.assertEqual(df['X'].tolist(), [1.0, 2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from support import pypsse
+
+
+class ContingencyStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'store')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def write(self, **kwargs):
+        """Writes 20 contingencies of 5 branches, where branch b of
+        contingency c is loaded at 90 + c + b percent, and a low voltage at
+        bus 7 in contingency 3."""
+        frm, to = np.arange(1, 6), np.arange(2, 7)
+        ckt = np.array(['1'] * 5)
+        with pypsse.ContingencyStoreWriter(self.path, **kwargs) as writer:
+            for c in range(20):
+                label = 'CTG{}'.format(c)
+                writer.add_thermal(label, 'BRN', frm, to, ckt,
+                                   90.0 + c + np.arange(5))
+                if c == 3:
+                    writer.add_voltage(label, np.array([7, 8]),
+                                       np.array([0.85, 1.0]),
+                                       np.array([1.1, 1.1]),
+                                       np.array([0.9, 0.9]))
+        return pypsse.ContingencyStore(self.path, cache_blocks=2)
+
+    def test_contingency_records(self):
+        store = self.write(block_rows=7, bucket_elements=2)
+        df = store.contingency('CTG3')
+        # loadings 93 to 97 are all below the default minimum of 100
+        self.assertEqual(df['KEY'].tolist(), [('BUS', 7)])
+        self.assertAlmostEqual(df['SEVERITY'][0], 0.05, places=6)
+        df = store.contingency('CTG12')
+        self.assertEqual(df['VALUE'].tolist(), [106.0, 105.0, 104.0,
+                                                103.0, 102.0])
+        violations = store.contingency('CTG9', violations=True)
+        self.assertEqual(violations['VALUE'].tolist(), [103.0, 102.0, 101.0])
+        self.assertRaises(KeyError, store.contingency, 'missing')
+
+    def test_element_records_and_summary(self):
+        store = self.write(block_rows=7, bucket_elements=2, min_loading=95.0)
+        worst = store.element(('BRN', 5, 6, '1'), top=3)
+        self.assertEqual(worst['CONTINGENCY'].tolist(),
+                         ['CTG19', 'CTG18', 'CTG17'])
+        self.assertEqual(worst['SEVERITY'].tolist(), [13.0, 12.0, 11.0])
+        # loadings of at least 95 percent: contingencies 5 to 19 of branch 1
+        records = store.element(['BRN', 1, 2, '1'])
+        self.assertEqual(len(records.index), 15)
+        self.assertEqual(len(store.element(['BRN', 1, 2, '1'],
+                                           violations=True).index), 9)
+        summary = store.element_summary().set_index('KEY')
+        self.assertEqual(summary['COUNT'][('BRN', 1, 2, '1')], 9)
+        self.assertEqual(summary['WORST'][('BRN', 5, 6, '1')], 13.0)
+        self.assertEqual(summary['COUNT'][('BUS', 7)], 1)
+        self.assertRaises(KeyError, store.element, ('BRN', 9, 9, '1'))
+        self.assertEqual(len(store), sum(
+            len(store.contingency('CTG{}'.format(c)).index)
+            for c in range(20)))
+
+    def test_contingencies_without_records(self):
+        store = self.write(thermal_limit=200.0)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(len(store.contingency('CTG0').index), 0)
+        self.assertEqual(store.element_summary()['KEY'].tolist(),
+                         [('BUS', 7)])
+
+
+if __name__ == '__main__':
+    unittest.main()
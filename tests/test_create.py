@@ -0,0 +1,50 @@
+import unittest
+
+import pandas as pd
+
+from support import psspy, pypsse
+
+
+class BulkCreateTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+
+    def test_create_gens_reports_missing_poi(self):
+        df = self.psse.create_gens({'BUS': [2, 77], 'CAPACITY': [10.0, 5.0]})
+        self.assertEqual(df['POI'].tolist(), [2, 77])
+        self.assertEqual(df['ERROR'].tolist()[0], '')
+        self.assertIn('77', df['ERROR'].tolist()[1])
+        self.assertIn(df.index[0], psspy.S['bus'])
+
+    def test_create_gens_without_bus_numbers(self):
+        self.psse.__reserve_bus_numbers__ = lambda count: []
+        df = self.psse.create_gens({'BUS': [2], 'CAPACITY': [10.0]})
+        self.assertTrue(df.empty)
+
+    def test_splits_and_taps(self):
+        df = self.psse.create_buses_from_splits([2, 4])
+        self.assertEqual(df['SPLIT'].tolist(), [2, 4])
+        self.assertTrue((df['BASE'].values == [345.0, 138.0]).all())
+        df = self.psse.create_buses_from_taps({'FROMNUMBER': [1],
+                                               'TONUMBER': [2],
+                                               'NEWNUM': [500]})
+        self.assertEqual(df.index.tolist(), [500])
+        self.assertEqual(df['ERROR'].tolist(), [''])
+
+    def test_failed_retrieval_is_reported_in_error(self):
+        self.psse.get_multiple_bus_data = lambda **kwargs: pd.DataFrame()
+        df = self.psse.create_buses_from_splits({'BUS': [2, 4],
+                                                 'NEWNUM': [300, 301]})
+        self.assertEqual(df.index.tolist(), [300, 301])
+        self.assertEqual(df['SPLIT'].tolist(), [2, 4])
+        self.assertTrue(all('300' in e or '301' in e for e in df['ERROR']))
+        df = self.psse.create_buses_from_taps({'FROMNUMBER': [1],
+                                               'TONUMBER': [2],
+                                               'NEWNUM': [500]})
+        self.assertIn('500', df['ERROR'][500])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import psspy, pypsse
+
+
+class HostingCapacityTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+        self.dir = tempfile.mkdtemp()
+        self.case = os.path.join(self.dir, 'base.sav')
+        psspy.save(self.case)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_thermal_limit_and_restore(self):
+        result = self.psse.hosting_capacity(2, 200.0)
+        # branch 3-4 (50 MVA) carries 30% of the generation in the test case
+        self.assertAlmostEqual(result['UPPER'], 50.0 / 0.3 - 90.0, places=6)
+        self.assertLessEqual(result['UPPER'] - result['MW'], 1.0)
+        self.assertEqual(result['LIMIT'], ('BRN', 3, 4, '1'))
+        self.assertEqual(sorted(psspy.S['bus']), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.psse.__checkpoints__, {})
+
+    def test_failed_rollback_raises(self):
+        self.psse.rollback = lambda name=None: False
+        self.assertRaises(RuntimeError, self.psse.hosting_capacity, 2, 200.0)
+
+    def test_parallel(self):
+        df = pypsse.parallel_hosting_capacity(
+            self.case, {'BUS': [2, 4], 'PMAX': [200.0, 20.0]}, processes=2)
+        self.assertEqual(df['POI'].tolist(), [2, 4])
+        self.assertEqual(df['MW'].tolist()[1], 20.0)
+
+    def test_parallel_with_unopened_case_raises(self):
+        missing = os.path.join(self.dir, 'missing.sav')
+        self.assertRaises(Exception, pypsse.parallel_hosting_capacity,
+                          missing, {'BUS': [2], 'PMAX': [200.0]}, processes=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
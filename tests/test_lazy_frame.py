@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from support import psspy, pypsse
+
+
+class LazyFrameTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+
+    def assertSameFrame(self, lazy, eager, columns):
+        df = lazy.materialize()
+        self.assertEqual(df.index.tolist(), eager.index.tolist())
+        for c in columns:
+            pd.util.testing.assert_series_equal(
+                df[c].astype(object), eager[c].astype(object),
+                check_names=False, check_index_type=False)
+
+    def test_sid_rows_match_the_eager_frame(self):
+        psspy.bsys(sid=2, numbus=3, buses=[2, 3, 4])
+        fields = ['PU', 'NAME', 'TYPE']
+        lazy = self.psse.get_multiple_bus_data(sid=2, datafields=fields,
+                                               lazy=True)
+        eager = self.psse.get_multiple_bus_data(sid=2, datafields=list(fields))
+        self.assertEqual(lazy.index.tolist(), [2, 3, 4])
+        self.assertSameFrame(lazy, eager, fields)
+
+    def test_bus_list_rows_with_missing_elements(self):
+        fields = ['NUMBER', 'PGEN']
+        lazy = self.psse.get_multiple_machine_data(
+            buslist=[3, 2, 1], datafields=fields, lazy=True)
+        eager = self.psse.get_multiple_machine_data(buslist=[3, 2, 1],
+                                                    datafields=list(fields))
+        self.assertEqual(lazy.index.tolist(), [3, 2, 1])
+        self.assertTrue(np.isnan(lazy['PGEN'][2]))
+        self.assertEqual(lazy['PGEN'][1], 50.0)
+        self.assertSameFrame(lazy, eager, ['PGEN'])
+
+    def test_branches_in_the_requested_direction(self):
+        args = dict(ibuslist=[2, 4, 1], jbuslist=[1, 3, 4],
+                    cktlist=['1', '1', '1'])
+        lazy = self.psse.get_multiple_branch_data(
+            datafields=['RATEA'], lazy=True, **args)
+        eager = self.psse.get_multiple_branch_data(datafields=['RATEA'],
+                                                   **args)
+        self.assertEqual(lazy['FROMNUMBER'].tolist(), [2, 4, 1])
+        self.assertEqual(lazy['TONUMBER'].tolist(), [1, 3, 4])
+        self.assertEqual(lazy['RATEA'].tolist()[:2], [100.0, 50.0])
+        self.assertTrue(np.isnan(lazy['RATEA'][2]))
+        self.assertSameFrame(lazy, eager, ['FROMNUMBER', 'TONUMBER',
+                                           'RATEA'])
+
+    def test_only_accessed_columns_are_fetched(self):
+        del psspy.CALLS[:]
+        lazy = self.psse.get_multiple_bus_data(
+            sid=-1, datafields=['PU', 'NAME', 'ANGLED'], lazy=True)
+        self.assertEqual(psspy.CALLS, [('bus', ['NUMBER'])])
+        del psspy.CALLS[:]
+        self.assertEqual(lazy.PU.tolist(), [1.0] * 6)
+        self.assertEqual(lazy['PU'].tolist(), [1.0] * 6)
+        self.assertEqual(psspy.CALLS, [('bus', ['PU'])])
+        self.assertEqual(lazy.fetched, ['PU'])
+        self.assertRaises(KeyError, lazy.__getitem__, 'KV')
+        self.assertRaises(AttributeError, getattr, lazy, 'KV')
+
+    def test_changed_element_count_raises(self):
+        lazy = self.psse.get_multiple_bus_data(sid=-1, datafields=['PU'],
+                                               lazy=True)
+        psspy.bus_data_3(7, name='NEW', realar1=138.0)
+        self.assertRaises(RuntimeError, lazy.__getitem__, 'PU')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+import urllib2
+
+from support import psspy, pypsse
+
+
+class MetricsRegistryTest(unittest.TestCase):
+
+    def test_render_escapes_labels(self):
+        registry = pypsse.MetricsRegistry()
+        counter = registry.counter('calls_total', 'Calls.')
+        counter.inc(api='a"b\\c\nd')
+        counter.inc(2, api='plain')
+        self.assertIs(registry.counter('calls_total', 'Other.'), counter)
+        registry.gauge('depth', 'Depth.').set(3)
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP calls_total Calls.', '# TYPE calls_total counter',
+            'calls_total{api="a\\"b\\\\c\\nd"} 1.0',
+            'calls_total{api="plain"} 2.0',
+            '# HELP depth Depth.', '# TYPE depth gauge', 'depth 3.0', '']))
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = pypsse.MetricsRegistry()
+        hist = registry.histogram('seconds', 'Time.', buckets=[0.1, 1.0])
+        for value in [0.05, 0.5, 0.7, 5.0]:
+            hist.observe(value, method='FNSL')
+        lines = registry.render().splitlines()[2:]
+        self.assertEqual(lines, [
+            'seconds_bucket{method="FNSL",le="0.1"} 1.0',
+            'seconds_bucket{method="FNSL",le="1.0"} 3.0',
+            'seconds_bucket{method="FNSL",le="+Inf"} 4.0',
+            'seconds_sum{method="FNSL"} 6.25',
+            'seconds_count{method="FNSL"} 4.0'])
+
+
+class CaseMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_invalid_method_raises_on_every_solving_path(self):
+        self.assertRaises(ValueError, self.psse.solvecase, method='fnsl')
+        self.assertRaises(ValueError, self.psse.hosting_capacity, 4, 50.0,
+                          method='fnsl')
+        self.assertEqual(self.psse.__checkpoints__, {})
+
+    def test_write_metrics(self):
+        self.psse.solvecase()
+        path = os.path.join(self.dir, 'pypsse.prom')
+        self.assertTrue(self.psse.write_metrics(path))
+        self.assertTrue(self.psse.write_metrics(path))
+        self.assertEqual(os.listdir(self.dir), ['pypsse.prom'])
+        with open(path) as f:
+            text = f.read()
+        self.assertIn('pypsse_solves_total{method="FNSL"} 1.0\n', text)
+        self.assertIn('# TYPE pypsse_solve_seconds histogram\n', text)
+
+    def test_serve_metrics(self):
+        server = self.psse.serve_metrics(port=0)
+        try:
+            url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+            self.psse.solvecase()
+            body = urllib2.urlopen(url + '/metrics', timeout=10).read()
+            self.assertIn('pypsse_solves_total{method="FNSL"} 1.0\n', body)
+            try:
+                urllib2.urlopen(url + '/other', timeout=10)
+                self.fail('no error for an unknown path')
+            except urllib2.HTTPError as e:
+                self.assertEqual(e.code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from support import pypsse
+
+
+def model(load=50.0):
+    """Slack bus 1 feeding a load at bus 3 through bus 2 over lossless
+    lines, with a generator at bus 2."""
+    tables = {
+        'BUS': {'NUMBER': np.array([1, 2, 3]), 'TYPE': np.array([3, 2, 1]),
+                'PU': np.array([1.0, 1.0, 1.0]),
+                'ANGLED': np.array([0.0, 0.0, 0.0])},
+        'BRN': {'FROMNUMBER': np.array([1, 2]), 'TONUMBER': np.array([2, 3]),
+                'ID': np.array(['1', '1']), 'STATUS': np.array([1, 1]),
+                'RX': np.array([0.1j, 0.1j]),
+                'RATEA': np.array([100.0, 100.0])},
+        'MACH': {'NUMBER': np.array([1, 2]), 'ID': np.array(['1', '1']),
+                 'STATUS': np.array([1, 1]), 'PGEN': np.array([0.0, 20.0]),
+                 'QGEN': np.array([0.0, 0.0])},
+        'LOAD': {'NUMBER': np.array([3]), 'ID': np.array(['1']),
+                 'STATUS': np.array([1]),
+                 'MVANOM': np.array([complex(load, 10.0)])}}
+    return pypsse.NetworkModel(tables)
+
+
+class PowerFlowTest(unittest.TestCase):
+
+    def test_solution_balances_the_load(self):
+        pf = pypsse.PowerFlow(model())
+        self.assertTrue(pf.solve())
+        flows = pf.flows('BRN')
+        # lossless lines: the slack supplies the load less the generator
+        self.assertAlmostEqual(flows['P'][0], 30.0, places=4)
+        self.assertAlmostEqual(flows['P'][1], 50.0, places=4)
+        buses = pf.bus_frame()
+        self.assertEqual(buses['PU'].tolist()[:2], [1.0, 1.0])
+        self.assertLess(buses['PU'][2], 1.0)
+        self.assertLess(buses['ANGLED'][2], buses['ANGLED'][1])
+        self.assertAlmostEqual(flows['PCTRATEA'][1],
+                               100.0 * abs(complex(flows['P'][1],
+                                                   flows['Q'][1])) / 100.0)
+
+    def test_changes_and_reset(self):
+        pf = pypsse.PowerFlow(model(), reuse_lu=True)
+        pf.solve()
+        pf.apply([['MACH', 2, '1', 50.0], ['LOAD', 3, '1', 80.0, None]])
+        self.assertTrue(pf.solve())
+        self.assertAlmostEqual(pf.flows('BRN')['P'][0], 30.0, places=4)
+        pf.reset()
+        self.assertTrue(pf.solve())
+        self.assertAlmostEqual(pf.flows('BRN')['P'][0], 30.0, places=4)
+        self.assertRaises(ValueError, pf.set_gen, 3, '1', 10.0)
+
+    def test_matches_the_changed_model(self):
+        pf = pypsse.PowerFlow(model())
+        pf.solve()
+        pf.set_load(3, '1', pload=70.0)
+        pf.solve()
+        fresh = pypsse.PowerFlow(model(load=70.0))
+        fresh.solve()
+        self.assertTrue(np.allclose(pf.voltage, fresh.voltage, atol=1e-6))
+
+    def test_parallel(self):
+        out = pypsse.parallel_power_flow(
+            model(), {'base': [], 'more': [['LOAD', 3, '1', 70.0, None]]},
+            processes=2)
+        self.assertTrue(out['base']['CONVERGED'])
+        self.assertLess(out['more']['PU'][2], out['base']['PU'][2])
+
+    def test_parallel_reports_init_errors(self):
+        self.assertRaises(TypeError, pypsse.parallel_power_flow, model(),
+                          {'base': []}, processes=1, bogus=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
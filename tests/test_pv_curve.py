@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from support import psspy, pypsse
+
+
+def direction():
+    source = pd.DataFrame({'KIND': ['MACH'], 'BUS': [1], 'ID': ['1']})
+    sink = pd.DataFrame({'KIND': ['LOAD', 'LOAD'], 'BUS': [2, 4],
+                         'ID': ['1', '1'], 'FACTOR': [3.0, 1.0]})
+    return source, sink
+
+
+class PvCurveTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        psspy.S['limit'] = 150.0
+        self.psse = pypsse.pypsse()
+
+    def test_nose_and_restore(self):
+        source, sink = direction()
+        result = self.psse.pv_curve(source, sink, 200.0)
+        # the case stops converging once the 90 MW of load reaches 150 MW
+        self.assertLess(result['NOSE'], 60.0)
+        self.assertGreaterEqual(result['NOSE'], 60.0 - 0.2)
+        self.assertEqual(result['LIMIT'], 'NOSE')
+        self.assertEqual(len(result['PU']), len(result['TRANSFER']))
+        self.assertEqual(psspy._mach(1, '1')['PGEN'], 50.0)
+        self.assertEqual(psspy._load(2, '1')['MVANOM'], complex(40.0, 10.0))
+        self.assertEqual(self.psse.__checkpoints__, {})
+
+    def test_journal_does_not_grow_with_the_points(self):
+        source, sink = direction()
+        self.psse.checkpoint('outer')
+        journal = []
+        rollback = self.psse.rollback
+
+        def spy(name=None):
+            journal.append(list(self.psse.__journal__))
+            return rollback(name)
+        self.psse.rollback = spy
+        result = self.psse.pv_curve(source, sink, 200.0)
+        self.assertGreater(result['SOLVES'], 5)
+        self.assertEqual([e[0] for e in journal[0]], ['inverse'])
+        self.assertTrue(rollback('outer'))
+
+    def test_failed_rollback_raises(self):
+        source, sink = direction()
+        self.psse.rollback = lambda name=None: False
+        self.assertRaises(RuntimeError, self.psse.pv_curve, source, sink,
+                          200.0)
+        self.assertEqual(self.psse.__checkpoints__, {})
+
+    def test_parallel(self):
+        folder = tempfile.mkdtemp()
+        try:
+            case = os.path.join(folder, 'base.sav')
+            psspy.save(case)
+            source, sink = direction()
+            out = pypsse.parallel_pv_curves(
+                case, {'a': (source, sink, 200.0), 'b': (source, sink, 20.0)},
+                processes=1)
+        finally:
+            shutil.rmtree(folder, True)
+        self.assertEqual(out['a']['LIMIT'], 'NOSE')
+        self.assertEqual(out['b']['LIMIT'], 'MAX_TRANSFER')
+        self.assertEqual(out['b']['NOSE'], 20.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from support import psspy, pypsse
+
+
+class QueryTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+
+    def test_where_and_projection(self):
+        df = self.psse.query('BUS', ['NAME', 'BASE'],
+                             where={'BASE': ('<', 200.0)})
+        self.assertEqual(df.index.tolist(), [3, 4, 6])
+        self.assertEqual(df['NAME'].tolist(), ['GAMMA', 'DELTA', 'ISLE'])
+
+    def test_projection_is_retrieved_for_matched_buses(self):
+        df = self.psse.query('BUS', ['NAME'], where={'TYPE': 2})
+        self.assertEqual(df['NAME'].tolist(), ['GAMMA'])
+        self.assertEqual(psspy.S['sid'][11], set([3]))
+
+    def test_branch_projection_keeps_matched_rows(self):
+        df = self.psse.query('BRN', ['FROMNUMBER', 'TONUMBER', 'RATEA'],
+                             where={'FROMNUMBER': 2})
+        expected = [(r['FROMNUMBER'], r['TONUMBER'], r['RATEA'])
+                    for r in psspy.S['brn'] if r['FROMNUMBER'] == 2]
+        self.assertEqual(
+            list(zip(df['FROMNUMBER'], df['TONUMBER'], df['RATEA'])),
+            expected)
+
+    def test_machine_query_is_indexed_by_bus(self):
+        df = self.psse.query('MACH', ['PGEN'], where={'PGEN': ('>', 45.0)})
+        self.assertEqual(df.index.tolist(), [1])
+        self.assertEqual(df['PGEN'].tolist(), [50.0])
+
+    def test_no_match_skips_projection(self):
+        del psspy.CALLS[:]
+        df = self.psse.query('BUS', ['NAME'], where={'BASE': ('>', 500.0)})
+        self.assertEqual(len(df.index), 0)
+        self.assertNotIn(('bus', ['NAME']), psspy.CALLS)
+
+    def test_unknown_where_field_raises(self):
+        self.assertRaises(ValueError, self.psse.query, 'BUS', ['PU'],
+                          where={'NOSUCHFIELD': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
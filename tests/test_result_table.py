@@ -0,0 +1,48 @@
+import unittest
+
+from support import psspy, pypsse
+
+
+class ResultTableTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+
+    def test_refresh_updates_solution_fields_in_place(self):
+        table = self.psse.get_result_table('BUS', ['NUMBER', 'NAME', 'PU'],
+                                           buslist=[2, 4])
+        self.assertEqual(table['NUMBER'].tolist(), [2, 4])
+        pu = table['PU']
+        self.assertEqual(pu.tolist(), [1.0, 1.0])
+        psspy.load_chng_5(2, '1', realar=[140.0, 35.0])
+        self.psse.solvecase()
+        del psspy.CALLS[:]
+        self.assertEqual(table.refresh(), ['PU'])
+        self.assertEqual([c[1] for c in psspy.CALLS], [['PU']])
+        # the view taken before the refresh sees the solved voltages
+        self.assertAlmostEqual(pu[0], 1.0 - 0.0004 * 190.0 / 10.0)
+        self.assertIs(table['PU'], pu)
+        self.assertEqual(len(table), 2)
+
+    def test_refresh_reloads_when_the_count_changes(self):
+        table = self.psse.get_result_table('BUS', ['NUMBER', 'PU'])
+        self.assertEqual(len(table), 6)
+        self.psse.create_bus_from_split(2, newnum=200)
+        self.assertEqual(table.refresh(), ['NUMBER', 'PU'])
+        self.assertEqual(table['NUMBER'].tolist(), [1, 2, 3, 4, 5, 6, 200])
+
+    def test_refresh_of_given_fields_and_frame(self):
+        table = self.psse.get_result_table('MACH', ['NUMBER', 'PGEN'])
+        psspy.machine_chng_2(3, '1', realar=[75.0])
+        self.assertEqual(table.refresh(fields=['PGEN']), ['PGEN'])
+        df = table.to_frame()
+        self.assertEqual(df['PGEN'].tolist(), [50.0, 75.0])
+        df['PGEN'] = 0.0
+        self.assertEqual(table['PGEN'].tolist(), [50.0, 75.0])
+        names = self.psse.get_result_table('BUS', ['NUMBER', 'NAME'])
+        self.assertEqual(names.refresh(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from support import psspy, pypsse
+
+
+class SharedTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.publisher = pypsse.SharedTablePublisher('study', path=self.dir)
+
+    def tearDown(self):
+        self.publisher.close()
+        shutil.rmtree(self.dir, True)
+
+    def publish(self, scale):
+        return self.publisher.publish('BUS', {
+            'NUMBER': np.arange(1, 5), 'PU': np.ones(4) * scale,
+            'NAME': np.array(['A', 'B', 'C', 'D'], dtype=object)})
+
+    def test_attach_returns_read_only_views(self):
+        self.publish(1.0)
+        reader = pypsse.SharedTableReader('study', path=self.dir)
+        arrays = reader.arrays('BUS')
+        self.assertEqual(arrays['NUMBER'].tolist(), [1, 2, 3, 4])
+        self.assertEqual(arrays['NAME'].tolist(), ['A', 'B', 'C', 'D'])
+        for arr in arrays.values():
+            self.assertFalse(arr.flags.owndata)
+            self.assertFalse(arr.flags.writeable)
+        self.assertEqual(reader.frame('BUS')['PU'].tolist(), [1.0] * 4)
+        self.assertRaises(ValueError, self.publisher.publish, 'BUS',
+                          {'A': np.zeros(2), 'B': np.zeros(3)})
+
+    def test_stale_after_republish(self):
+        self.publish(1.0)
+        reader = pypsse.SharedTableReader('study', path=self.dir)
+        self.assertFalse(reader.is_stale())
+        self.assertEqual(self.publish(0.9), 2)
+        self.assertTrue(reader.is_stale())
+        # the attached generation stays readable until reattached
+        self.assertEqual(reader.arrays('BUS')['PU'].tolist(), [1.0] * 4)
+        self.assertEqual(reader.attach(), 2)
+        self.assertFalse(reader.is_stale())
+        self.assertEqual(reader.arrays('BUS')['PU'].tolist(), [0.9] * 4)
+
+    def test_previous_generation_outlives_one_publish(self):
+        self.publish(1.0)
+        descriptor = os.path.join(self.dir, 'pypsse.study.json')
+        with open(descriptor) as f:
+            old = f.read()
+        self.publish(0.9)
+        # a reader which read the descriptor before the publish
+        with open(descriptor, 'w') as f:
+            f.write(old)
+        reader = pypsse.SharedTableReader('study', path=self.dir)
+        self.assertEqual(reader.generation, 1)
+        self.assertEqual(reader.arrays('BUS')['PU'].tolist(), [1.0] * 4)
+        self.publish(0.8)
+        segments = sorted(n for n in os.listdir(self.dir)
+                          if n.startswith('pypsse.study.BUS.'))
+        self.assertEqual(segments, ['pypsse.study.BUS.2',
+                                    'pypsse.study.BUS.3'])
+        self.publisher.close()
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_publish_case_table(self):
+        psspy.reset()
+        psse = pypsse.pypsse()
+        psse.publish_table(self.publisher, 'MACH', ['NUMBER', 'PGEN'])
+        reader = pypsse.SharedTableReader('study', path=self.dir)
+        self.assertEqual(reader.arrays('MACH')['PGEN'].tolist(), [50.0, 40.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
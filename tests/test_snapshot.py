@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from support import psspy, pypsse
+
+
+def buses(numbers, pu, names):
+    return {'BUS': {'NUMBER': np.array(numbers), 'PU': np.array(pu),
+                    'NAME': np.array(names)}}
+
+
+class CaseSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.before = pypsse.CaseSnapshot(
+            buses([1, 2, 3, 4], [1.0, 1.0, 1.0, 1.0], ['A', 'B', 'C', 'D']))
+
+    def test_changes_added_and_removed(self):
+        after = pypsse.CaseSnapshot(
+            buses([5, 3, 2, 1], [1.01, 1.0, 1.00001, np.nan],
+                  ['E', 'C', 'B', 'A']))
+        diff = self.before.diff(after)
+        pu = diff.changed['BUS'][diff.changed['BUS']['FIELD'] == 'PU']
+        # changes to NaN first, then by size; 2 is below the threshold
+        self.assertEqual(pu['NUMBER'].tolist(), [1])
+        self.assertEqual(diff.added['BUS']['NUMBER'].tolist(), [5])
+        self.assertEqual(diff.removed['BUS']['NUMBER'].tolist(), [4])
+
+    def test_non_numeric_fields(self):
+        after = pypsse.CaseSnapshot(
+            buses([1, 2, 3, 4], [1.0, 1.0, 1.05, 1.0], ['A', 'X', 'C', 'D']))
+        changed = self.before.diff(after).changed['BUS']
+        name = changed[changed['FIELD'] == 'NAME']
+        self.assertEqual(name['NUMBER'].tolist(), [2])
+        self.assertEqual((name['BEFORE'].iloc[0], name['AFTER'].iloc[0]),
+                         ('B', 'X'))
+        self.assertTrue(np.isnan(name['DELTA'].iloc[0]))
+        pu = changed[changed['FIELD'] == 'PU']
+        self.assertAlmostEqual(pu['DELTA'].iloc[0], 0.05)
+
+    def test_thresholds_and_top(self):
+        after = pypsse.CaseSnapshot(
+            buses([1, 2, 3, 4], [1.1, 1.3, 1.2, 1.0], ['A', 'B', 'C', 'D']))
+        diff = self.before.diff(after, thresholds={'PU': 0.15}, top=1)
+        self.assertEqual(diff.changed['BUS']['NUMBER'].tolist(), [2])
+
+    def test_case_changes_since(self):
+        psspy.reset()
+        psse = pypsse.pypsse()
+        before = psse.snapshot(families=('MACH', 'LOAD'))
+        psse.dispatch_gen(3, '1', 75.0, solve=False)
+        diff = psse.changes_since(before)
+        mach = diff.changed['MACH']
+        self.assertEqual(mach['NUMBER'].tolist(), [3])
+        self.assertEqual(mach['DELTA'].tolist(), [35.0])
+        self.assertEqual(len(diff.changed['LOAD'].index), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
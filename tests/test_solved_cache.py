@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from support import psspy, pypsse
+
+
+def entry(n):
+    """Returns a cache entry of n float64 values (8 * n bytes)."""
+    return {'BUS': {'PU': np.arange(n, dtype=float)}}
+
+
+class SolvedStateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def solves(self):
+        return sum(self.psse.metrics['pypsse_solves_total'].values.values())
+
+    def test_hit_skips_the_solve_and_the_retrieval(self):
+        cache = pypsse.SolvedStateCache()
+        self.psse.dispatch_gen(3, '1', 60.0, solve=False)
+        first = self.psse.solvecase_cached(cache)
+        self.assertEqual(self.solves(), 1)
+        del psspy.CALLS[:]
+        second = self.psse.solvecase_cached(cache)
+        self.assertIs(second, first)
+        self.assertEqual(self.solves(), 1)
+        self.assertEqual(psspy.CALLS, [])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.psse.dispatch_gen(3, '1', 70.0, solve=False)
+        self.psse.solvecase_cached(cache)
+        self.assertEqual(self.solves(), 2)
+
+    def test_key_includes_results_method_and_options(self):
+        cache = pypsse.SolvedStateCache()
+        self.psse.solvecase_cached(cache)
+        self.psse.solvecase_cached(cache, method='FDNS')
+        self.psse.solvecase_cached(cache, options=[1, 0, 0, 0, 0, 0, 0, 0])
+        out = self.psse.solvecase_cached(cache, results={'MACH': ['PGEN']})
+        self.assertEqual(out['MACH']['PGEN'].tolist(), [50.0, 40.0])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 4, 4))
+        self.assertEqual(self.solves(), 4)
+
+    def test_resolution_rounds_changes(self):
+        key = pypsse.SolvedStateCache.key
+        self.assertEqual(key('case', {'a': 50.04}, 0.1),
+                         key('case', {'a': 50.0}, 0.1))
+        self.assertNotEqual(key('case', {'a': 50.06}, 0.1),
+                            key('case', {'a': 50.0}, 0.1))
+        self.assertNotEqual(key('case', {'a': 50.04}),
+                            key('case', {'a': 50.0}))
+        cache = pypsse.SolvedStateCache()
+        self.psse.dispatch_gen(3, '1', 60.0, solve=False)
+        self.psse.solvecase_cached(cache, resolution=1.0)
+        self.psse.dispatch_gen(3, '1', 60.2, solve=False)
+        self.psse.solvecase_cached(cache, resolution=1.0)
+        self.assertEqual(cache.hits, 1)
+
+    def test_least_recently_used_entries_are_evicted_by_bytes(self):
+        cache = pypsse.SolvedStateCache(max_bytes=200)
+        cache.put('a', entry(10))
+        cache.put('b', entry(10))
+        self.assertEqual(cache.nbytes, 160)
+        cache.get('a')
+        cache.put('c', entry(10))
+        self.assertEqual(sorted(k for k in 'abc' if k in cache), ['a', 'c'])
+        self.assertEqual(cache.nbytes, 160)
+        # an entry larger than the bound is still kept on its own
+        cache.put('d', entry(50))
+        self.assertEqual((len(cache), cache.nbytes), (1, 400))
+
+    def test_entries_reload_from_path(self):
+        path = os.path.join(self.dir, 'cache')
+        cache = pypsse.SolvedStateCache(path=path)
+        cache.put('a', entry(4))
+        cache.clear()
+        self.assertEqual((len(cache), cache.nbytes), (0, 0))
+        self.assertIn('a', cache)
+        self.assertEqual(cache.get('a')['BUS']['PU'].tolist(),
+                         [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(len(cache), 1)
+        other = pypsse.SolvedStateCache(path=path)
+        self.assertEqual(other.get('a')['BUS']['PU'].tolist(),
+                         [0.0, 1.0, 2.0, 3.0])
+        self.assertIsNone(other.get('b'))
+        self.assertEqual(os.listdir(path), ['a.npz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from support import psspy, pypsse
+
+
+class SlowPsse(pypsse.pypsse):
+    """Runs studies slower than the broker lease and logs each run."""
+
+    def __init__(self, log, delay):
+        pypsse.pypsse.__init__(self)
+        self.log = log
+        self.delay = delay
+
+    def run_study(self, study):
+        with open(self.log, 'a') as f:
+            f.write('{}\n'.format(study['changes'][0][3]))
+        time.sleep(self.delay)
+        return pypsse.pypsse.run_study(self, study)
+
+
+def slow_worker(queue, log, delay):
+    queue.work(psse=SlowPsse(log, delay), idle_timeout=1.0, poll=0.1)
+
+
+class StudyQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.dir = tempfile.mkdtemp()
+        self.case = os.path.join(self.dir, 'base.sav')
+        psspy.save(self.case)
+        self.db = os.path.join(self.dir, 'queue.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def studies(self, n):
+        return [{'case': self.case, 'changes': [['MACH', 3, '1', 10.0 * k]],
+                 'results': {'MACH': ['NUMBER', 'PGEN']}} for k in range(n)]
+
+    def attempts(self):
+        conn = sqlite3.connect(self.db)
+        try:
+            return dict(conn.execute('SELECT task_id, attempts FROM tasks'))
+        finally:
+            conn.close()
+
+    def test_workers_run_every_study_once(self):
+        queue = pypsse.StudyQueue(pypsse.SQLiteBroker(self.db),
+                                  os.path.join(self.dir, 'results'))
+        ids = queue.submit_many(self.studies(12))
+        self.assertEqual(ids, queue.submit_many(self.studies(12)))
+        procs = queue.start_workers(3, idle_timeout=1.0)
+        status = queue.wait(poll=0.1, timeout=60)
+        for p in procs:
+            p.join(30)
+        self.assertEqual(status, {'done': 12})
+        self.assertEqual(set(self.attempts().values()), set([1]))
+        for k, task_id in enumerate(ids):
+            arrays = queue.result(task_id)
+            pgen = arrays['MACH']['PGEN'][arrays['MACH']['NUMBER'] == 3]
+            self.assertEqual(pgen.tolist(), [10.0 * k])
+
+    def test_heartbeat_keeps_long_studies_leased(self):
+        queue = pypsse.StudyQueue(pypsse.SQLiteBroker(self.db, lease=0.6),
+                                  os.path.join(self.dir, 'results'))
+        queue.submit_many(self.studies(2))
+        log = os.path.join(self.dir, 'runs.log')
+        procs = [multiprocessing.Process(target=slow_worker,
+                                         args=(queue, log, 1.5))
+                 for k in range(2)]
+        for p in procs:
+            p.start()
+        status = queue.wait(poll=0.1, timeout=60)
+        for p in procs:
+            p.join(30)
+        self.assertEqual(status, {'done': 2})
+        with open(log) as f:
+            self.assertEqual(sorted(f.read().split()), ['0.0', '10.0'])
+        self.assertEqual(set(self.attempts().values()), set([1]))
+
+    def test_failed_rollback_reopens_the_case(self):
+        psse = pypsse.pypsse()
+        study = self.studies(2)[1]
+        psse.run_study(study)
+        psse.rollback = lambda name=None: False
+        arrays = psse.run_study(self.studies(3)[2])
+        pgen = arrays['MACH']['PGEN'][arrays['MACH']['NUMBER'] == 3]
+        self.assertEqual(pgen.tolist(), [20.0])
+        self.assertIn('STUDYBASE', psse.__checkpoints__)
+
+
+if __name__ == '__main__':
+    unittest.main()
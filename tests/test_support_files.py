@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import psspy, pypsse
+
+HEADER = 'COM\nCOM  {} created through pypsse \nCOM\n'
+
+
+class SupportFileBuilderTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.psse = pypsse.pypsse()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return f.read()
+
+    def test_subsystem_file(self):
+        path = os.path.join(self.dir, 'study.sub')
+        with self.psse.subfile_builder(path) as sub:
+            sub.add('GEN', buslist=[1, 3], partlist=[0.25, 0.75])
+            sub.add_table({'SUBSYSTEM': ['A', 'A', 'B'],
+                           'BUS': [2, None, 4], 'AREA': [None, 5, None]})
+        self.assertEqual(sub.entries, 3)
+        self.assertEqual(self.read('study.sub'), HEADER.format(
+            'Subystem file') +
+            "SUBSYSTEM 'GEN'\n\tBUS 1\n\tBUS 3\n\tPARTICIPATE\n"
+            "\t\tBUS 1 0.25\n\t\tBUS 3 0.75\n\tEND\nEND\n"
+            "SUBSYSTEM 'A'\n\tBUS 2\n\tAREA 5\nEND\n"
+            "SUBSYSTEM 'B'\n\tBUS 4\nEND\n\nEND\n")
+        self.assertIn(path, self.psse.__internally_created_files__)
+
+    def test_partial_participation_raises(self):
+        sub = self.psse.subfile_builder(os.path.join(self.dir, 'bad.sub'))
+        self.assertRaises(ValueError, sub.add_table,
+                          {'SUBSYSTEM': ['A', 'A'], 'BUS': [1, 2],
+                           'PARTICIPATION': [1.0, None]})
+        self.assertRaises(ValueError, sub.add, 'A', [1, 2], partlist=[1.0])
+        sub.close()
+        self.assertEqual(self.read('bad.sub'),
+                         HEADER.format('Subystem file') + '\nEND\n')
+
+    def test_monitor_file(self):
+        path = os.path.join(self.dir, 'study.mon')
+        with self.psse.monfile_builder(path) as mon:
+            mon.add(['GEN'])
+            mon.add_branches({'FROMNUMBER': [1], 'TONUMBER': [2],
+                              'ID': ['1 ']})
+        self.assertEqual(mon.close(), path)
+        self.assertEqual(mon.entries, 2)
+        self.assertEqual(self.read('study.mon'), HEADER.format(
+            'Monitored element file') +
+            "MONITOR BRANCHES IN SUBSYSTEM 'GEN' \n"
+            "MONITOR BRANCH FROM BUS 1 TO BUS 2 CIRCUIT 1\n\nEND\n")
+
+    def test_contingency_file(self):
+        path = os.path.join(self.dir, 'study.con')
+        registry = []
+        with pypsse.ContingencyFileBuilder(path, registry) as con:
+            con.add('GEN')
+            con.add_table({'LABEL': ['L1', 'L2', 'L1'],
+                           'FROMNUMBER': [1, 3, 2], 'TONUMBER': [2, 4, 5],
+                           'ID': ['1', '1', '2'],
+                           'ACTION': ['OPEN', 'OPEN', 'CLOSE']})
+            self.assertRaises(ValueError, con.add_table, {'LABEL': ['L3']})
+        self.assertEqual(registry, [path])
+        self.assertEqual(con.entries, 3)
+        self.assertEqual(self.read('study.con'), HEADER.format(
+            'Contingency file') +
+            "SINGLE BRANCH IN SUBSYSTEM GEN\n"
+            "CONTINGENCY 'L1'\n OPEN BRANCH FROM BUS 1 TO BUS 2 CIRCUIT 1\n"
+            " CLOSE BRANCH FROM BUS 2 TO BUS 5 CIRCUIT 2\nEND\n"
+            "CONTINGENCY 'L2'\n OPEN BRANCH FROM BUS 3 TO BUS 4 CIRCUIT 1\n"
+            "END\n\nEND\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
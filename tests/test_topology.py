@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from support import pypsse
+
+
+def arrays(**fields):
+    return dict((k, np.array(v)) for k, v in fields.items())
+
+
+class TopologyTest(unittest.TestCase):
+
+    def setUp(self):
+        # 1-2-3 ring with a radial 3-4, a transformer 4-5 and a three winding
+        # transformer 5-6-7
+        bus = arrays(NUMBER=[1, 2, 3, 4, 5, 6, 7], TYPE=[3, 1, 1, 1, 1, 1, 1])
+        brn = arrays(FROMNUMBER=[1, 2, 3, 3], TONUMBER=[2, 3, 1, 4],
+                     ID=['1', '1', '1', '1'], STATUS=[1, 1, 1, 1])
+        trn = arrays(FROMNUMBER=[4], TONUMBER=[5], ID=['1'], STATUS=[1])
+        tr3 = arrays(WIND1NUMBER=[5], WIND2NUMBER=[6], WIND3NUMBER=[7],
+                     ID=['1'], STATUS=[1])
+        self.topo = pypsse.Topology(bus, brn, trn, tr3)
+
+    def test_connected_case_is_one_island(self):
+        self.assertEqual(self.topo.count(), 1)
+        self.assertEqual(len(self.topo.dead_buses()), 0)
+
+    def test_opening_a_ring_branch_keeps_one_island(self):
+        self.assertEqual(self.topo.set_status(('BRN', 1, 2, '1'), 0), 0)
+        self.assertEqual(self.topo.count(), 1)
+
+    def test_opening_and_closing_a_radial_branch(self):
+        self.assertEqual(self.topo.set_status(('BRN', 4, 3, '1'), 0), 1)
+        self.assertEqual(sorted(self.topo.dead_buses().tolist()),
+                         [4, 5, 6, 7])
+        self.assertEqual(self.topo.set_status(('BRN', 3, 4, '1'), 1), -1)
+        self.assertEqual(self.topo.count(), 1)
+
+    def test_three_winding_status_opens_one_leg(self):
+        # status 3 keeps only winding 1 to winding 2 in service
+        self.assertEqual(self.topo.set_status(('TR3', 5, 6, 7, '1'), 3), 1)
+        self.assertEqual(self.topo.dead_buses().tolist(), [7])
+
+    def test_island_ids_match_islands_and_summary(self):
+        # merging after two splits leaves a gap in the internal IDs
+        self.topo.set_status(('TR3', 5, 6, 7, '1'), 3)
+        self.topo.set_status(('BRN', 3, 4, '1'), 0)
+        self.topo.set_status(('TR3', 5, 6, 7, '1'), 1)
+        islands = self.topo.islands()
+        summary = self.topo.summary()
+        for busnum in self.topo.busnums:
+            island = self.topo.island_of(busnum)
+            self.assertEqual(island, islands['ISLAND'][busnum])
+            self.assertEqual(summary['SIZE'][island],
+                             (islands['ISLAND'] == island).sum())
+
+    def test_incremental_islands_match_relabel(self):
+        for key in [('BRN', 1, 2, '1'), ('BRN', 3, 4, '1'),
+                    ('TR3', 5, 6, 7, '1'), ('BRN', 2, 3, '1')]:
+            self.topo.set_status(key, 0)
+        incremental = self.topo.islands()['ISLAND'].values
+        self.topo.relabel()
+        relabeled = self.topo.islands()['ISLAND'].values
+        pairs = set(zip(incremental.tolist(), relabeled.tolist()))
+        self.assertEqual(len(pairs), len(set(relabeled.tolist())))
+
+    def test_unknown_element_raises(self):
+        self.assertRaises(KeyError, self.topo.set_status,
+                          ('BRN', 1, 7, '1'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
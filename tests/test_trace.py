@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from support import psspy, pypsse
+
+
+def session(psse):
+    """Changes and restores the case through a snapshot checkpoint."""
+    base = psse.checkpoint()
+    psse.create_bus_from_split(2, newnum=200)
+    pypsse.psspy.bsys(sid=11, numbus=2, buses=np.array([1, 2]))
+    psse.rollback(base)
+    return psse.get_multiple_machine_data(buslist=[1, 3])
+
+
+class TraceTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.dir = tempfile.mkdtemp()
+        self.trace = os.path.join(self.dir, 'session.trace')
+
+    def tearDown(self):
+        pypsse.stop_replay()
+        pypsse.stop_recording()
+        shutil.rmtree(self.dir, True)
+
+    def record(self):
+        pypsse.start_recording(self.trace)
+        try:
+            return session(pypsse.pypsse())
+        finally:
+            pypsse.stop_recording()
+
+    def test_strict_replay_of_a_session_with_snapshots(self):
+        recorded = self.record()
+        psspy.reset()
+        psspy.S['mach'] = []
+        replayer = pypsse.start_replay(self.trace, strict=True)
+        replayed = session(pypsse.pypsse())
+        self.assertEqual(replayed['PGEN'].tolist(),
+                         recorded['PGEN'].tolist())
+        self.assertGreater(replayer.calls, 0)
+
+    def test_strict_replay_detects_changed_arguments(self):
+        self.record()
+        pypsse.start_replay(self.trace, strict=True)
+        psse = pypsse.pypsse()
+        psse.checkpoint()
+        self.assertRaises(pypsse.ReplayError, psse.create_bus_from_split, 4,
+                          newnum=200)
+
+    def test_equal_arguments(self):
+        snap = os.path.join(pypsse.SNAPSHOT_LOCATION, 'pypsseab12.sav')
+        other = os.path.join(pypsse.SNAPSHOT_LOCATION, 'pypssecd34.sav')
+        self.assertTrue(pypsse._replay_equal(
+            ((snap, np.arange(3)), {'x': [1.0]}),
+            ((other, np.arange(3)), {'x': [1.0]})))
+        self.assertFalse(pypsse._replay_equal((np.arange(3),),
+                                              (np.arange(4),)))
+        self.assertFalse(pypsse._replay_equal(('/data/a.sav',),
+                                              ('/data/b.sav',)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from support import psspy, pypsse
+
+
+def branches(pct):
+    return {'FROMNUMBER': np.array([1, 2, 3]), 'TONUMBER': np.array([2, 3, 4]),
+            'ID': np.array(['1 ', '1 ', '2 ']),
+            'MAXPCTRATE': np.array(pct, dtype=float)}
+
+
+def buses(pu):
+    return {'NUMBER': np.array([1, 2, 3]), 'PU': np.array(pu, dtype=float),
+            'NVLMHI': np.array([1.05] * 3), 'NVLMLO': np.array([0.95] * 3),
+            'EVLMHI': np.array([1.1] * 3), 'EVLMLO': np.array([0.9] * 3)}
+
+
+class ViolationScannerTest(unittest.TestCase):
+
+    def test_top_k_over_runs(self):
+        scanner = pypsse.ViolationScanner(top_k=2)
+        self.assertEqual(scanner.scan('a', brn=branches([120, 90, 101])), 2)
+        self.assertEqual(scanner.scan('b', brn=branches([110, 130, 95])), 2)
+        worst = scanner.worst_thermal()
+        self.assertEqual(worst['RUN'].tolist(), ['b', 'a'])
+        self.assertEqual(worst['MAXPCTRATE'].tolist(), [130.0, 120.0])
+        self.assertEqual(worst['ID'].tolist(), ['1', '1'])
+        summary = scanner.element_summary()
+        self.assertEqual(summary['KEY'].tolist()[0], ('BRN', 1, 2, '1'))
+        self.assertEqual(summary['COUNT'].tolist(), [2, 1, 1])
+        self.assertEqual(summary['WORST'].tolist()[0], 120.0)
+        self.assertEqual(len(scanner.records().index), 4)
+        self.assertEqual(scanner.runs, 2)
+
+    def test_voltage_limits_and_dead_buses(self):
+        scanner = pypsse.ViolationScanner()
+        self.assertEqual(scanner.scan('a', bus=buses([1.08, 0.0, 0.93])), 2)
+        worst = scanner.worst_voltage()
+        self.assertEqual(worst['NUMBER'].tolist(), [1, 3])
+        self.assertAlmostEqual(worst['DEVIATION'][0], 0.03)
+        emergency = pypsse.ViolationScanner(limits='emergency',
+                                            ignore_dead=False)
+        self.assertEqual(emergency.scan('a', bus=buses([1.08, 0.0, 0.93])), 1)
+        self.assertEqual(emergency.records()['KEY'].tolist(), [('BUS', 2)])
+        self.assertRaises(ValueError, pypsse.ViolationScanner,
+                          limits='extreme')
+
+    def test_scan_of_result_tables(self):
+        psspy.reset()
+        psse = pypsse.pypsse()
+        psse.solvecase()
+        table = psse.get_result_table('BRN', ['FROMNUMBER', 'TONUMBER', 'ID',
+                                              'MAXPCTRATE'])
+        scanner = pypsse.ViolationScanner()
+        # 30% of the 90 MW generation loads the 50 MVA branch 3-4 at 54%
+        self.assertEqual(scanner.scan(0, brn=table), 0)
+        self.assertEqual(len(scanner.records().index), 0)
+        psspy.machine_chng_2(3, '1', realar=[150.0])
+        psse.solvecase()
+        table.refresh()
+        self.assertEqual(scanner.scan(1, brn=table), 1)
+        self.assertEqual(scanner.records()['KEY'].tolist(),
+                         [('BRN', 3, 4, '1')])
+        self.assertAlmostEqual(scanner.records()['VALUE'][0], 120.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
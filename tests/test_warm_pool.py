@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from support import psspy, pypsse
+
+
+def dispatch(psse, pgen):
+    before = psspy._mach(3, '1')['PGEN']
+    psse.dispatch_gen(3, '1', pgen, solve=False)
+    return before, psspy._mach(3, '1')['PGEN']
+
+
+def large(psse, n):
+    return np.zeros(n)
+
+
+class WarmPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        self.dir = tempfile.mkdtemp()
+        self.case = os.path.join(self.dir, 'base.sav')
+        psspy.save(self.case)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_jobs_start_from_the_base_case(self):
+        with pypsse.WarmPool(self.case, processes=2) as pool:
+            pool.wait_ready(timeout=30)
+            results = pool.map(dispatch, [60.0, 70.0, 80.0, 90.0])
+        self.assertEqual(results, [(40.0, 60.0), (40.0, 70.0), (40.0, 80.0),
+                                   (40.0, 90.0)])
+
+    def test_close_with_unread_results(self):
+        pool = pypsse.WarmPool(self.case, processes=2)
+        jobs = [pool.submit(large, 1 << 20) for k in range(4)]
+        closer = threading.Thread(target=pool.close)
+        closer.daemon = True
+        closer.start()
+        closer.join(60)
+        self.assertFalse(closer.is_alive())
+        self.assertEqual(len(pool.result(jobs[-1], timeout=1)), 1 << 20)
+
+    def test_unopened_case_raises(self):
+        pool = pypsse.WarmPool(os.path.join(self.dir, 'missing.sav'),
+                               processes=1)
+        try:
+            self.assertRaises(RuntimeError, pool.wait_ready, 30)
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
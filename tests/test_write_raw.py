@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from support import psspy, pypsse
+
+
+def section(path, name):
+    """Returns the records of a RAW data section as lists of fields."""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    start = [n for n, l in enumerate(lines)
+             if l.endswith('BEGIN {} DATA'.format(name))][0] + 1
+    records = []
+    for line in lines[start:]:
+        if line.startswith('0 / END OF'):
+            return records
+        records.append(line.split(','))
+
+
+class WriteRawTest(unittest.TestCase):
+
+    def setUp(self):
+        psspy.reset()
+        psspy.S['tr3'].append(dict(WIND1NUMBER=5, WIND2NUMBER=6,
+                                   WIND3NUMBER=4, ID='1', STATUS=1,
+                                   NMETERNUMBER=4, YMAG=0j, VMSTAR=1.0,
+                                   ANSTAR=0.0))
+        self.psse = pypsse.pypsse()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_sections_and_replace(self):
+        path = os.path.join(self.dir, 'case.raw')
+        self.assertTrue(self.psse.write_raw(path))
+        self.assertTrue(self.psse.write_raw(path))
+        self.assertEqual(os.listdir(self.dir), ['case.raw'])
+        self.assertEqual(len(section(path, 'LOAD')), 3)
+        self.assertEqual(len(section(path, 'BRANCH')), 5)
+        self.assertEqual(len(section(path, 'GENERATOR')), 2)
+
+    def test_machines_use_plant_data(self):
+        psspy.S['bus'][3]['PU'] = 0.97
+        path = os.path.join(self.dir, 'case.raw')
+        self.psse.write_raw(path)
+        gens = dict((int(r[0]), r) for r in section(path, 'GENERATOR'))
+        self.assertEqual((float(gens[1][6]), int(gens[1][7])), (1.02, 0))
+        self.assertEqual((float(gens[3][6]), int(gens[3][7])), (1.01, 4))
+
+    def test_three_winding_nonmetered_end(self):
+        path = os.path.join(self.dir, 'case.raw')
+        self.psse.write_raw(path)
+        heads = [r for r in section(path, 'TRANSFORMER')
+                 if r[:3] == ['5', '6', '4']]
+        self.assertEqual(int(heads[0][9]), 3)
+
+    def test_revision_34_transformer_owners(self):
+        path = os.path.join(self.dir, 'case.raw')
+        self.psse.write_raw(path, rev=34)
+        heads = [r for r in section(path, 'TRANSFORMER')
+                 if r[:3] in (['2', '3', '0'], ['5', '6', '4'])]
+        self.assertEqual(len(heads), 2)
+        for head in heads:
+            # O1,F1 to O4,F4 precede the vector group
+            self.assertEqual([float(v) for v in head[12:20]],
+                             [1, 1.0, 0, 1.0, 0, 1.0, 0, 1.0])
+            self.assertEqual(head[20], "'            '")
+            self.assertEqual(len(head), 21)
+
+    def test_variants(self):
+        model = self.psse.get_network_model()
+        paths = pypsse.write_raw_variants(
+            model, {'low': [['MACH', 3, '1', 10.0]],
+                    'high': [['MACH', 3, '1', 90.0]]}, self.dir, processes=2)
+        for name, pgen in [('low', 10.0), ('high', 90.0)]:
+            gens = dict((int(r[0]), r)
+                        for r in section(paths[name], 'GENERATOR'))
+            self.assertEqual(float(gens[3][2]), pgen)
+        self.assertEqual(model.machines['PGEN'].tolist(), [50.0, 40.0])
+
+
+if __name__ == '__main__':
+    unittest.main()